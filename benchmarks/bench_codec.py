@@ -0,0 +1,63 @@
+"""Micro-benchmark of story encode/decode throughput.
+
+Run with:
+    uv run python benchmarks/bench_codec.py [--stories 10000] [--repeat 5]
+"""
+
+import argparse
+import timeit
+
+from storymachine.codec import (
+    decode_stories,
+    encode_stories_binary,
+    encode_stories_json,
+)
+from storymachine.types import Story
+
+
+def make_corpus(count: int) -> list[Story]:
+    """Build a corpus of stories with realistic field sizes."""
+    return [
+        Story(
+            title=f"[M] As a shopper, I want to save cart {i} so that I can buy later",
+            acceptance_criteria=[
+                f"Given a cart with {j} items, when I save it, then it is listed"
+                for j in range(6)
+            ],
+            enriched_context="- product context\n" * 20,
+        )
+        for i in range(count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").splitlines()[0])
+    parser.add_argument("--stories", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    stories = make_corpus(args.stories)
+    print(f"{args.stories} stories, best of {args.repeat}")
+    print(f"{'codec':<8}{'size (KiB)':>12}{'encode/s':>14}{'decode/s':>14}")
+
+    for name, encode in (
+        ("json", encode_stories_json),
+        ("binary", encode_stories_binary),
+    ):
+        encoded = encode(stories)
+        encode_time = min(
+            timeit.repeat(lambda: encode(stories), number=1, repeat=args.repeat)
+        )
+        decode_time = min(
+            timeit.repeat(lambda: decode_stories(encoded), number=1, repeat=args.repeat)
+        )
+        size = len(encoded.encode() if isinstance(encoded, str) else encoded)
+        print(
+            f"{name:<8}{size / 1024:>12.0f}"
+            f"{args.stories / encode_time:>14,.0f}"
+            f"{args.stories / decode_time:>14,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Micro-benchmark of near-duplicate story detection.
+
+Run with:
+    uv run python benchmarks/bench_dedupe.py [--stories 1000] [--repeat 5]
+"""
+
+import argparse
+import random
+import timeit
+
+from storymachine.dedupe import find_duplicates
+from storymachine.types import Story
+
+_NOUNS = [
+    "cart", "invoice", "order", "profile", "password", "report", "refund",
+    "coupon", "address", "payment", "review", "wishlist", "shipment", "tax",
+    "export", "dashboard", "notification", "subscription", "account", "search",
+]  # fmt: skip
+_QUALIFIERS = [
+    "draft", "bulk", "recurring", "shared", "archived", "pending", "gift",
+    "business", "guest", "regional", "scheduled", "exported", "default",
+]  # fmt: skip
+_VERBS = [
+    "save", "export", "share", "filter", "delete", "archive", "approve",
+    "schedule", "import", "print", "rename", "restore", "merge", "compare",
+]  # fmt: skip
+_SYLLABLES = ["ka", "lo", "mi", "ren", "tu", "sa", "vel", "dor", "pi", "nex"]
+
+
+def _vocabulary(rng: random.Random, count: int) -> list[str]:
+    """Made-up domain terms, as a large product's stories name many things."""
+    return ["".join(rng.choice(_SYLLABLES) for _ in range(3)) for _ in range(count)]
+
+
+def make_portfolio(count: int, duplicate_rate: float = 0.05) -> list[Story]:
+    """Build stories with distinct subjects and a share of reworded copies."""
+    rng = random.Random(0)
+    nouns = _NOUNS + _vocabulary(rng, 400)
+    qualifiers = _QUALIFIERS + _vocabulary(rng, 100)
+    stories: list[Story] = []
+    for i in range(count):
+        if stories and rng.random() < duplicate_rate:
+            source = rng.choice(stories)
+            stories.append(
+                Story(
+                    title=source.title.replace("I want", "I would like"),
+                    acceptance_criteria=source.acceptance_criteria[1:],
+                    id=str(i),
+                )
+            )
+            continue
+        verb, noun = rng.choice(_VERBS), rng.choice(nouns)
+
+        def term() -> str:
+            return f"{rng.choice(qualifiers)} {rng.choice(nouns)}"
+
+        stories.append(
+            Story(
+                title=f"[M] As a shopper, I want to {verb} my {term()} {i}",
+                acceptance_criteria=[
+                    f"Given a {term()} with {term()} details, when I "
+                    f"{rng.choice(_VERBS)} the {noun}, then the {term()} "
+                    f"is {rng.choice(_VERBS)}d"
+                    for _ in range(5)
+                ],
+                id=str(i),
+            )
+        )
+    return stories
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").splitlines()[0])
+    parser.add_argument("--stories", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.55)
+    args = parser.parse_args()
+
+    stories = make_portfolio(args.stories)
+    pairs = find_duplicates(stories, args.threshold)
+    elapsed = min(
+        timeit.repeat(
+            lambda: find_duplicates(stories, args.threshold),
+            number=1,
+            repeat=args.repeat,
+        )
+    )
+    print(f"{args.stories} stories, best of {args.repeat}")
+    print(f"{len(pairs)} duplicate pairs in {elapsed * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Deterministic end-to-end benchmark of `w1` against local fake services.
+
+Runs the real workflow, SDK and HTTP stack against `FakeOpenAIServer`, with
+`ask_github` stubbed and human review replaced by a scripted feedback
+provider. Reports end-to-end and per-stage wall time, API call counts and
+bytes exchanged for the sample fixtures at several input scales.
+
+Run with:
+    uv run python -m benchmarks.bench_e2e [--scales 1 10 100] [--latency 0.2]
+
+Workflow settings (FUSED_DETAILING, BATCH_ACCEPTANCE_CRITERIA, ...) are read
+from the environment as usual, so modes can be compared run against run.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from benchmarks.fake_openai import FakeAskGithub, FakeOpenAIConfig, FakeOpenAIServer
+
+FIXTURES = Path(__file__).parent.parent / "tests" / "fixtures"
+
+# Activities as imported into storymachine.workflow, timed as stages
+STAGES = [
+    "get_codebase_context",
+    "problem_break_down",
+    "define_acceptance_criteria_batch",
+    "define_acceptance_criteria",
+    "enrich_context",
+    "detail_story",
+]
+
+
+class ScriptedFeedback:
+    """Replay a fixed list of review answers in place of `input()`.
+
+    Each entry is "y" to approve or "n:<comment>" to reject with a comment;
+    once the script runs out, everything is approved.
+    """
+
+    def __init__(self, script: Optional[List[str]] = None):
+        self._script = list(script or [])
+        self.requests = 0
+
+    def __call__(self):
+        from storymachine.types import FeedbackResponse, FeedbackStatus
+
+        self.requests += 1
+        answer = self._script.pop(0) if self._script else "y"
+        if answer.startswith("n"):
+            comment = answer.partition(":")[2]
+            return FeedbackResponse(status=FeedbackStatus.REJECTED, comment=comment)
+        return FeedbackResponse(status=FeedbackStatus.ACCEPTED)
+
+
+@contextlib.contextmanager
+def patched_workflow(
+    feedback: Callable, timings: Dict[str, List[float]]
+) -> Iterator[None]:
+    """Patch review and stage functions in storymachine.workflow."""
+    import storymachine.ai as ai
+    import storymachine.workflow as workflow
+
+    originals: Dict[str, Any] = {}
+
+    def timed(name: str, fn: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(fn):
+
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    timings[name].append(time.perf_counter() - start)
+
+            return async_wrapper
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timings[name].append(time.perf_counter() - start)
+
+        return wrapper
+
+    replacements: Dict[str, Any] = {"get_human_input": feedback}
+    for name in STAGES:
+        if hasattr(workflow, name):
+            replacements[name] = timed(name, getattr(workflow, name))
+
+    for name, replacement in replacements.items():
+        originals[name] = getattr(workflow, name)
+        setattr(workflow, name, replacement)
+    # Every run starts a fresh conversation
+    ai.new_conversation()
+    try:
+        yield
+    finally:
+        for name, original in originals.items():
+            setattr(workflow, name, original)
+
+
+@contextlib.contextmanager
+def fake_environment(
+    server: FakeOpenAIServer, ask_github: FakeAskGithub
+) -> Iterator[None]:
+    """Point the SDK at the fake server and install the ask_github stub."""
+    saved_env = {
+        key: os.environ.get(key) for key in ("OPENAI_BASE_URL", "OPENAI_API_KEY")
+    }
+    saved_module = sys.modules.get("ask_github")
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    os.environ.setdefault("OPENAI_API_KEY", "fake-key")
+    ask_github.install()
+    try:
+        yield
+    finally:
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        if saved_module is None:
+            sys.modules.pop("ask_github", None)
+        else:
+            sys.modules["ask_github"] = saved_module
+
+
+def run_once(
+    scale: int,
+    config: FakeOpenAIConfig,
+    feedback_script: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """Run `w1` once at the given input scale and return its measurements."""
+    prd = (FIXTURES / "sample_prd.md").read_text() * scale
+    tech_spec = (FIXTURES / "sample_tech_spec.md").read_text() * scale
+
+    ask_github = FakeAskGithub(config)
+
+    with (
+        FakeOpenAIServer(config) as server,
+        fake_environment(server, ask_github),
+    ):
+        from storymachine.types import WorkflowInput
+        from storymachine.workflow import w1
+
+        timings: Dict[str, List[float]] = defaultdict(list)
+        feedback = ScriptedFeedback(feedback_script)
+        workflow_input = WorkflowInput(
+            prd_content=prd,
+            tech_spec_content=tech_spec,
+            repo_url="https://github.com/example/repo",
+        )
+        with (
+            patched_workflow(feedback, timings),
+            contextlib.redirect_stdout(io.StringIO()),
+            contextlib.redirect_stderr(io.StringIO()),
+        ):
+            start = time.perf_counter()
+            stories = asyncio.run(w1(workflow_input))
+            total = time.perf_counter() - start
+
+    stats = server.stats
+    return {
+        "scale": scale,
+        "input_chars": len(prd) + len(tech_spec),
+        "stories": len(stories),
+        "total_seconds": total,
+        "stages": {
+            name: {"calls": len(values), "seconds": sum(values)}
+            for name, values in timings.items()
+        },
+        "api_calls": dict(stats.calls),
+        "ask_github_calls": dict(ask_github.calls),
+        "reviews": feedback.requests,
+        "bytes_sent": stats.bytes_received,
+        "bytes_received": stats.bytes_sent,
+        "failures_injected": stats.failures_injected,
+        "input_tokens": stats.input_tokens,
+        "output_tokens": stats.output_tokens,
+    }
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    """Print a human-readable summary of benchmark results."""
+    for result in results:
+        calls = sum(
+            count for path, count in result["api_calls"].items() if "responses" in path
+        )
+        print(
+            f"\nscale {result['scale']}x: {result['input_chars']:,} input chars, "
+            f"{result['stories']} stories, {result['total_seconds']:.3f}s end to end"
+        )
+        print(
+            f"  responses.create calls {calls}, "
+            f"sent {result['bytes_sent'] / 1024:,.0f} KiB, "
+            f"received {result['bytes_received'] / 1024:,.0f} KiB, "
+            f"injected failures {result['failures_injected']}"
+        )
+        for name, stage in result["stages"].items():
+            print(f"  {name:<34}{stage['calls']:>4} calls {stage['seconds']:>9.3f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--stories", type=int, default=5)
+    parser.add_argument("--context-chars", type=int, default=1200)
+    parser.add_argument("--ask-latency", type=float, default=0.0)
+    parser.add_argument(
+        "--feedback",
+        nargs="*",
+        default=["n:Split the largest story"],
+        help='Scripted review answers: "y" or "n:<comment>"; then approve all',
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="Also write results as JSON")
+    args = parser.parse_args()
+
+    config = FakeOpenAIConfig(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        failure_rate=args.failure_rate,
+        story_count=args.stories,
+        context_chars=args.context_chars,
+        ask_latency=args.ask_latency,
+        seed=args.seed,
+    )
+    results = [run_once(scale, config, args.feedback) for scale in args.scales]
+    print_report(results)
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
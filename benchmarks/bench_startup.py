@@ -0,0 +1,37 @@
+"""Benchmark cold-start wall time of `storymachine --help`.
+
+Run with:
+    uv run python benchmarks/bench_startup.py [--runs 20]
+
+The CI gate for cold start lives in tests/test_startup.py; this script reports
+the distribution for comparing changes locally.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    command = [sys.executable, "-c", "from storymachine.cli import main; main()"]
+    timings = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        subprocess.run([*command, "--help"], stdout=subprocess.DEVNULL, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    print(f"storymachine --help over {args.runs} runs")
+    print(f"  min    {timings[0]:8.1f} ms")
+    print(f"  median {statistics.median(timings):8.1f} ms")
+    print(f"  max    {timings[-1]:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""Local stand-ins for the OpenAI Responses/Conversations API and ask_github.
+
+`FakeOpenAIServer` is a real HTTP server, so requests go through the OpenAI
+SDK, its retries and JSON parsing exactly as in production; only the model is
+replaced. Point the SDK at it with `OPENAI_BASE_URL=<server.base_url>`.
+
+Behaviour is deterministic for a given `FakeOpenAIConfig.seed`: per-call
+latency, output sizes and injected failures are drawn from a seeded RNG.
+"""
+
+import json
+import random
+import re
+import sys
+import threading
+import time
+import types
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, List, Optional
+
+from storymachine.ai import estimate_tokens
+
+
+@dataclass
+class FakeOpenAIConfig:
+    """Knobs for the fake model server and repository host."""
+
+    # Seconds added to every model call, plus uniform jitter in [0, jitter)
+    latency: float = 0.0
+    latency_jitter: float = 0.0
+    # Fraction of model calls answered with HTTP 500 (the SDK retries them)
+    failure_rate: float = 0.0
+    # Shape of generated stories
+    story_count: int = 5
+    criteria_per_story: int = 4
+    context_chars: int = 1200
+    # Seconds taken by each ask_github call, and files in the fake repo tree
+    ask_latency: float = 0.0
+    repo_files: int = 200
+    # Streamed tool arguments are sent in chunks of this many characters,
+    # with a pause between chunks
+    stream_chunk_chars: int = 0
+    stream_chunk_delay: float = 0.0
+    # Generated codebase questions; {i} is the question number
+    question_template: str = "Where is feature {i} implemented?"
+    seed: int = 0
+
+
+@dataclass
+class FakeOpenAIStats:
+    """What the client sent to, and received from, the fake services."""
+
+    calls: Counter = field(default_factory=Counter)
+    bytes_received: int = 0
+    bytes_sent: int = 0
+    failures_injected: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    # Responses requests that named a server-side conversation
+    conversation_requests: int = 0
+
+
+class FakeOpenAIServer:
+    """Threaded HTTP server answering /v1/conversations and /v1/responses."""
+
+    def __init__(self, config: Optional[FakeOpenAIConfig] = None):
+        self.config = config or FakeOpenAIConfig()
+        self.stats = FakeOpenAIStats()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._counter = 0
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _next_id(self) -> int:
+        with self._lock:
+            self._counter += 1
+            return self._counter
+
+    def _draw(self) -> tuple[float, bool]:
+        """Draw this call's latency and whether it fails, in a fixed sequence."""
+        with self._lock:
+            latency = (
+                self.config.latency + self._rng.random() * self.config.latency_jitter
+            )
+            fail = self._rng.random() < self.config.failure_rate
+        return latency, fail
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                path = self.path.split("?")[0]
+                with server._lock:
+                    server.stats.calls[path] += 1
+                    server.stats.bytes_received += len(body)
+
+                if path.endswith("/conversations"):
+                    status, payload = 200, server.conversation()
+                elif path.endswith("/items"):
+                    status, payload = 200, server.conversation_items()
+                elif path.endswith("/responses"):
+                    latency, fail = server._draw()
+                    time.sleep(latency)
+                    if fail:
+                        with server._lock:
+                            server.stats.failures_injected += 1
+                        status = 500
+                        payload = {
+                            "error": {"message": "injected", "type": "server_error"}
+                        }
+                    else:
+                        request = json.loads(body)
+                        status, payload = 200, server.response(request)
+                        if request.get("stream"):
+                            self._send_stream(payload)
+                            return
+                else:
+                    status, payload = 404, {"error": {"message": "not found"}}
+
+                data = json.dumps(payload).encode()
+                with server._lock:
+                    server.stats.bytes_sent += len(data)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, payload: dict[str, Any]) -> None:
+                """Send a response as server-sent events, arguments first."""
+                chunk = server.config.stream_chunk_chars
+                events = [
+                    {
+                        "type": "response.function_call_arguments.delta",
+                        "item_id": item["id"],
+                        "output_index": index,
+                        "delta": delta,
+                    }
+                    for index, item in enumerate(payload["output"])
+                    if item["type"] == "function_call"
+                    for delta in (
+                        [
+                            item["arguments"][start : start + chunk]
+                            for start in range(0, len(item["arguments"]), chunk)
+                        ]
+                        if chunk
+                        else [item["arguments"]]
+                    )
+                ]
+                events.append({"type": "response.completed", "response": payload})
+                parts = [
+                    f"data: {json.dumps({**event, 'sequence_number': n})}\n\n".encode()
+                    for n, event in enumerate(events)
+                ]
+                size = sum(len(part) for part in parts)
+                with server._lock:
+                    server.stats.bytes_sent += size
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Content-Length", str(size))
+                self.end_headers()
+                for n, part in enumerate(parts):
+                    if n and server.config.stream_chunk_delay:
+                        time.sleep(server.config.stream_chunk_delay)
+                    self.wfile.write(part)
+                    self.wfile.flush()
+
+        return Handler
+
+    def conversation(self) -> dict[str, Any]:
+        return {
+            "id": f"conv_{self._next_id()}",
+            "object": "conversation",
+            "created_at": int(time.time()),
+            "metadata": {},
+        }
+
+    def conversation_items(self) -> dict[str, Any]:
+        # Added items are not echoed back; callers only check for success
+        return {
+            "object": "list",
+            "data": [],
+            "first_id": None,
+            "last_id": None,
+            "has_more": False,
+        }
+
+    def response(self, request: dict[str, Any]) -> dict[str, Any]:
+        """Build a Responses API payload for a create request."""
+        n = self._next_id()
+        prompt = "".join(
+            item.get("content", "")
+            for item in request.get("input", [])
+            if isinstance(item.get("content"), str)
+        )
+        tools = request.get("tools") or []
+        # A tool loop ends once the tool results come back
+        tool_outputs = [
+            item["output"]
+            for item in request.get("input", [])
+            if item.get("type") == "function_call_output"
+        ]
+        output: List[dict[str, Any]] = [
+            {
+                "type": "reasoning",
+                "id": f"rs_{n}",
+                "summary": [{"type": "summary_text", "text": f"Reasoning {n}"}],
+            }
+        ]
+        if tools and not tool_outputs and request.get("tool_choice") != "none":
+            output.append(
+                {
+                    "type": "function_call",
+                    "id": f"fc_{n}",
+                    "call_id": f"call_{n}",
+                    "name": tools[0]["name"],
+                    "arguments": json.dumps(
+                        self._tool_arguments(tools[0]["name"], prompt)
+                    ),
+                    "status": "completed",
+                }
+            )
+        else:
+            if tools and tool_outputs:
+                text = f"Found:\n{tool_outputs[0]}"
+            else:
+                text = self._text(prompt)
+            output.append(
+                {
+                    "type": "message",
+                    "id": f"msg_{n}",
+                    "role": "assistant",
+                    "status": "completed",
+                    "content": [
+                        {"type": "output_text", "text": text, "annotations": []}
+                    ],
+                }
+            )
+
+        input_tokens = estimate_tokens(json.dumps(request.get("input", [])))
+        output_tokens = estimate_tokens(json.dumps(output))
+        with self._lock:
+            self.stats.conversation_requests += "conversation" in request
+            self.stats.input_tokens += input_tokens
+            self.stats.output_tokens += output_tokens
+        return {
+            "id": f"resp_{n}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": request.get("model", "fake"),
+            "status": "completed",
+            "output": output,
+            "parallel_tool_calls": True,
+            "tool_choice": request.get("tool_choice", "auto"),
+            "tools": [],
+            "usage": {
+                "input_tokens": input_tokens,
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens": output_tokens,
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": input_tokens + output_tokens,
+            },
+        }
+
+    def _story(self, title: str) -> dict[str, Any]:
+        config = self.config
+        return {
+            "title": title,
+            "acceptance_criteria": [
+                f"Given case {j}, when the user acts, then outcome {j} is shown"
+                for j in range(config.criteria_per_story)
+            ],
+            "enriched_context": ("- context bullet\n" * config.context_chars)[
+                : config.context_chars
+            ],
+        }
+
+    def _tool_arguments(self, tool_name: str, prompt: str) -> dict[str, Any]:
+        if tool_name == "search_code":
+            question = re.search(r"<question>\n(.+?)\n</question>", prompt, re.S)
+            return {"query": question.group(1) if question else prompt}
+        if tool_name == "define_acceptance_criteria":
+            ids = re.findall(r'<story id="([^"]+)">', prompt)
+            return {
+                "stories": [
+                    {
+                        "id": story_id,
+                        "acceptance_criteria": self._story("")["acceptance_criteria"],
+                    }
+                    for story_id in ids
+                ]
+            }
+        # Breakdown prompts ask for a list; detailing prompts carry one story
+        title = re.search(
+            r"<user_story>\s*Title: (.+)|<story_title>\s*(.+?)\s*</story_title>", prompt
+        )
+        if title is None:
+            return {
+                "stories": [
+                    self._story(f"[S] As a user, I want capability {i}")
+                    for i in range(self.config.story_count)
+                ]
+            }
+        return {"stories": [self._story(title.group(1) or title.group(2))]}
+
+    def _text(self, prompt: str) -> str:
+        if prompt:
+            template = self.config.question_template
+            return "\n".join(f"{i}. {template.format(i=i)}" for i in range(1, 6))
+        return "Done."
+
+
+class FakeAskGithub:
+    """Stub of the `ask_github` module with configurable latency."""
+
+    def __init__(self, config: FakeOpenAIConfig):
+        self.config = config
+        self.calls: Counter = Counter()
+
+    def list_tree(self, repo_url: str, token: Optional[str] = None) -> List[dict]:
+        self.calls["list_tree"] += 1
+        return [
+            {"path": f"src/module_{i // 20}/file_{i}.py", "type": "blob"}
+            for i in range(self.config.repo_files)
+        ]
+
+    def ask(
+        self,
+        repo_url: str,
+        prompt: str,
+        token: Optional[str] = None,
+        max_iterations: int = 100,
+    ) -> str:
+        self.calls["ask"] += 1
+        time.sleep(self.config.ask_latency)
+        return f"Answers for {repo_url}:\n" + "\n".join(
+            f"- {line.strip()} -> src/module_0/file_0.py"
+            for line in prompt.splitlines()
+            if line.strip()
+        )
+
+    def install(self) -> types.ModuleType:
+        """Register this stub as the `ask_github` module."""
+        module = types.ModuleType("ask_github")
+        module.list_tree = self.list_tree  # type: ignore[attr-defined]
+        module.ask = self.ask  # type: ignore[attr-defined]
+        sys.modules["ask_github"] = module
+        return module
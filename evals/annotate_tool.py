@@ -6,16 +6,24 @@ app = marimo.App(width="full", css_file="molabel-patch.css")
 
 @app.cell(hide_code=True)
 def _():
+    import hashlib
     import marimo as mo
     import polars as pl
+    from pathlib import Path
     from eval import (
         StoryCardEvalItem,
         StorySetEvalItem,
         Story,
         PRD,
         TechSpec,
+        prerender_markdown,
     )
     from molabel import SimpleLabel
+    from store import EvalStore
+
+    LABELS = {"yes": True, "no": False}
+    # Cards loaded, rendered and shown at a time
+    PAGE_SIZE = 50
 
     def render_story_card_example(example: StoryCardEvalItem):
         """Render a StoryCardEvalItem example for annotation."""
@@ -48,13 +56,19 @@ def _():
         return widget
 
     return (
+        EvalStore,
+        LABELS,
+        PAGE_SIZE,
         PRD,
+        Path,
         Story,
         StoryCardEvalItem,
         TechSpec,
         create_story_card_annotation_tool,
+        hashlib,
         mo,
         pl,
+        prerender_markdown,
     )
 
 
@@ -81,50 +95,113 @@ def _(mo):
 
 
 @app.cell
-def _(eval_file, mo, pl):
-    mo.stop(eval_file.name() is None, mo.md("**Upload an eval dataset to continue**"))
+def _(mo):
+    store_dir = mo.ui.text(value="eval-store", label="Eval store")
+    project_filter = mo.ui.text(label="Project ID")
+    model_filter = mo.ui.text(label="Model")
+    unlabeled_only = mo.ui.checkbox(label="Unlabeled only")
+    mo.hstack([store_dir, project_filter, model_filter, unlabeled_only])
+    return model_filter, project_filter, store_dir, unlabeled_only
+
 
-    df = pl.read_csv(eval_file.name())
-    return (df,)
+@app.cell
+def _(EvalStore, Path, store_dir):
+    store = EvalStore(Path(store_dir.value))
+    return (store,)
 
 
 @app.cell
-def _(
-    PRD,
-    Story,
-    StoryCardEvalItem,
-    TechSpec,
-    create_story_card_annotation_tool,
-    df,
-):
-    # Parse examples from df
-    examples = []
-    for _row in df.iter_rows(named=True):
-        _prd_doc = PRD(
-            id=_row["prd_id"],
-            project_id=_row["project_id"],
-            content=_row["prd_content"],
-        )
-        _tech_doc = TechSpec(
-            id=_row["tech_spec_id"],
-            project_id=_row["project_id"],
-            content=_row["tech_spec_content"],
-        )
-        _story = Story(
-            id=_row["story_id"],
-            project_id=_row["project_id"],
-            title=_row["story_title"],
-            acceptance_criteria=_row["story_acceptance_criteria"].split("\n"),
-        )
-        examples.append(
-            StoryCardEvalItem(
-                eval_criteria="Is this a good User Story?",
+def _(PRD, Story, StoryCardEvalItem, TechSpec, eval_file, hashlib, mo, pl, store):
+    # Rows of an uploaded CSV are keyed by the file's digest, so re-running
+    # this cell finds them in the store instead of adding them again; saves
+    # then only append annotations for its items
+    imported_ids = []
+    if eval_file.name() is not None:
+        _digest = hashlib.sha256(eval_file.contents()).hexdigest()[:16]
+        _csv_items = []
+        for _row in pl.read_csv(eval_file.contents()).iter_rows(named=True):
+            _prd_doc = PRD(
+                id=_row["prd_id"],
+                project_id=_row["project_id"],
+                content=_row["prd_content"],
+            )
+            _tech_doc = TechSpec(
+                id=_row["tech_spec_id"],
                 project_id=_row["project_id"],
-                prd=_prd_doc,
-                tech_spec=_tech_doc,
-                story=_story,
+                content=_row["tech_spec_content"],
             )
+            _story = Story(
+                id=_row["story_id"],
+                project_id=_row["project_id"],
+                title=_row["story_title"],
+                acceptance_criteria=_row["story_acceptance_criteria"].split("\n"),
+            )
+            _csv_items.append(
+                StoryCardEvalItem(
+                    eval_criteria="Is this a good User Story?",
+                    project_id=_row["project_id"],
+                    prd=_prd_doc,
+                    tech_spec=_tech_doc,
+                    story=_story,
+                )
+            )
+        imported_ids = store.append_items(
+            _csv_items,
+            item_ids=[f"csv-{_digest}-{_n}" for _n in range(len(_csv_items))],
+        )
+        mo.output.replace(
+            mo.md(f"Loaded {len(imported_ids)} items from `{eval_file.name()}`")
+        )
+    return (imported_ids,)
+
+
+@app.cell
+def _(imported_ids, mo, model_filter, pl, project_filter, store, unlabeled_only):
+    # Annotate the items of an uploaded CSV, otherwise the filtered store;
+    # the frame stays lazy so only the shown page is read
+    if imported_ids:
+        items = store.items(
+            kind="story_card", unlabeled_only=unlabeled_only.value
+        ).filter(pl.col("item_id").is_in(imported_ids))
+    else:
+        items = store.items(
+            kind="story_card",
+            project_id=project_filter.value or None,
+            model=model_filter.value or None,
+            unlabeled_only=unlabeled_only.value,
         )
+    item_count = items.select(pl.len()).collect().item()
+    mo.stop(
+        item_count == 0,
+        mo.md(
+            "**Upload an eval dataset or choose a non-empty eval store to continue**"
+        ),
+    )
+    return item_count, items
+
+
+@app.cell
+def _(PAGE_SIZE, item_count, mo):
+    page_count = -(-item_count // PAGE_SIZE)
+    page = mo.ui.number(
+        start=1, stop=page_count, value=1, label=f"Page (of {page_count})"
+    )
+    page
+    return (page,)
+
+
+@app.cell
+def _(
+    PAGE_SIZE, create_story_card_annotation_tool, items, page, prerender_markdown, store
+):
+    df = items.slice((page.value - 1) * PAGE_SIZE, PAGE_SIZE).collect()
+    examples = store.load(df)
+
+    # Render this page's distinct documents up front so paging through its
+    # cards is instant
+    prerender_markdown(
+        _doc.content for _ex in examples for _doc in (_ex.prd, _ex.tech_spec)
+    )
 
     widget = create_story_card_annotation_tool(examples=examples)
     widget
@@ -165,5 +242,31 @@ def _(labeled_df):
     return
 
 
+@app.cell
+def _(mo):
+    save_button = mo.ui.run_button(label="Save annotations to store")
+    save_button
+    return (save_button,)
+
+
+@app.cell
+def _(LABELS, df, mo, save_button, store, widget):
+    mo.stop(not save_button.value)
+
+    # Annotations are appended; the latest one per item wins on load
+    item_ids = df["item_id"].to_list()
+    _annotations = widget.get_annotations()
+    store.annotate(
+        {
+            "item_id": item_ids[_annotation["index"]],
+            "label": LABELS.get(_annotation.get("_label")),
+            "notes": _annotation.get("_notes", ""),
+        }
+        for _annotation in _annotations
+    )
+    mo.md(f"Saved {len(_annotations)} annotations to `{store.root}`")
+    return
+
+
 if __name__ == "__main__":
     app.run()
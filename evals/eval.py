@@ -5,12 +5,25 @@ app = marimo.App(width="columns")
 
 with app.setup(hide_code=True):
     import marimo as mo
-    from dataclasses import dataclass, field
+    from dataclasses import asdict, dataclass, field
     from typing import List, Optional
     import uuid
     import random
+    import hashlib
+    import os
+    from collections import OrderedDict
+    from concurrent.futures import ProcessPoolExecutor
     from markdown import markdown
     from fasthtml.common import Div, H3, P, Strong, Ul, Li, NotStr
+    from pathlib import Path
+    from storymachine.codec import (
+        SCHEMA_VERSION,
+        check_schema_version,
+        read_stories,
+        story_from_dict,
+        story_to_dict,
+    )
+    from storymachine.types import Story as StoryMachineStory
 
     # Base cards
     CARD_STYLE = "border:1px solid #e0e0e0;border-radius:8px;margin:8px 0;padding:16px;"
@@ -61,6 +74,19 @@ with app.setup(hide_code=True):
         }
     }
 
+    # Rendered markdown, keyed by content hash: an in-memory LRU in front of
+    # an on-disk cache shared across sessions ("" disables the disk cache)
+    RENDER_CACHE_SIZE = 256
+    RENDER_CACHE_DIR = os.environ.get(
+        "EVAL_RENDER_CACHE",
+        str(
+            Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+            / "storymachine"
+            / "render"
+        ),
+    )
+    RENDERED: "OrderedDict[str, str]" = OrderedDict()
+
 
 @app.cell(hide_code=True)
 def _():
@@ -193,6 +219,90 @@ def md_block(html: str, dom_id: str):
     )
 
 
+@app.function
+def markdown_to_html(content: str) -> str:
+    """Render markdown with the card extensions, uncached."""
+    return markdown(content, extensions=MD_EXTS, extension_configs=MD_CFG)
+
+
+@app.function
+def render_key(content: str) -> str:
+    """Hash of the content and the render settings that produced its HTML."""
+    digest = hashlib.sha256(repr((MD_EXTS, MD_CFG)).encode())
+    digest.update(content.encode())
+    return digest.hexdigest()
+
+
+@app.function
+def render_cache_path(key: str) -> Optional[Path]:
+    """Disk path for a rendered document, or None when the disk cache is off."""
+    if not RENDER_CACHE_DIR:
+        return None
+    return Path(RENDER_CACHE_DIR) / key[:2] / f"{key}.html"
+
+
+@app.function
+def remember_render(key: str, html: str, write: bool = False) -> None:
+    """Keep a rendering in the LRU, and on disk if `write`."""
+    RENDERED[key] = html
+    RENDERED.move_to_end(key)
+    while len(RENDERED) > RENDER_CACHE_SIZE:
+        RENDERED.popitem(last=False)
+    path = render_cache_path(key)
+    if write and path is not None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(html)
+        os.replace(tmp, path)
+
+
+@app.function
+def cached_render(key: str) -> Optional[str]:
+    """A rendering from the LRU or the disk cache, if any."""
+    html = RENDERED.get(key)
+    if html is not None:
+        RENDERED.move_to_end(key)
+        return html
+    path = render_cache_path(key)
+    if path is not None and path.exists():
+        html = path.read_text()
+        remember_render(key, html)
+    return html
+
+
+@app.function
+def render_markdown(content: str) -> str:
+    """Markdown to HTML, rendering each distinct content only once."""
+    key = render_key(content)
+    html = cached_render(key)
+    if html is None:
+        html = markdown_to_html(content)
+        remember_render(key, html, write=True)
+    return html
+
+
+@app.function
+def prerender_markdown(contents, workers: Optional[int] = None) -> int:
+    """Render uncached contents across a process pool; returns how many."""
+    pending = {}
+    for content in contents:
+        if content:
+            key = render_key(content)
+            path = render_cache_path(key)
+            if key in RENDERED or (path is not None and path.exists()):
+                continue
+            pending[key] = content
+    if len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rendered = pool.map(markdown_to_html, pending.values(), chunksize=4)
+            for key, html in zip(pending, rendered):
+                remember_render(key, html, write=True)
+    else:
+        for key, content in pending.items():
+            remember_render(key, markdown_to_html(content), write=True)
+    return len(pending)
+
+
 @app.class_definition
 @dataclass
 class Project:
@@ -219,9 +329,7 @@ class PRD:
     content: str = ""
 
     def _repr_html_(self):
-        html = markdown(
-            self.content or "", extensions=MD_EXTS, extension_configs=MD_CFG
-        )
+        html = render_markdown(self.content or "")
         md_id = f"md-{self.id}"
         return str(
             Div(
@@ -252,9 +360,7 @@ class TechSpec:
     content: str = ""
 
     def _repr_html_(self):
-        html = markdown(
-            self.content or "", extensions=MD_EXTS, extension_configs=MD_CFG
-        )
+        html = render_markdown(self.content or "")
         md_id = f"md-{self.id}"
         return str(
             Div(
@@ -281,6 +387,24 @@ class Story:
     title: str = ""
     acceptance_criteria: List[str] = field(default_factory=list)
 
+    @classmethod
+    def from_storymachine(cls, story: StoryMachineStory, project_id: str = ""):
+        """Build an eval Story from a StoryMachine story, keeping its id."""
+        return cls(
+            id=story.id,
+            project_id=project_id,
+            title=story.title,
+            acceptance_criteria=list(story.acceptance_criteria),
+        )
+
+    def to_storymachine(self) -> StoryMachineStory:
+        """Convert to a StoryMachine story for encoding with storymachine.codec."""
+        return StoryMachineStory(
+            id=self.id,
+            title=self.title,
+            acceptance_criteria=list(self.acceptance_criteria),
+        )
+
     def _repr_html_(self):
         rotation = random.uniform(-1.5, 1.5)
         return str(
@@ -302,6 +426,12 @@ class Story:
         )
 
 
+@app.function
+def load_story_set(path: Path, project_id: str = "") -> List[Story]:
+    """Load stories written by `storymachine --output` as eval Stories."""
+    return [Story.from_storymachine(story, project_id) for story in read_stories(path)]
+
+
 @app.class_definition
 @dataclass
 class StoryCardEvalItem:
@@ -313,6 +443,35 @@ class StoryCardEvalItem:
     good_story: Optional[bool] = None
     eval_criteria: str = ""
 
+    def to_dict(self) -> dict:
+        """Encode as a JSON-ready dict, with the story in the codec's form."""
+        return {
+            "schema_version": SCHEMA_VERSION,
+            "project_id": self.project_id,
+            "prd": asdict(self.prd),
+            "tech_spec": asdict(self.tech_spec),
+            "story": story_to_dict(self.story.to_storymachine()),
+            "notes": self.notes,
+            "good_story": self.good_story,
+            "eval_criteria": self.eval_criteria,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "StoryCardEvalItem":
+        """Decode a dict written by `to_dict`."""
+        check_schema_version(data.get("schema_version", 0))
+        return cls(
+            project_id=data["project_id"],
+            prd=PRD(**data["prd"]),
+            tech_spec=TechSpec(**data["tech_spec"]),
+            story=Story.from_storymachine(
+                story_from_dict(data["story"]), data["project_id"]
+            ),
+            notes=data.get("notes") or "",
+            good_story=data.get("good_story"),
+            eval_criteria=data.get("eval_criteria") or "",
+        )
+
     def _repr_html_(self):
         project_html = (
             self.prd._repr_html_() if self.prd else "<div>PRD not available</div>"
@@ -393,6 +552,38 @@ class StorySetEvalItem:
     good_story_set: Optional[bool] = None
     eval_criteria: str = ""
 
+    def to_dict(self) -> dict:
+        """Encode as a JSON-ready dict, with stories in the codec's form."""
+        return {
+            "schema_version": SCHEMA_VERSION,
+            "project_id": self.project_id,
+            "prd": asdict(self.prd),
+            "tech_spec": asdict(self.tech_spec),
+            "story_set": [
+                story_to_dict(story.to_storymachine()) for story in self.story_set
+            ],
+            "notes": self.notes,
+            "good_story_set": self.good_story_set,
+            "eval_criteria": self.eval_criteria,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "StorySetEvalItem":
+        """Decode a dict written by `to_dict`."""
+        check_schema_version(data.get("schema_version", 0))
+        return cls(
+            project_id=data["project_id"],
+            prd=PRD(**data["prd"]),
+            tech_spec=TechSpec(**data["tech_spec"]),
+            story_set=[
+                Story.from_storymachine(story_from_dict(story), data["project_id"])
+                for story in data["story_set"]
+            ],
+            notes=data.get("notes") or "",
+            good_story_set=data.get("good_story_set"),
+            eval_criteria=data.get("eval_criteria") or "",
+        )
+
     def _repr_html_(self):
         project_html = (
             self.prd._repr_html_() if self.prd else "<div>PRD not available</div>"
@@ -0,0 +1,319 @@
+"""Generate eval items for a corpus of PRD / tech spec / repo triples.
+
+Each corpus item is run through the full workflow with every review
+auto-approved, concurrently and with the response cache on, so after a
+prompt change only the calls whose prompts changed go to the API. Results are
+appended to JSON lines files as items finish:
+
+- story_sets.jsonl: one `StorySetEvalItem` per corpus item
+- story_cards.jsonl: one `StoryCardEvalItem` per generated story
+- runs.jsonl: wall time, model calls, cache hits, tokens and cost per item
+
+With `--compare-fused`, the corpus is run once with two-step detailing and
+once with `FUSED_DETAILING`, into `two_step/` and `fused/` under the output
+directory, and the calls, tokens, cost and wall time of both are reported.
+Annotate both story sets to compare their quality.
+
+With `JOB_QUEUE` set, the model work is queued as batch jobs for
+`storymachine worker` processes instead of running here.
+
+The corpus is a JSON lines manifest with one object per item; paths are
+relative to the manifest:
+
+    {"name": "billing", "prd": "billing/prd.md", "tech_spec": "billing/spec.md",
+     "repo": "https://github.com/owner/repo"}
+
+Run from the evals directory:
+    uv run python runner.py corpus.jsonl --out eval-set --concurrency 16
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, TextIO, Tuple
+
+from eval import PRD, Project, Story, StoryCardEvalItem, StorySetEvalItem, TechSpec
+from storymachine.ai import new_conversation
+from storymachine.config import Settings
+from storymachine.jobs import BATCH, submitter_from_settings
+from storymachine.stats import estimate_model_costs
+from storymachine.types import FeedbackResponse, FeedbackStatus, WorkflowInput
+from storymachine.workflow import w1
+
+DEFAULT_EVAL_CRITERIA = "Is this a good User Story?"
+
+# Output subdirectory and FUSED_DETAILING value of each compared variant
+DETAILING_VARIANTS = {"two_step": "false", "fused": "true"}
+
+
+@dataclass
+class CorpusItem:
+    """One PRD / tech spec / repo triple to generate stories for."""
+
+    name: str
+    prd: Path
+    tech_spec: Path
+    repo: str
+
+
+@dataclass
+class RunRecord:
+    """Timing and cost of generating one corpus item."""
+
+    project_id: str
+    name: str
+    seconds: float
+    story_count: int
+    calls: int
+    cached_calls: int
+    input_tokens: int
+    output_tokens: int
+    cost_usd: Optional[float]
+    error: Optional[str] = None
+
+
+def load_corpus(manifest: Path) -> List[CorpusItem]:
+    """Read a JSON lines corpus manifest."""
+    items = []
+    for line in manifest.read_text().splitlines():
+        if not line.strip():
+            continue
+        data = json.loads(line)
+        items.append(
+            CorpusItem(
+                name=data["name"],
+                prd=manifest.parent / data["prd"],
+                tech_spec=manifest.parent / data["tech_spec"],
+                repo=data["repo"],
+            )
+        )
+    return items
+
+
+def approve() -> FeedbackResponse:
+    """Approve every review, for unattended runs."""
+    return FeedbackResponse(status=FeedbackStatus.ACCEPTED)
+
+
+async def run_item(
+    item: CorpusItem,
+    semaphore: asyncio.Semaphore,
+    eval_criteria: str,
+) -> Tuple[StorySetEvalItem, List[StoryCardEvalItem], RunRecord]:
+    """Run the workflow for one corpus item and build its eval records."""
+    async with semaphore:
+        # Each item runs in its own task, so this conversation is its own
+        conversation = new_conversation()
+        project = Project(name=item.name, description=item.repo)
+        prd = PRD(project_id=project.id, content=item.prd.read_text())
+        tech_spec = TechSpec(project_id=project.id, content=item.tech_spec.read_text())
+
+        start = time.perf_counter()
+        error = None
+        try:
+            stories = await w1(
+                WorkflowInput(
+                    prd_content=prd.content,
+                    tech_spec_content=tech_spec.content,
+                    repo_url=item.repo,
+                ),
+                review=approve,
+                console=False,
+                # With JOB_QUEUE set, model work goes to the workers behind
+                # any interactive sessions
+                jobs=submitter_from_settings(
+                    Settings(),  # pyright: ignore[reportCallIssue]
+                    uuid.uuid4().hex,
+                    BATCH,
+                ),
+            )
+        except Exception as e:
+            stories, error = [], repr(e)
+        seconds = time.perf_counter() - start
+
+    story_set = [Story.from_storymachine(story, project.id) for story in stories]
+    record = RunRecord(
+        project_id=project.id,
+        name=item.name,
+        seconds=seconds,
+        story_count=len(story_set),
+        calls=conversation.calls,
+        cached_calls=conversation.cached_calls,
+        input_tokens=conversation.input_tokens,
+        output_tokens=conversation.output_tokens,
+        # Each stage is priced by the model it was routed to
+        cost_usd=estimate_model_costs(conversation.model_tokens),
+        error=error,
+    )
+    set_item = StorySetEvalItem(
+        project_id=project.id,
+        prd=prd,
+        tech_spec=tech_spec,
+        story_set=story_set,
+    )
+    card_items = [
+        StoryCardEvalItem(
+            project_id=project.id,
+            prd=prd,
+            tech_spec=tech_spec,
+            story=story,
+            eval_criteria=eval_criteria,
+        )
+        for story in story_set
+    ]
+    return set_item, card_items, record
+
+
+def _append(out: TextIO, data: dict) -> None:
+    out.write(json.dumps(data) + "\n")
+    out.flush()
+
+
+async def run_corpus(
+    items: List[CorpusItem],
+    out_dir: Path,
+    concurrency: int,
+    eval_criteria: str = DEFAULT_EVAL_CRITERIA,
+    report: TextIO = sys.stderr,
+) -> List[RunRecord]:
+    """Run all items with bounded concurrency, writing records as they finish."""
+    # Activities run in worker threads; leave room for every in-flight item
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=concurrency + 4)
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    records: List[RunRecord] = []
+    start = time.perf_counter()
+
+    with (
+        open(out_dir / "story_sets.jsonl", "a") as sets_out,
+        open(out_dir / "story_cards.jsonl", "a") as cards_out,
+        open(out_dir / "runs.jsonl", "a") as runs_out,
+    ):
+        tasks = [
+            asyncio.create_task(run_item(item, semaphore, eval_criteria))
+            for item in items
+        ]
+        for done in asyncio.as_completed(tasks):
+            set_item, card_items, record = await done
+            _append(sets_out, set_item.to_dict())
+            for card in card_items:
+                _append(cards_out, card.to_dict())
+            _append(runs_out, asdict(record))
+            records.append(record)
+
+            status = f"failed: {record.error}" if record.error else "ok"
+            print(
+                f"[{len(records)}/{len(items)}] {record.name}: "
+                f"{record.story_count} stories, {record.seconds:.1f}s, "
+                f"{record.cached_calls}/{record.calls} cached, {status}",
+                file=report,
+            )
+
+    cost = sum(record.cost_usd or 0.0 for record in records)
+    print(
+        f"{len(records)} items in {time.perf_counter() - start:.1f}s, ${cost:.2f}",
+        file=report,
+    )
+    return records
+
+
+async def compare_fused(
+    items: List[CorpusItem],
+    out_dir: Path,
+    concurrency: int,
+    eval_criteria: str = DEFAULT_EVAL_CRITERIA,
+    report: TextIO = sys.stderr,
+) -> Dict[str, List[RunRecord]]:
+    """Run the corpus with two-step and with fused detailing, and compare them."""
+    results: Dict[str, List[RunRecord]] = {}
+    previous = os.environ.get("FUSED_DETAILING")
+    try:
+        for variant, fused in DETAILING_VARIANTS.items():
+            # The workflow reads its settings at the start of each run
+            os.environ["FUSED_DETAILING"] = fused
+            print(f"{variant}:", file=report)
+            results[variant] = await run_corpus(
+                items, out_dir / variant, concurrency, eval_criteria, report
+            )
+    finally:
+        if previous is None:
+            os.environ.pop("FUSED_DETAILING", None)
+        else:
+            os.environ["FUSED_DETAILING"] = previous
+
+    print(
+        f"{'variant':<10} {'calls':>7} {'input':>10} {'output':>10} "
+        f"{'cost':>9} {'seconds':>9}",
+        file=report,
+    )
+    for variant, records in results.items():
+        print(
+            f"{variant:<10} {sum(r.calls for r in records):>7} "
+            f"{sum(r.input_tokens for r in records):>10} "
+            f"{sum(r.output_tokens for r in records):>10} "
+            f"{sum(r.cost_usd or 0.0 for r in records):>9.2f} "
+            f"{sum(r.seconds for r in records):>9.1f}",
+            file=report,
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").splitlines()[0])
+    parser.add_argument("corpus", type=Path, help="JSON lines corpus manifest")
+    parser.add_argument("--out", type=Path, default=Path("eval-set"))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=Path(".eval-cache"),
+        help="Response cache directory (reused across runs)",
+    )
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--eval-criteria", default=DEFAULT_EVAL_CRITERIA)
+    parser.add_argument(
+        "--compare-fused",
+        action="store_true",
+        help="Run the corpus with two-step and with fused detailing",
+    )
+    args = parser.parse_args()
+
+    if not args.no_cache:
+        os.environ["RESPONSE_CACHE_DIR"] = str(args.cache_dir)
+    items = load_corpus(args.corpus)
+
+    # The workflow narrates to stdout and stderr; keep only our report
+    report = sys.stderr
+    with (
+        open(os.devnull, "w") as devnull,
+        contextlib.redirect_stdout(devnull),
+        contextlib.redirect_stderr(devnull),
+    ):
+        if args.compare_fused:
+            results = asyncio.run(
+                compare_fused(
+                    items, args.out, args.concurrency, args.eval_criteria, report
+                )
+            )
+            records = [record for variant in results.values() for record in variant]
+        else:
+            records = asyncio.run(
+                run_corpus(
+                    items, args.out, args.concurrency, args.eval_criteria, report
+                )
+            )
+    sys.exit(1 if any(record.error for record in records) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""Columnar, append-only store for eval items and annotations.
+
+Eval data lives in Parquet files under one root directory, one subdirectory
+per table:
+
+- documents: PRD and tech spec texts, stored once however many items use them
+- stories: generated stories
+- items: story card and story set eval items, referencing the two above
+- annotations: labels and notes, appended on every save; the latest
+  annotation per item wins
+
+Every write adds a new Parquet file, so writers never rewrite existing data
+and annotation saves stay cheap. Reads are lazy `polars.scan_parquet` scans:
+filters by project, model or kind are pushed down into the scan, and eval
+dataclasses are only built for the rows actually selected.
+
+The table schemas below are the stable on-disk format; add columns only as
+nullable, at the end.
+"""
+
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+import polars as pl
+
+from eval import PRD, Story, StoryCardEvalItem, StorySetEvalItem, TechSpec
+
+SCHEMAS: Dict[str, Dict[str, pl.DataType]] = {
+    "documents": {
+        "document_id": pl.String(),
+        "project_id": pl.String(),
+        "kind": pl.String(),  # "prd" or "tech_spec"
+        "content": pl.String(),
+    },
+    "stories": {
+        "story_id": pl.String(),
+        "project_id": pl.String(),
+        "title": pl.String(),
+        "acceptance_criteria": pl.List(pl.String()),
+    },
+    "items": {
+        "item_id": pl.String(),
+        "kind": pl.String(),  # "story_card" or "story_set"
+        "project_id": pl.String(),
+        "project_name": pl.String(),
+        "model": pl.String(),
+        "prd_id": pl.String(),
+        "tech_spec_id": pl.String(),
+        "story_ids": pl.List(pl.String()),
+        "eval_criteria": pl.String(),
+        "created_at": pl.Datetime("us", "UTC"),
+    },
+    "annotations": {
+        "item_id": pl.String(),
+        "label": pl.Boolean(),
+        "notes": pl.String(),
+        "annotator": pl.String(),
+        "annotated_at": pl.Datetime("us", "UTC"),
+    },
+}
+
+EvalItem = Union[StoryCardEvalItem, StorySetEvalItem]
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class EvalStore:
+    """Parquet-backed eval items and annotations under `root`."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def _write(self, table: str, rows: List[dict]) -> None:
+        """Append rows to a table as a new Parquet file."""
+        if not rows:
+            return
+        directory = self.root / table
+        directory.mkdir(parents=True, exist_ok=True)
+        frame = pl.DataFrame(rows, schema=SCHEMAS[table])
+        name = f"part-{_now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.parquet"
+        tmp = directory / f".{name}.tmp"
+        frame.write_parquet(tmp, compression="zstd")
+        # Readers only pick up complete files
+        os.replace(tmp, directory / name)
+
+    def scan(self, table: str) -> pl.LazyFrame:
+        """Lazily scan every file of a table."""
+        directory = self.root / table
+        if not any(directory.glob("*.parquet")):
+            return pl.LazyFrame(schema=SCHEMAS[table])
+        return pl.scan_parquet(directory / "*.parquet", schema=SCHEMAS[table])
+
+    def append_items(
+        self,
+        items: Iterable[EvalItem],
+        model: str = "",
+        project_name: str = "",
+        item_ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Add eval items with their documents and stories; returns item ids.
+
+        With `item_ids`, items whose id is already in the store are skipped,
+        so importing the same items again adds nothing.
+        """
+        items = list(items)
+        ids = item_ids or [uuid.uuid4().hex for _ in items]
+        existing = set()
+        if item_ids:
+            existing = set(
+                self.scan("items")
+                .filter(pl.col("item_id").is_in(item_ids))
+                .select("item_id")
+                .collect()["item_id"]
+            )
+        documents: Dict[str, dict] = {}
+        stories: Dict[str, dict] = {}
+        rows: List[dict] = []
+        created_at = _now()
+        for item_id, item in zip(ids, items):
+            if item_id in existing:
+                continue
+            for kind, doc in (("prd", item.prd), ("tech_spec", item.tech_spec)):
+                documents[doc.id] = {
+                    "document_id": doc.id,
+                    "project_id": doc.project_id,
+                    "kind": kind,
+                    "content": doc.content,
+                }
+            if isinstance(item, StoryCardEvalItem):
+                kind, item_stories = "story_card", [item.story]
+            else:
+                kind, item_stories = "story_set", item.story_set
+            for story in item_stories:
+                stories[story.id] = {
+                    "story_id": story.id,
+                    "project_id": story.project_id,
+                    "title": story.title,
+                    "acceptance_criteria": list(story.acceptance_criteria),
+                }
+            rows.append(
+                {
+                    "item_id": item_id,
+                    "kind": kind,
+                    "project_id": item.project_id,
+                    "project_name": project_name,
+                    "model": model,
+                    "prd_id": item.prd.id,
+                    "tech_spec_id": item.tech_spec.id,
+                    "story_ids": [story.id for story in item_stories],
+                    "eval_criteria": item.eval_criteria,
+                    "created_at": created_at,
+                }
+            )
+
+        # Referenced rows first, so a reader never sees dangling item ids
+        self._write("documents", list(documents.values()))
+        self._write("stories", list(stories.values()))
+        self._write("items", rows)
+        return ids
+
+    def annotate(
+        self,
+        annotations: Iterable[dict],
+        annotator: str = "",
+    ) -> None:
+        """Append annotations: dicts with item_id, label and optional notes."""
+        annotated_at = _now()
+        self._write(
+            "annotations",
+            [
+                {
+                    "item_id": annotation["item_id"],
+                    "label": annotation.get("label"),
+                    "notes": annotation.get("notes") or "",
+                    "annotator": annotator,
+                    "annotated_at": annotated_at,
+                }
+                for annotation in annotations
+            ],
+        )
+
+    def latest_annotations(self) -> pl.LazyFrame:
+        """The most recent annotation of each item."""
+        return (
+            self.scan("annotations")
+            .sort("annotated_at")
+            .unique(subset="item_id", keep="last")
+        )
+
+    def items(
+        self,
+        kind: Optional[str] = None,
+        project_id: Optional[str] = None,
+        model: Optional[str] = None,
+        unlabeled_only: bool = False,
+    ) -> pl.LazyFrame:
+        """Items matching the filters, with their latest label and notes."""
+        frame = self.scan("items")
+        if kind is not None:
+            frame = frame.filter(pl.col("kind") == kind)
+        if project_id is not None:
+            frame = frame.filter(pl.col("project_id") == project_id)
+        if model is not None:
+            frame = frame.filter(pl.col("model") == model)
+        frame = frame.join(
+            self.latest_annotations().select("item_id", "label", "notes"),
+            on="item_id",
+            how="left",
+        )
+        if unlabeled_only:
+            frame = frame.filter(pl.col("label").is_null())
+        # Items of one import share created_at; the id keeps pages stable
+        return frame.sort("created_at", "item_id")
+
+    def load(self, items: pl.DataFrame) -> List[EvalItem]:
+        """Build eval dataclasses for selected item rows (from `items()`)."""
+        if items.is_empty():
+            return []
+        doc_ids = set(items["prd_id"]) | set(items["tech_spec_id"])
+        story_ids = set(items["story_ids"].explode().drop_nulls())
+        documents = {
+            row["document_id"]: row
+            for row in self.scan("documents")
+            .filter(pl.col("document_id").is_in(list(doc_ids)))
+            .unique(subset="document_id")
+            .collect()
+            .iter_rows(named=True)
+        }
+        stories = {
+            row["story_id"]: Story(
+                id=row["story_id"],
+                project_id=row["project_id"],
+                title=row["title"],
+                acceptance_criteria=row["acceptance_criteria"],
+            )
+            for row in self.scan("stories")
+            .filter(pl.col("story_id").is_in(list(story_ids)))
+            .unique(subset="story_id")
+            .collect()
+            .iter_rows(named=True)
+        }
+
+        # Items of one project share their document objects
+        prds: Dict[str, PRD] = {}
+        tech_specs: Dict[str, TechSpec] = {}
+        loaded: List[EvalItem] = []
+        for row in items.iter_rows(named=True):
+            prd = prds.get(row["prd_id"])
+            if prd is None:
+                doc = documents[row["prd_id"]]
+                prd = prds[row["prd_id"]] = PRD(
+                    id=doc["document_id"],
+                    project_id=doc["project_id"],
+                    content=doc["content"],
+                )
+            tech_spec = tech_specs.get(row["tech_spec_id"])
+            if tech_spec is None:
+                doc = documents[row["tech_spec_id"]]
+                tech_spec = tech_specs[row["tech_spec_id"]] = TechSpec(
+                    id=doc["document_id"],
+                    project_id=doc["project_id"],
+                    content=doc["content"],
+                )
+            item_stories = [stories[story_id] for story_id in row["story_ids"]]
+            notes = row.get("notes") or ""
+            eval_criteria = row["eval_criteria"] or ""
+            if row["kind"] == "story_card":
+                loaded.append(
+                    StoryCardEvalItem(
+                        project_id=row["project_id"],
+                        prd=prd,
+                        tech_spec=tech_spec,
+                        story=item_stories[0],
+                        notes=notes,
+                        good_story=row.get("label"),
+                        eval_criteria=eval_criteria,
+                    )
+                )
+            else:
+                loaded.append(
+                    StorySetEvalItem(
+                        project_id=row["project_id"],
+                        prd=prd,
+                        tech_spec=tech_spec,
+                        story_set=item_stories,
+                        notes=notes,
+                        good_story_set=row.get("label"),
+                        eval_criteria=eval_criteria,
+                    )
+                )
+        return loaded
+
+    def import_runner_output(self, directory: Path, model: str = "") -> int:
+        """Append the story set and card items written by `runner.py`."""
+        items: List[EvalItem] = []
+        for name, cls in (
+            ("story_sets.jsonl", StorySetEvalItem),
+            ("story_cards.jsonl", StoryCardEvalItem),
+        ):
+            path = Path(directory) / name
+            if not path.exists():
+                continue
+            for line in path.read_text().splitlines():
+                if line.strip():
+                    items.append(cls.from_dict(json.loads(line)))
+        self.append_items(items, model=model)
+        return len(items)
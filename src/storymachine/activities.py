@@ -1,12 +1,11 @@
 """Individual workflow activities for StoryMachine."""
 
-import itertools
+import asyncio
 import json
-import sys
-import time
-from contextlib import contextmanager
-from threading import Event, Thread
-from typing import List
+import re
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Callable, List, Optional
 
 from openai.types.responses import (
     ToolParam,
@@ -16,38 +15,22 @@ from openai.types.responses import (
 from .ai import (
     get_prompt,
     call_openai_api,
+    call_openai_chained,
     extract_reasoning_summaries,
     display_reasoning_summaries,
+    estimate_tokens,
+    side_conversation,
 )
+from .cassette import through
+from .codec import story_from_dict
+from .console import echo
+from .singleflight import coalesce, shared_flights
+from .streaming import StoryStreamParser, recover_stories
+from .tracing import span
 from .types import FeedbackResponse, Story, WorkflowInput, FeedbackStatus
 from .logging import get_logger
 
 
-@contextmanager
-def spinner(text="Loading", delay=0.1, stream=sys.stderr):
-    """Display a spinner while executing code."""
-    stop = Event()
-
-    def run():
-        stream.write("\x1b[?25l")  # hide cursor
-        for c in itertools.cycle("|/-\\"):
-            if stop.is_set():
-                break
-            stream.write(f"\r{c} {text}")
-            stream.flush()
-            time.sleep(delay)
-
-    t = Thread(target=run, daemon=True)
-    t.start()
-    try:
-        yield
-    finally:
-        stop.set()
-        t.join()
-        stream.write("\r\x1b[2K\x1b[?25h")  # clear line + show cursor
-        stream.flush()
-
-
 CREATE_STORIES_TOOL: ToolParam = {
     "type": "function",
     "name": "create_stories",
@@ -86,19 +69,130 @@ CREATE_STORIES_TOOL: ToolParam = {
 }
 
 
+DEFINE_ACCEPTANCE_CRITERIA_TOOL: ToolParam = {
+    "type": "function",
+    "name": "define_acceptance_criteria",
+    "description": "Set the acceptance criteria for a batch of user stories",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "stories": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "id": {
+                            "type": "string",
+                            "description": "The id of the user story, exactly as given",
+                        },
+                        "acceptance_criteria": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "The acceptance criteria for the user story",
+                        },
+                    },
+                    "required": ["id", "acceptance_criteria"],
+                    "additionalProperties": False,
+                },
+            }
+        },
+        "required": ["stories"],
+        "additionalProperties": False,
+    },
+    "strict": True,
+}
+
+
+LOCAL_REPO_TOOLS: List[ToolParam] = [
+    {
+        "type": "function",
+        "name": "search_code",
+        "description": "Find the files whose paths and contents best match some keywords, with their matching lines",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "Identifiers or distinctive words to look for",
+                },
+            },
+            "required": ["query"],
+            "additionalProperties": False,
+        },
+        "strict": True,
+    },
+    {
+        "type": "function",
+        "name": "list_files",
+        "description": "List the files under a directory of the repository",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "directory": {
+                    "type": "string",
+                    "description": "Directory relative to the repository root, or an empty string for all files",
+                },
+            },
+            "required": ["directory"],
+            "additionalProperties": False,
+        },
+        "strict": True,
+    },
+    {
+        "type": "function",
+        "name": "read_file",
+        "description": "Read a range of numbered lines of a file",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "path": {
+                    "type": "string",
+                    "description": "File path relative to the repository root",
+                },
+                "start_line": {"type": "integer", "description": "First line, from 1"},
+                "end_line": {"type": "integer", "description": "Last line"},
+            },
+            "required": ["path", "start_line", "end_line"],
+            "additionalProperties": False,
+        },
+        "strict": True,
+    },
+]
+
+
 def parse_stories_from_response(response) -> List[Story]:
     """Parse stories from OpenAI response."""
     logger = get_logger()
-    stories = [
-        Story(**story_data)
-        for output in response.output
-        if output.type == "function_call"
-        for story_data in json.loads(output.arguments)["stories"]
-    ]
+    stories: List[Story] = []
+    for output in response.output:
+        if output.type != "function_call":
+            continue
+        try:
+            arguments = json.loads(output.arguments)
+        except json.JSONDecodeError:
+            # Truncated output: keep every story that was written out completely
+            recovered = recover_stories(output.arguments)
+            logger.warning("stories_truncated", recovered=len(recovered))
+            stories.extend(recovered)
+            continue
+        stories.extend(
+            story_from_dict(story_data) for story_data in arguments["stories"]
+        )
     logger.info("stories_parsed", count=len(stories))
     return stories
 
 
+def record_story_ids(stories: List[Story]) -> List[Story]:
+    """Pass the ids of newly generated stories through the active cassette.
+
+    Ids appear in batched prompts, so a replay must reuse the recorded ones.
+    """
+    return [
+        replace(story, id=through("story_id", None, lambda story=story: story.id))
+        for story in stories
+    ]
+
+
 def parse_text_from_response(response) -> str:
     """Parse text content from OpenAI response."""
     text_content = ""
@@ -111,14 +205,124 @@ def parse_text_from_response(response) -> str:
     return text_content
 
 
+# A list item: "- ", "* ", "1. " or "1) "
+_LIST_ITEM = re.compile(r"^(\s*)(?:[-*•]|\d+[.)])\s+")
+
+
+def split_questions(text: str) -> List[str]:
+    """Split generated questions into separate questions.
+
+    Each top-level list item is a question; indented items and plain lines
+    under it belong to it. Headings are dropped. Text without a list is
+    one question.
+    """
+    questions: List[List[str]] = []
+    in_item = False
+    for line in text.splitlines():
+        stripped = line.strip()
+        item = _LIST_ITEM.match(line)
+        if item and not item.group(1):
+            questions.append([stripped[item.end() :].strip()])
+            in_item = True
+        elif stripped.startswith("#"):
+            in_item = False
+        elif stripped and in_item:
+            questions[-1].append(stripped)
+    if not questions and text.strip():
+        return [text.strip()]
+    return [" ".join(parts) for parts in questions]
+
+
+def merge_answers(questions: List[str], answers: List[str]) -> str:
+    """Repository context with one section per question."""
+    return "\n\n".join(
+        f"## {question}\n\n{answer.strip()}"
+        for question, answer in zip(questions, answers)
+    )
+
+
+def run_local_repo_tool(root: Path, paths: List[str], name: str, arguments: str) -> str:
+    """Run one of LOCAL_REPO_TOOLS against a checkout."""
+    from .localrepo import answer_question, list_files, read_lines
+
+    try:
+        args = json.loads(arguments)
+        if name == "search_code":
+            return answer_question(root, args["query"], paths)
+        if name == "list_files":
+            return list_files(paths, args["directory"])
+        if name == "read_file":
+            # Only listed files, so paths cannot leave the checkout
+            if args["path"] not in paths:
+                return f"{args['path']} is not a file of the repository."
+            return read_lines(
+                root, args["path"], int(args["start_line"]), int(args["end_line"])
+            )
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+        return f"Invalid arguments for {name}: {arguments}"
+    return f"Unknown tool: {name}"
+
+
+def ask_local_repo(
+    root: Path, question: str, paths: List[str], max_iterations: int
+) -> str:
+    """Answer a codebase question about a checkout on disk with a model.
+
+    The model searches, lists and reads the checkout's files until it can
+    answer, in at most `max_iterations` calls; the last call has no tools.
+    The calls are chained to each other in a side conversation rather than
+    added to the workflow's, and their usage counts towards the run's.
+    """
+    request_input: List[Any] = [
+        {
+            "role": "user",
+            "content": get_prompt(
+                "local_repo_question.md", question=question, file_count=len(paths)
+            ),
+        }
+    ]
+    previous_response_id: Optional[str] = None
+    text = ""
+    with side_conversation():
+        for iteration in range(1, max(max_iterations, 1) + 1):
+            final = iteration >= max_iterations
+            response = call_openai_chained(
+                request_input,
+                LOCAL_REPO_TOOLS,
+                route="local_repo",
+                previous_response_id=previous_response_id,
+                tool_choice="none" if final else "auto",
+            )
+            calls = getattr(response, "_function_calls", [])
+            text = parse_text_from_response(response)
+            if not calls:
+                break
+            previous_response_id = response.id
+            request_input = [
+                {
+                    "type": "function_call_output",
+                    "call_id": call.call_id,
+                    "output": run_local_repo_tool(
+                        root, paths, call.name, call.arguments
+                    ),
+                }
+                for call in calls
+            ]
+    return text or "No answer found in the local checkout."
+
+
 async def get_codebase_context(workflow_input: WorkflowInput) -> str:
-    """Get codebase context questions based on PRD and tech spec."""
-    from ask_github import ask, list_tree
+    """Get codebase context questions based on PRD and tech spec.
 
+    Blocking calls run in worker threads so the event loop stays responsive.
+    """
     from .config import Settings
+    from .localrepo import local_repo_path, scan_tree
+    from .repoindex import open_index
 
     logger = get_logger()
     settings = Settings()  # pyright: ignore[reportCallIssue]
+    flights = shared_flights(settings)
     logger.info("codebase_context_started")
 
     # Step 1: Determine which token to use based on repo URL
@@ -128,9 +332,40 @@ async def get_codebase_context(workflow_input: WorkflowInput) -> str:
     else:
         token = settings.github_token
 
+    # A checkout on disk is scanned and read directly, without the API
+    local_root = local_repo_path(workflow_input.repo_url)
+    file_paths: List[str] = []
+
+    def list_tree() -> List[dict]:
+        if local_root is not None:
+            return scan_tree(local_root)
+        from ask_github import list_tree
+
+        return list_tree(workflow_input.repo_url, token=token)
+
+    def ask(prompt: str, max_iterations: int) -> str:
+        if local_root is not None:
+            return ask_local_repo(local_root, prompt, file_paths, max_iterations)
+        from ask_github import ask
+
+        return ask(
+            repo_url=workflow_input.repo_url,
+            prompt=prompt,
+            token=token,
+            max_iterations=max_iterations,
+        )
+
     # Step 2: Get repository tree structure (only files/blobs)
-    tree = list_tree(workflow_input.repo_url, token=token)
-    file_paths = [item["path"] for item in tree if item.get("type") == "blob"]
+    with span("list_tree") as tree_span:
+        tree = await asyncio.to_thread(
+            coalesce,
+            flights,
+            "list_tree",
+            (workflow_input.repo_url, token),
+            lambda: through("list_tree", workflow_input.repo_url, list_tree),
+        )
+        tree_span.set(items=len(tree))
+    file_paths.extend(item["path"] for item in tree if item.get("type") == "blob")
     repo_structure = "\n".join(file_paths)
     logger.info(
         "repo_tree_retrieved", total_items=len(tree), file_count=len(file_paths)
@@ -144,18 +379,98 @@ async def get_codebase_context(workflow_input: WorkflowInput) -> str:
         repo_structure=repo_structure,
     )
 
-    response = call_openai_api(prompt)
-    questions = parse_text_from_response(response)
+    with span("repo_questions", prompt_chars=len(prompt)):
+        response = await asyncio.to_thread(
+            call_openai_api, prompt, route="repo_questions"
+        )
+        questions = parse_text_from_response(response)
 
     logger.info("codebase_questions_generated", questions_length=len(questions))
 
-    # Step 4: Use ask-github to query the repository
-    codebase_context = ask(
-        repo_url=workflow_input.repo_url,
-        prompt=questions,
-        token=token,
-        max_iterations=100,
-    )
+    def ask_repo(prompt: str, max_iterations: int) -> str:
+        return coalesce(
+            flights,
+            "ask",
+            (workflow_input.repo_url, token, prompt),
+            lambda: through(
+                "ask",
+                [workflow_input.repo_url, prompt],
+                lambda: ask(prompt, max_iterations),
+            ),
+        )
+
+    # Step 4: Answer what the symbol index can, if the repository has one
+    question_list = split_questions(questions)
+    index = await asyncio.to_thread(open_index, local_root, settings.repo_index)
+    indexed: dict[int, str] = {}
+    if index is not None:
+
+        def lookup_all() -> List[Optional[str]]:
+            try:
+                return [
+                    through("repo_index", q, lambda: index.answer(q))
+                    for q in question_list
+                ]
+            finally:
+                index.close()
+
+        with span("repo_index", questions=len(question_list)) as index_span:
+            found = await asyncio.to_thread(lookup_all)
+            indexed = {i: text for i, text in enumerate(found) if text is not None}
+            index_span.set(answered=len(indexed))
+        logger.info(
+            "codebase_questions_indexed",
+            question_count=len(question_list),
+            answered=len(indexed),
+        )
+
+    # Step 5: Use ask-github for what the index left, in one run or one per question
+    asked = [i for i in range(len(question_list)) if i not in indexed]
+    if not settings.split_codebase_questions or len(asked) < 2:
+        remaining = [question_list[i] for i in asked]
+        prompt = questions
+        if indexed:
+            # Only the questions the index could not answer share the run
+            prompt = "\n".join(f"- {question}" for question in remaining)
+            if len(remaining) == 1:
+                prompt = remaining[0]
+        codebase_context = ""
+        if asked or not indexed:
+            with span("ask", questions_chars=len(prompt)) as ask_span:
+                codebase_context = await asyncio.to_thread(ask_repo, prompt, 100)
+                ask_span.set(context_chars=len(codebase_context))
+        if indexed:
+            headings = dict(enumerate(question_list))
+            if asked:
+                indexed[asked[0]] = codebase_context
+                headings[asked[0]] = " ".join(remaining)
+            order = sorted(indexed)
+            codebase_context = merge_answers(
+                [headings[i] for i in order], [indexed[i] for i in order]
+            )
+    else:
+        concurrency = settings.ask_concurrency
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def answer(number: int, question: str) -> str:
+            async with semaphore:
+                with span("ask", question_index=number) as ask_span:
+                    text = await asyncio.to_thread(
+                        ask_repo, question, settings.ask_max_iterations
+                    )
+                    ask_span.set(context_chars=len(text))
+            return text
+
+        logger.info(
+            "codebase_questions_split",
+            question_count=len(question_list),
+            concurrency=concurrency,
+        )
+        answers = await asyncio.gather(*(answer(i, question_list[i]) for i in asked))
+        indexed.update(zip(asked, answers))
+        codebase_context = merge_answers(
+            question_list, [indexed[i] for i in range(len(question_list))]
+        )
 
     logger.info(
         "codebase_context_completed",
@@ -169,8 +484,13 @@ def problem_break_down(
     workflow_input: WorkflowInput,
     stories: List[Story],
     comments: str = "",
+    on_story: Optional[Callable[[Story], None]] = None,
 ) -> List[Story]:
-    """Break down the problem into user stories."""
+    """Break down the problem into user stories.
+
+    If `on_story` is given, the response is streamed and it is called with each
+    story as soon as the model has finished writing it.
+    """
     logger = get_logger()
     is_revision = bool(stories)
     logger.info("problem_breakdown_started", is_revision=is_revision)
@@ -187,14 +507,35 @@ def problem_break_down(
             repo_context=workflow_input.repo_context or "",
         )
 
-    # Call OpenAI API and parse response
-    response = call_openai_api(prompt, [CREATE_STORIES_TOOL])
+    if on_story is None:
+        # Call OpenAI API and parse response
+        response = call_openai_api(
+            prompt, [CREATE_STORIES_TOOL], route="problem_break_down"
+        )
+
+        # Display reasoning summaries
+        reasoning_summaries = extract_reasoning_summaries(response)
+        display_reasoning_summaries(reasoning_summaries)
+
+        return record_story_ids(parse_stories_from_response(response))
+
+    # Stream the tool arguments, handing over each story once it is complete
+    parser = StoryStreamParser()
+
+    def on_arguments_delta(delta: str) -> None:
+        for story in parser.feed(delta):
+            on_story(story)
+
+    response = call_openai_api(
+        prompt, [CREATE_STORIES_TOOL], on_arguments_delta, route="problem_break_down"
+    )
 
     # Display reasoning summaries
     reasoning_summaries = extract_reasoning_summaries(response)
     display_reasoning_summaries(reasoning_summaries)
 
-    return parse_stories_from_response(response)
+    logger.info("stories_parsed", count=len(parser.items), streamed=True)
+    return record_story_ids(parser.items)
 
 
 def enrich_context(
@@ -221,7 +562,7 @@ def enrich_context(
     )
 
     # Call OpenAI API and parse response
-    response = call_openai_api(prompt, [CREATE_STORIES_TOOL])
+    response = call_openai_api(prompt, [CREATE_STORIES_TOOL], route="enrich_context")
 
     # Display reasoning summaries
     reasoning_summaries = extract_reasoning_summaries(response)
@@ -229,8 +570,8 @@ def enrich_context(
 
     updated_stories = parse_stories_from_response(response)
 
-    # Return the first (and should be only) story from the response
-    return updated_stories[0] if updated_stories else story
+    # Return the first (and should be only) story from the response, keeping its id
+    return replace(updated_stories[0], id=story.id) if updated_stories else story
 
 
 def define_acceptance_criteria(
@@ -251,7 +592,9 @@ def define_acceptance_criteria(
     )
 
     # Call OpenAI API and parse response
-    response = call_openai_api(prompt, [CREATE_STORIES_TOOL])
+    response = call_openai_api(
+        prompt, [CREATE_STORIES_TOOL], route="acceptance_criteria"
+    )
 
     # Display reasoning summaries
     reasoning_summaries = extract_reasoning_summaries(response)
@@ -259,12 +602,143 @@ def define_acceptance_criteria(
 
     updated_stories = parse_stories_from_response(response)
 
-    # Return the first (and should be only) story from the response
-    return updated_stories[0] if updated_stories else story
+    # Return the first (and should be only) story from the response, keeping its id
+    return replace(updated_stories[0], id=story.id) if updated_stories else story
+
+
+def detail_story(
+    story: Story,
+    workflow_input: WorkflowInput,
+    comments: str = "",
+) -> Story:
+    """Define acceptance criteria and enrich context for a story in one call."""
+    logger = get_logger()
+    is_revision = bool(comments)
+    logger.info(
+        "detail_story_started", story_title=story.title, is_revision=is_revision
+    )
+
+    # One combined prompt replaces the acceptance criteria + enrich context pair
+    user_story_text = f"Title: {story.title}\nAcceptance Criteria: {', '.join(story.acceptance_criteria)}"
+    prompt = get_prompt(
+        "detail_story.md",
+        user_story=user_story_text,
+        comments=comments,
+        prd_content=workflow_input.prd_content,
+        tech_spec_content=workflow_input.tech_spec_content,
+        repo_context=workflow_input.repo_context or "",
+    )
+
+    # Call OpenAI API and parse response
+    response = call_openai_api(prompt, [CREATE_STORIES_TOOL], route="detail_story")
+
+    # Display reasoning summaries
+    reasoning_summaries = extract_reasoning_summaries(response)
+    display_reasoning_summaries(reasoning_summaries)
+
+    updated_stories = parse_stories_from_response(response)
+
+    # Return the first (and should be only) story from the response, keeping its id
+    return replace(updated_stories[0], id=story.id) if updated_stories else story
+
+
+def format_story_for_batch(story: Story) -> str:
+    """Format a story with its id for a batched prompt."""
+    criteria = "\n".join(f"- {ac}" for ac in story.acceptance_criteria)
+    return f'<story id="{story.id}">\nTitle: {story.title}\nAcceptance Criteria:\n{criteria}\n</story>'
+
+
+def chunk_stories_by_token_budget(
+    stories: List[Story], token_budget: int
+) -> List[List[Story]]:
+    """Split stories into consecutive chunks whose estimated size fits the budget."""
+    chunks: List[List[Story]] = []
+    current: List[Story] = []
+    current_tokens = 0
+    for story in stories:
+        story_tokens = estimate_tokens(format_story_for_batch(story))
+        if current and current_tokens + story_tokens > token_budget:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(story)
+        current_tokens += story_tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def parse_acceptance_criteria_by_id(response) -> dict[str, List[str]]:
+    """Parse acceptance criteria keyed by story id from OpenAI response."""
+    return {
+        item["id"]: item["acceptance_criteria"]
+        for output in response.output
+        if output.type == "function_call"
+        for item in json.loads(output.arguments)["stories"]
+    }
+
+
+def define_acceptance_criteria_batch(
+    stories: List[Story],
+    token_budget: int = 8000,
+) -> List[Story]:
+    """Define acceptance criteria for many stories with one call per chunk."""
+    logger = get_logger()
+    chunks = chunk_stories_by_token_budget(stories, token_budget)
+    logger.info(
+        "acceptance_criteria_batch_started", count=len(stories), chunks=len(chunks)
+    )
+
+    criteria_by_id: dict[str, List[str]] = {}
+    for chunk in chunks:
+        prompt = get_prompt(
+            "batch_acceptance_criteria.md",
+            user_stories="\n\n".join(format_story_for_batch(s) for s in chunk),
+        )
+
+        # Call OpenAI API and parse response
+        response = call_openai_api(
+            prompt, [DEFINE_ACCEPTANCE_CRITERIA_TOOL], route="acceptance_criteria"
+        )
+
+        # Display reasoning summaries
+        reasoning_summaries = extract_reasoning_summaries(response)
+        display_reasoning_summaries(reasoning_summaries)
+
+        criteria_by_id.update(parse_acceptance_criteria_by_id(response))
+
+    # Match results back by id; stories the model skipped keep their criteria
+    known_ids = {story.id for story in stories}
+    missing = [story.id for story in stories if story.id not in criteria_by_id]
+    unknown = [story_id for story_id in criteria_by_id if story_id not in known_ids]
+    logger.info(
+        "acceptance_criteria_batch_completed",
+        matched=len(stories) - len(missing),
+        missing_ids=missing,
+        unknown_ids=unknown,
+    )
+    return [
+        replace(story, acceptance_criteria=criteria_by_id[story.id])
+        if story.id in criteria_by_id
+        else story
+        for story in stories
+    ]
 
 
 def get_human_input() -> FeedbackResponse:
     """Get user approval/rejection response from CLI."""
+    return through(
+        "human_input",
+        None,
+        _prompt_human_input,
+        encode=lambda r: {"status": r.status.value, "comment": r.comment},
+        decode=lambda data: FeedbackResponse(
+            status=FeedbackStatus(data["status"]), comment=data["comment"]
+        ),
+    )
+
+
+def _prompt_human_input() -> FeedbackResponse:
+    """Prompt on the CLI until the user approves or rejects."""
     while True:
         approval = input("Approve (y/n): ").strip().lower()
         if approval in ["y", "yes"]:
@@ -280,34 +754,34 @@ def print_story_titles(
     stories: List[Story], header: str = "Generated Stories:"
 ) -> None:
     """Print a list of story titles with numbers."""
-    print(header)
+    echo(header)
     for i, story in enumerate(stories, 1):
-        print(f"{i}. {story.title}")
-    print()
+        echo(f"{i}. {story.title}")
+    echo()
 
 
 def print_story_with_criteria(story: Story, story_prefix: str = "Story:") -> None:
     """Print a single story with its acceptance criteria."""
-    print(f"\n{story_prefix} {story.title}")
-    print("Acceptance Criteria:")
+    echo(f"\n{story_prefix} {story.title}")
+    echo("Acceptance Criteria:")
     for j, ac in enumerate(story.acceptance_criteria, 1):
-        print(f"  {j}. {ac}")
+        echo(f"  {j}. {ac}")
     if story.enriched_context:
-        print("\nContext:")
-        print(f"{story.enriched_context}")
-    print()
+        echo("\nContext:")
+        echo(f"{story.enriched_context}")
+    echo()
 
 
 def print_final_stories(stories: List[Story]) -> None:
     """Print final summary of all stories with acceptance criteria."""
-    print("\n" + "=" * 50)
-    print("FINAL USER STORIES WITH ACCEPTANCE CRITERIA")
-    print("=" * 50)
+    echo("\n" + "=" * 50)
+    echo("FINAL USER STORIES WITH ACCEPTANCE CRITERIA")
+    echo("=" * 50)
     for i, story in enumerate(stories, 1):
-        print(f"\n{i}. {story.title}")
-        print("   Acceptance Criteria:")
+        echo(f"\n{i}. {story.title}")
+        echo("   Acceptance Criteria:")
         for j, ac in enumerate(story.acceptance_criteria, 1):
-            print(f"     {j}. {ac}")
+            echo(f"     {j}. {ac}")
         if story.enriched_context:
-            print("   Context:")
-            print(f"     {story.enriched_context}")
+            echo("   Context:")
+            echo(f"     {story.enriched_context}")
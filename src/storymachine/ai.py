@@ -1,8 +1,14 @@
 """AI utilities and OpenAI abstraction for StoryMachine."""
 
+import json
+import os
+import threading
 import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 from openai import OpenAI
 from openai.types.responses import (
@@ -10,51 +16,167 @@ from openai.types.responses import (
     Response,
     ResponseReasoningItem,
     ResponseFunctionToolCall,
+    ResponseOutputMessage,
 )
 
+from .cache import ResponseCache, response_cache_key
+from .cassette import active_cassette, request_digest, through
 from .config import Settings
+from .console import echo
+from .hedging import HedgeCancelled, Hedger, get_hedger
 from .logging import get_logger
-
-# Global conversation state
-conversation_id: Optional[str] = None
-
-
-def supports_reasoning_parameters(model: str) -> bool:
-    """Check if the model supports reasoning and text parameters."""
-    reasoning_capable_models = {
-        "o1-preview",
-        "o1-mini",
-        "o1",
-        "o3-mini",
-        "o3",
-        "o4-mini",
-        "gpt-5",
-        "gpt-5-mini",
-        "gpt-5-nano",
-        "codex-mini-latest",
-    }
-
-    return (
-        model in reasoning_capable_models
-        or model.startswith("o1-")
-        or model.startswith("o3-")
-        or model.startswith("o4-")
-        or model.startswith("codex-")
-        or (model.startswith("gpt-5") and not model.startswith("gpt-5-chat"))
+from .progress import add_tokens
+from .routing import adapt_effort, resolve_route
+from .singleflight import SingleFlight, shared_flights
+from .tracing import span
+
+# Conversation items can be added at most this many at a time
+CONVERSATION_ITEMS_BATCH = 20
+# ~4 characters per token is close enough for budgeting prompt sizes
+CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class ConversationState:
+    """One conversation's id, cache chain and usage.
+
+    The state is shared by reference, so worker threads started with
+    `asyncio.to_thread` update the state of the task that started them.
+    """
+
+    id: Optional[str] = None
+    # Digest of every request so far; part of each response cache key
+    chain: str = ""
+    # Items served from the cache that the server-side conversation lacks
+    pending_items: List[dict] = field(default_factory=list)
+    # Every exchange as input items, kept while hedging to send calls standalone
+    history: List[dict] = field(default_factory=list)
+    calls: int = 0
+    cached_calls: int = 0
+    # Calls answered by an identical request from another conversation
+    shared_calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    # (input, output) tokens per model that answered, for pricing by route
+    model_tokens: Dict[str, List[int]] = field(default_factory=dict)
+
+    def add_usage(self, model: str, input_tokens: int, output_tokens: int) -> None:
+        """Count tokens billed for one response from `model`."""
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        tokens = self.model_tokens.setdefault(model, [0, 0])
+        tokens[0] += input_tokens
+        tokens[1] += output_tokens
+
+
+_conversation: ContextVar[ConversationState] = ContextVar("conversation")
+
+
+def current_conversation() -> ConversationState:
+    """Return the conversation used by model calls in the current context.
+
+    A context without one gets a fresh conversation. Worker threads see only
+    a copy of the context, so a run sets its conversation before starting them.
+    """
+    state = _conversation.get(None)
+    if state is None:
+        state = new_conversation()
+    return state
+
+
+def new_conversation() -> ConversationState:
+    """Start a fresh conversation for model calls in the current context.
+
+    Concurrent runs (evals, server sessions) call this at the start of their
+    task so they do not share one conversation.
+    """
+    state = ConversationState()
+    _conversation.set(state)
+    return state
+
+
+def fork_conversation(items: List[dict]) -> ConversationState:
+    """Start a conversation for the current context that begins with `items`.
+
+    Side work, such as detailing stories while the breakdown is still being
+    written, runs in its own server-side conversation so it cannot interleave
+    with the main one. The items are added to the new conversation before its
+    first call, and its cache chain is derived from them.
+    """
+    state = ConversationState(
+        chain=request_digest({"fork": items}),
+        pending_items=list(items),
+        history=list(items),
     )
+    _conversation.set(state)
+    return state
+
+
+# Side conversations on several threads may end at once
+_merge_lock = threading.Lock()
+
+
+@contextmanager
+def side_conversation() -> Iterator[ConversationState]:
+    """Run the block's model calls outside the current conversation.
+
+    Calls in the block neither read nor extend the run's conversation, so side
+    work on several threads cannot interleave with it. Their usage is added to
+    the run's conversation when the block ends.
+    """
+    outer = current_conversation()
+    state = ConversationState()
+    token = _conversation.set(state)
+    try:
+        yield state
+    finally:
+        _conversation.reset(token)
+        with _merge_lock:
+            merge_usage(outer, state)
+
+
+def merge_usage(into: ConversationState, other: ConversationState) -> None:
+    """Add another conversation's call and token counts to `into`."""
+    for name in (
+        "calls",
+        "cached_calls",
+        "shared_calls",
+        "input_tokens",
+        "output_tokens",
+    ):
+        setattr(into, name, getattr(into, name) + getattr(other, name))
+    for model, (input_tokens, output_tokens) in other.model_tokens.items():
+        tokens = into.model_tokens.setdefault(model, [0, 0])
+        tokens[0] += input_tokens
+        tokens[1] += output_tokens
+
+
+_clients: Dict[Tuple[str, Optional[str]], OpenAI] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(settings: Settings) -> OpenAI:
+    """Shared client per API key and endpoint, so calls reuse pooled connections."""
+    key = (settings.openai_api_key, os.environ.get("OPENAI_BASE_URL"))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = OpenAI(api_key=settings.openai_api_key)
+        return client
 
 
 def get_or_create_conversation() -> str:
     """Get existing conversation ID or create a new one."""
-    global conversation_id
-    if conversation_id is None:
+    state = current_conversation()
+    if state.id is None:
         logger = get_logger()
         settings = Settings()  # pyright: ignore[reportCallIssue]
-        client = OpenAI(api_key=settings.openai_api_key)
-        conversation = client.conversations.create()
-        conversation_id = conversation.id
-        logger.info("conversation_created", conversation_id=conversation_id)
-    return conversation_id
+        client = get_client(settings)
+        state.id = through(
+            "conversations.create", None, lambda: client.conversations.create().id
+        )
+        logger.info("conversation_created", conversation_id=state.id)
+    return state.id
 
 
 def get_prompt(filename: str, **kwargs: Any) -> str:
@@ -64,12 +186,242 @@ def get_prompt(filename: str, **kwargs: Any) -> str:
     return prompt_template.format(**kwargs)
 
 
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the token count of a piece of text."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _stream_response(
+    client: OpenAI, params: dict, on_arguments_delta: Callable[[str], None]
+) -> Response:
+    """Stream a response, forwarding function-call argument deltas as they arrive."""
+    response: Optional[Response] = None
+    streamed_chars = 0
+    for event in client.responses.create(**params, stream=True):
+        if event.type == "response.function_call_arguments.delta":
+            reported = streamed_chars // CHARS_PER_TOKEN
+            streamed_chars += len(event.delta)
+            add_tokens(streamed_chars // CHARS_PER_TOKEN - reported)
+            on_arguments_delta(event.delta)
+        elif event.type == "response.completed":
+            response = event.response
+    if response is None:
+        raise RuntimeError("Response stream ended without a completed response")
+    return response
+
+
+def _replayed_response(
+    data: dict, on_arguments_delta: Optional[Callable[[str], None]]
+) -> Response:
+    """Rebuild a recorded response, replaying its tool arguments as one delta."""
+    # Built leniently, as the SDK builds responses it receives
+    response = Response.model_construct(**data)
+    if on_arguments_delta is not None:
+        for item in response.output:
+            if isinstance(item, ResponseFunctionToolCall):
+                on_arguments_delta(item.arguments)
+    return response
+
+
+def _conversation_items(params: dict, response: Response) -> List[dict]:
+    """Input and output items of a cached exchange, as conversation items."""
+    items = list(params["input"])
+    for item in response.output:
+        if isinstance(item, ResponseFunctionToolCall):
+            items.append(
+                {
+                    "type": "function_call",
+                    "call_id": item.call_id,
+                    "name": item.name,
+                    "arguments": item.arguments,
+                }
+            )
+        elif isinstance(item, ResponseOutputMessage):
+            text = "".join(getattr(part, "text", "") for part in item.content)
+            items.append({"role": "assistant", "content": text})
+    return items
+
+
+def _sync_conversation(client: OpenAI, state: ConversationState) -> None:
+    """Add exchanges served from the cache to the server-side conversation."""
+    if not state.pending_items or state.id is None:
+        return
+    conversation_id = state.id
+    pending, state.pending_items = state.pending_items, []
+    for start in range(0, len(pending), CONVERSATION_ITEMS_BATCH):
+        batch = pending[start : start + CONVERSATION_ITEMS_BATCH]
+
+        def add_items() -> None:
+            client.conversations.items.create(
+                conversation_id,
+                items=batch,  # pyright: ignore[reportArgumentType]
+            )
+
+        through("conversations.items.create", batch, add_items)
+
+
+def _cancellable_response(
+    client: OpenAI, params: dict, cancel: threading.Event
+) -> Response:
+    """Stream a response, abandoning it as soon as `cancel` is set."""
+    stream = client.responses.create(**params, stream=True)
+    try:
+        for event in stream:
+            if cancel.is_set():
+                raise HedgeCancelled()
+            if event.type == "response.completed":
+                return event.response
+    finally:
+        stream.close()
+    raise RuntimeError("Response stream ended without a completed response")
+
+
+def _hedged_response(
+    client: OpenAI,
+    params: dict,
+    state: ConversationState,
+    hedger: Hedger,
+    route: str,
+    logger,
+) -> Response:
+    """Create a response in the conversation, hedged by a standalone duplicate.
+
+    The request itself uses the server-side conversation. Duplicates must not
+    both land in it, so a duplicate, sent only when the request is slow,
+    carries the conversation so far as input instead. If the duplicate wins,
+    the cancelled request may still have reached the old conversation, so the
+    run moves to a new one that starts with the history and this exchange.
+    A request outside any conversation is duplicated as it is.
+    """
+    in_conversation = "conversation" in params
+
+    def duplicate(cancel: threading.Event) -> Response:
+        request = {k: v for k, v in params.items() if k != "conversation"}
+        if in_conversation:
+            request["input"] = [*state.history, *params["input"]]
+        return _cancellable_response(client, request, cancel)
+
+    hedge_delays: List[float] = []
+    response, hedge_won = hedger.run(
+        route,
+        lambda cancel: _cancellable_response(client, params, cancel),
+        on_hedge=hedge_delays.append,
+        hedge=duplicate,
+    )
+    if hedge_won and in_conversation:
+        state.id = None
+        state.pending_items = [
+            *state.history,
+            *_conversation_items(params, response),
+        ]
+    if hedge_delays:
+        stats = hedger.stats
+        logger.info(
+            "request_hedged",
+            route=route,
+            delay_seconds=hedge_delays[0],
+            hedge_won=hedge_won,
+            hedge_rate=stats.hedge_rate,
+            hedge_wins=stats.hedge_wins,
+            saved_seconds=stats.saved_seconds,
+        )
+    return response
+
+
 def _create_and_parse_response(
-    client: OpenAI, params: dict, logger, log_prefix: str
+    client: OpenAI,
+    params: dict,
+    logger,
+    log_prefix: str,
+    on_arguments_delta: Optional[Callable[[str], None]] = None,
+    cache: Optional[ResponseCache] = None,
+    hedger: Optional[Hedger] = None,
+    route: str = "default",
+    flights: Optional[SingleFlight] = None,
 ) -> Response:
-    """Create response, parse it, log it, and return with parsed attributes."""
-    # Create response using responses.create()
-    response = client.responses.create(**params)
+    """Create response, parse it, log it, and return with parsed attributes.
+
+    With a response cache, an identical request at the same point of an
+    identical conversation is answered from disk instead of the API. With a
+    hedger, calls that are not streamed are hedged (see `_hedged_response`).
+    With `flights`, a request identical to one in flight (same cache key)
+    waits for that response instead of making its own.
+    """
+    state = current_conversation()
+    hedged = hedger is not None and on_arguments_delta is None
+
+    def create() -> Response:
+        if hedged and hedger is not None:
+            return _hedged_response(client, params, state, hedger, route, logger)
+        # Create response using responses.create(), streaming if a delta hook is given
+        if on_arguments_delta is not None:
+            return _stream_response(client, params, on_arguments_delta)
+        return client.responses.create(**params)
+
+    with span(
+        "responses.create", request=log_prefix, streamed=on_arguments_delta is not None
+    ) as create_span:
+        key = (
+            response_cache_key(state.chain, params)
+            if cache is not None or flights is not None
+            else None
+        )
+        cached = cache.get(key) if cache is not None and key is not None else None
+        shared = False
+        if cached is not None:
+            response = _replayed_response(cached, on_arguments_delta)
+            state.pending_items.extend(_conversation_items(params, response))
+            state.cached_calls += 1
+            create_span.set(cached=True)
+        else:
+
+            def fetch() -> Tuple[Response, Optional[dict]]:
+                _sync_conversation(client, state)
+                response = through(
+                    "responses.create",
+                    params,
+                    create,
+                    encode=lambda r: r.model_dump(mode="json", exclude_unset=True),
+                    decode=lambda data: _replayed_response(data, on_arguments_delta),
+                )
+                # Encoded before the caller edits the response's output
+                data = None
+                if cache is not None or flights is not None:
+                    data = response.model_dump(mode="json", exclude_unset=True)
+                if cache is not None and key is not None and data is not None:
+                    cache.put(key, data)
+                return response, data
+
+            if flights is not None and key is not None:
+                (response, data), shared = flights.do(key, fetch)
+            else:
+                response, data = fetch()
+            if shared and data is not None:
+                # Another conversation made this exact request; like a cache
+                # hit, the exchange still has to be added to this one
+                response = _replayed_response(data, on_arguments_delta)
+                state.pending_items.extend(_conversation_items(params, response))
+                state.shared_calls += 1
+                create_span.set(shared=True)
+                logger.info("request_shared", kind="responses.create", route=route)
+        if key is not None:
+            state.chain = key
+        if hedger is not None:
+            state.history.extend(_conversation_items(params, response))
+        state.calls += 1
+
+        usage = response.usage
+        if usage is not None:
+            create_span.set(
+                input_tokens=usage.input_tokens, output_tokens=usage.output_tokens
+            )
+            if cached is None and not shared:
+                state.add_usage(
+                    params["model"], usage.input_tokens, usage.output_tokens
+                )
+            # Streamed calls already reported their tokens as they arrived
+            if on_arguments_delta is None:
+                add_tokens(usage.output_tokens)
 
     # Extract reasoning summaries and function calls using proper types
     reasoning_items = [
@@ -90,10 +442,16 @@ def _create_and_parse_response(
     logger.info(
         f"{log_prefix}_response",
         status="success",
+        model=params["model"],
         tool_calls=len(function_calls),
         reasoning_items=len(reasoning_items),
         reasoning_summary_length=sum(len(s) for s in reasoning_summaries),
-        response_output=[item.dict() for item in response.output],
+        input_tokens=usage.input_tokens if usage is not None else None,
+        output_tokens=usage.output_tokens if usage is not None else None,
+        cached=cached is not None,
+        shared=shared,
+        # Dumped by the log writer thread, not here
+        response_output=list(response.output),
     )
 
     # Attach parsed data to response using setattr for type safety
@@ -129,26 +487,75 @@ def display_reasoning_summaries(summaries: List[str]) -> None:
     if not summaries:
         return
 
-    print("\n🧠 Model Reasoning:")
-    print("─" * 60)
+    echo("\n🧠 Model Reasoning:")
+    echo("─" * 60)
     for i, summary in enumerate(summaries):
         if i > 0:
-            print("─" * 60)
-        print(summary)
-    print("─" * 60)
-    print()
+            echo("─" * 60)
+        echo(summary)
+    echo("─" * 60)
+    echo()
+
+
+@dataclass
+class _RoutedCall:
+    """Client, model and effort chosen for one call, and the helpers it uses."""
+
+    client: OpenAI
+    model: str
+    effort: Optional[str]
+    cache: Optional[ResponseCache]
+    hedger: Optional[Hedger]
+    flights: Optional[SingleFlight]
+
+
+def _route_call(route: str, prompt_tokens: int, logger) -> _RoutedCall:
+    """Resolve the model and effort for a call on `route`, logging the choice."""
+    settings = Settings()  # pyright: ignore[reportCallIssue]
+    selected = resolve_route(route, settings)
+    decision = adapt_effort(selected, prompt_tokens, settings)
+    logger.info(
+        "model_route",
+        route=route,
+        model=selected.model,
+        reasoning_effort=decision.effort,
+        route_reasoning_effort=selected.reasoning_effort,
+        effort_reasons=list(decision.reasons),
+        prompt_tokens=prompt_tokens,
+    )
+    return _RoutedCall(
+        client=get_client(settings),
+        model=selected.model,
+        effort=decision.effort,
+        cache=ResponseCache(Path(settings.response_cache_dir))
+        if settings.response_cache_dir
+        else None,
+        # A hedge that wins moves the run to a new conversation, which a
+        # cassette replay could not reproduce
+        hedger=get_hedger(settings)
+        if settings.hedge_requests and active_cassette() is None
+        else None,
+        flights=shared_flights(settings),
+    )
 
 
 def call_openai_api(
     prompt: str,
     tools: Optional[List[ToolParam]] = None,
+    on_arguments_delta: Optional[Callable[[str], None]] = None,
+    route: str = "default",
 ) -> Response:
-    """Call OpenAI API using the Responses API with proper context management."""
+    """Call OpenAI API using the Responses API with proper context management.
+
+    If `on_arguments_delta` is given, the initial request is streamed and each
+    function-call argument delta is passed to it as soon as it arrives.
+    `route` names the calling stage and selects its model and reasoning effort.
+    """
     start_time = time.time()
     logger = get_logger()
-    settings = Settings()  # pyright: ignore[reportCallIssue]
-    client = OpenAI(api_key=settings.openai_api_key)
-    model = settings.model
+    routed = _route_call(route, estimate_tokens(prompt), logger)
+    client, model, effort = routed.client, routed.model, routed.effort
+    cache, hedger, flights = routed.cache, routed.hedger, routed.flights
 
     # Build request parameters for responses.create()
     create_params = {
@@ -163,9 +570,9 @@ def call_openai_api(
         create_params["tool_choice"] = "required"
 
     # Add reasoning parameters for supported models
-    if supports_reasoning_parameters(model):
+    if effort is not None:
         create_params["reasoning"] = {
-            "effort": settings.reasoning_effort,
+            "effort": effort,
             "summary": "auto",
         }
         create_params["text"] = {"verbosity": "low"}
@@ -184,7 +591,17 @@ def call_openai_api(
     )
 
     # Create and parse initial response
-    response = _create_and_parse_response(client, create_params, logger, "openai")
+    response = _create_and_parse_response(
+        client,
+        create_params,
+        logger,
+        "openai",
+        on_arguments_delta,
+        cache,
+        hedger,
+        route,
+        flights,
+    )
 
     function_calls = getattr(response, "_function_calls", [])
     if function_calls:
@@ -210,9 +627,9 @@ def call_openai_api(
         }
 
         # Add reasoning parameters for supported models
-        if supports_reasoning_parameters(model):
+        if effort is not None:
             followup_create_params["reasoning"] = {
-                "effort": settings.reasoning_effort,
+                "effort": effort,
                 "summary": "auto",
             }
             followup_create_params["text"] = {"verbosity": "low"}
@@ -236,7 +653,14 @@ def call_openai_api(
 
         # Create and parse follow-up response
         followup_response = _create_and_parse_response(
-            client, followup_create_params, logger, "openai_followup"
+            client,
+            followup_create_params,
+            logger,
+            "openai_followup",
+            cache=cache,
+            hedger=hedger,
+            route=route,
+            flights=flights,
         )
 
         # Combine reasoning summaries from both responses for display
@@ -252,10 +676,72 @@ def call_openai_api(
             followup_response.output.extend(original_function_calls)
 
         duration = time.time() - start_time
-        logger.info("openai_api_duration", duration_seconds=duration)
+        logger.info(
+            "openai_api_duration",
+            duration_seconds=duration,
+            route=route,
+            model=model,
+            reasoning_effort=effort,
+        )
         return followup_response
 
     # Store reasoning summaries for display (already attached by helper function)
     duration = time.time() - start_time
-    logger.info("openai_api_duration", duration_seconds=duration)
+    logger.info(
+        "openai_api_duration",
+        duration_seconds=duration,
+        route=route,
+        model=model,
+        reasoning_effort=effort,
+    )
+    return response
+
+
+def call_openai_chained(
+    input_items: List[Any],
+    tools: List[ToolParam],
+    route: str,
+    previous_response_id: Optional[str] = None,
+    tool_choice: str = "auto",
+) -> Response:
+    """Call the Responses API outside the conversation, chained to a response.
+
+    For tool loops the caller runs itself: no follow-up is made, and the
+    caller passes the tool outputs and this response's id to the next call.
+    Routing, the response cache, single-flight, hedging and response logs are
+    those of `call_openai_api`; the event is logged as `<route>_response`.
+    """
+    start_time = time.time()
+    logger = get_logger()
+    routed = _route_call(
+        route, estimate_tokens(json.dumps(input_items, default=str)), logger
+    )
+    params: Dict[str, Any] = {
+        "model": routed.model,
+        "input": input_items,
+        "tools": tools,
+        "tool_choice": tool_choice,
+    }
+    if previous_response_id is not None:
+        params["previous_response_id"] = previous_response_id
+    if routed.effort is not None:
+        params["reasoning"] = {"effort": routed.effort}
+
+    response = _create_and_parse_response(
+        routed.client,
+        params,
+        logger,
+        route,
+        cache=routed.cache,
+        hedger=routed.hedger,
+        route=route,
+        flights=routed.flights,
+    )
+    logger.info(
+        "openai_api_duration",
+        duration_seconds=time.time() - start_time,
+        route=route,
+        model=routed.model,
+        reasoning_effort=routed.effort,
+    )
     return response
@@ -0,0 +1,48 @@
+"""On-disk cache of model responses.
+
+A response is keyed by its request (minus the conversation id) and the
+digests of every earlier request in the same conversation, so a hit means
+the same prompt at the same point of the same exchange. Entries are JSON
+files sharded by key prefix, written atomically so concurrent runs can share
+one cache directory.
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Optional
+
+from .cassette import request_digest
+
+
+def response_cache_key(chain: str, params: dict[str, Any]) -> str:
+    """Key for a request following the conversation summarized by `chain`."""
+    request = {k: v for k, v in params.items() if k != "conversation"}
+    return request_digest({"chain": chain, "request": request})
+
+
+class ResponseCache:
+    """Directory of cached responses, one JSON file per key."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[dict[str, Any]]:
+        """Return the cached response data, or None on a miss."""
+        try:
+            return json.loads(self._path(key).read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key: str, data: dict[str, Any]) -> None:
+        """Store response data under `key`."""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
@@ -0,0 +1,205 @@
+"""Record and replay the external inputs of a StoryMachine session.
+
+A cassette captures everything a run receives from outside the process, in
+order: `responses.create` and `conversations.create` results, `list_tree` and
+`ask` results from ask_github, human review answers and the ids given to
+generated stories.
+Replaying it feeds those results back without network access or a human, so
+prompt assembly, parsing and orchestration can be regression tested and
+profiled deterministically.
+
+Cassettes are gzip-compressed JSON lines: a header line, then one line per
+interaction with its kind, a digest of the request, the encoded result and
+how long the original call took. Requests are stored as digests only; on
+replay each request is served the earliest unused interaction of the same
+kind and digest, so calls made concurrently may finish in a different order
+than they were recorded. A request with no such interaction means the code
+under test has changed what it sends, and `CassetteMismatchError` is raised.
+
+The active cassette is held in a context variable, so concurrent sessions
+each record or replay their own.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Iterator, List, Optional, TypeVar
+
+CASSETTE_VERSION = 1
+
+T = TypeVar("T")
+
+
+class CassetteMismatchError(RuntimeError):
+    """Raised when a replayed session diverges from its recording."""
+
+
+def request_digest(request: Any) -> str:
+    """Hash a request in a canonical JSON form."""
+    text = json.dumps(request, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class Cassette:
+    """An ordered list of recorded interactions, in record or replay mode."""
+
+    def __init__(
+        self,
+        path: Path,
+        mode: str,
+        speed: float = 0.0,
+        entries: Optional[List[dict[str, Any]]] = None,
+    ):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        # Replay delay is the recorded duration divided by speed; 0 means none
+        self.speed = speed
+        self.entries: List[dict[str, Any]] = entries or []
+        # Index of the first interaction not yet replayed
+        self._position = 0
+        self._used: set[int] = set()
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def record(cls, path: Path) -> "Cassette":
+        """Start an empty cassette that records to `path` when saved."""
+        return cls(path, "record")
+
+    @classmethod
+    def load(cls, path: Path, speed: float = 0.0) -> "Cassette":
+        """Load a recorded cassette for replay at the given speed."""
+        with gzip.open(path, "rt") as f:
+            header = json.loads(f.readline())
+            version = header.get("cassette_version")
+            if version != CASSETTE_VERSION:
+                raise CassetteMismatchError(
+                    f"Unsupported cassette version {version}, "
+                    f"expected {CASSETTE_VERSION}"
+                )
+            entries = [json.loads(line) for line in f if line.strip()]
+        return cls(path, "replay", speed=speed, entries=entries)
+
+    @property
+    def remaining(self) -> int:
+        """Number of recorded interactions not yet replayed."""
+        return len(self.entries) - len(self._used)
+
+    def save(self) -> None:
+        """Write the recorded interactions to the cassette file."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(self.path, "wt") as f:
+            f.write(json.dumps({"cassette_version": CASSETTE_VERSION}) + "\n")
+            for entry in self.entries:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def through(
+        self,
+        kind: str,
+        request: Any,
+        call: Callable[[], T],
+        encode: Callable[[T], Any],
+        decode: Callable[[Any], T],
+    ) -> T:
+        """Run `call` and record its result, or return the recorded result."""
+        digest = request_digest(request)
+        if self.mode == "replay":
+            return decode(self._replay(kind, digest))
+
+        start = time.perf_counter()
+        result = call()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.entries.append(
+                {
+                    "kind": kind,
+                    "request": digest,
+                    "result": encode(result),
+                    "offset": start - self._started,
+                    "elapsed": elapsed,
+                }
+            )
+        return result
+
+    def _replay(self, kind: str, digest: str) -> Any:
+        with self._lock:
+            position = self._position
+            if position >= len(self.entries):
+                raise CassetteMismatchError(
+                    f"Cassette {self.path} exhausted at {kind} "
+                    f"(interaction {len(self._used) + 1})"
+                )
+            match = next(
+                (
+                    index
+                    for index in range(position, len(self.entries))
+                    if index not in self._used
+                    and self.entries[index]["kind"] == kind
+                    and self.entries[index]["request"] == digest
+                ),
+                None,
+            )
+            if match is None:
+                expected = self.entries[position]
+                what = "request" if expected["kind"] == kind else "call"
+                raise CassetteMismatchError(
+                    f"Interaction {position + 1} {what} differs from the recording: "
+                    f"expected {expected['kind']}, got {kind}"
+                )
+            self._used.add(match)
+            while self._position in self._used:
+                self._position += 1
+            entry = self.entries[match]
+
+        if self.speed > 0:
+            time.sleep(entry["elapsed"] / self.speed)
+        return entry["result"]
+
+
+_active: ContextVar[Optional[Cassette]] = ContextVar("cassette", default=None)
+
+
+def active_cassette() -> Optional[Cassette]:
+    """Return the cassette in use, if any."""
+    return _active.get()
+
+
+@contextmanager
+def use_cassette(cassette: Cassette) -> Iterator[Cassette]:
+    """Record or replay through `cassette` for the duration of a block.
+
+    A recording is saved on exit, including when the block raises, so a
+    failed run can still be replayed up to the failure.
+    """
+    token = _active.set(cassette)
+    try:
+        yield cassette
+    finally:
+        _active.reset(token)
+        if cassette.mode == "record":
+            cassette.save()
+
+
+def through(
+    kind: str,
+    request: Any,
+    call: Callable[[], T],
+    encode: Callable[[T], Any] = lambda result: result,
+    decode: Callable[[Any], T] = lambda data: data,
+) -> T:
+    """Pass an external call through the active cassette, if there is one.
+
+    `encode` and `decode` convert the result to and from JSON-compatible data;
+    the defaults suit results that already are.
+    """
+    cassette = _active.get()
+    if cassette is None:
+        return call()
+    return cassette.through(kind, request, call, encode, decode)
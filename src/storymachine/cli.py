@@ -1,38 +1,139 @@
+"""Command line entry point for StoryMachine.
+
+Only the standard library is imported at module level, so `--help` and
+argument/validation errors return without loading the OpenAI SDK, pydantic or
+structlog, and without touching the log file. Everything else is imported
+once the inputs have been validated. Subcommands are listed in `--help`, and
+their modules are imported only when they run.
+"""
+
 import argparse
-import asyncio
+import importlib
 import sys
 from pathlib import Path
-from .types import WorkflowInput
-from .workflow import w1
-from .config import Settings
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .types import Story, WorkflowInput
+
+# Subcommand name -> (module with a `main(argv)`, help text)
+COMMANDS: Dict[str, Tuple[str, str]] = {
+    "serve": (".server", "Serve story sessions over WebSocket"),
+    "worker": (".jobs", "Run queued jobs from JOB_QUEUE"),
+    "index-repo": (".repoindex", "Build or update the symbol index of a checkout"),
+    "stats": (".stats", "Summarize runs from the JSON log"),
+}
+
+
+async def w1(
+    workflow_input: "WorkflowInput", deadline: Optional[float] = None
+) -> List["Story"]:
+    """Run the story workflow, importing it (and the OpenAI SDK) on first use."""
+    from .workflow import w1 as workflow_w1
+
+    return await workflow_w1(workflow_input, deadline=deadline)
+
+
+def parse_duration(value: str) -> float:
+    """Parse a duration such as `90`, `90s`, `10m` or `1.5h` into seconds."""
+    units = {"s": 1, "m": 60, "h": 3600}
+    scale = units.get(value[-1:].lower())
+    number = value[:-1] if scale else value
+    try:
+        seconds = float(number) * (scale or 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid duration: {value!r}")
+    if seconds <= 0:
+        raise argparse.ArgumentTypeError(f"duration must be positive: {value!r}")
+    return seconds
 
 
 def main():
     """Main CLI entry point for StoryMachine."""
-
     parser = argparse.ArgumentParser(
-        description="StoryMachine - Generate context-enriched user stories from PRD and tech spec"
+        description="StoryMachine - Generate context-enriched user stories from PRD and tech spec",
+        usage="%(prog)s --prd PRD --tech-spec TECH_SPEC --repo REPO [options]\n"
+        "       %(prog)s COMMAND [arguments]",
     )
+    # Each subcommand parses its own arguments, including --help
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+    for name, (_, help_text) in COMMANDS.items():
+        subparsers.add_parser(name, help=help_text, add_help=False)
+
     parser.add_argument(
         "--prd",
         type=str,
-        required=True,
         help="Path to the Product Requirements Document (PRD) file",
     )
     parser.add_argument(
         "--tech-spec",
         type=str,
-        required=True,
         help="Path to the Technical Specification file",
     )
     parser.add_argument(
         "--repo",
         type=str,
-        required=True,
-        help="GitHub repository URL (e.g., https://github.com/owner/repo)",
+        help="GitHub or GitLab repository URL (e.g., https://github.com/owner/repo), "
+        "or the path of a local checkout",
     )
 
-    args = parser.parse_args()
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Write the final stories to this file (JSON for .json, compact binary otherwise)",
+    )
+
+    cassette_group = parser.add_mutually_exclusive_group()
+    cassette_group.add_argument(
+        "--record",
+        type=str,
+        metavar="CASSETTE",
+        help="Record model calls, repository lookups and review answers to this file",
+    )
+    cassette_group.add_argument(
+        "--replay",
+        type=str,
+        metavar="CASSETTE",
+        help="Replay a recorded session offline instead of calling out",
+    )
+    parser.add_argument(
+        "--replay-speed",
+        type=float,
+        default=0.0,
+        help="Replay at this multiple of recorded speed (1 = real time, 0 = no delays)",
+    )
+
+    parser.add_argument(
+        "--deadline",
+        type=parse_duration,
+        metavar="DURATION",
+        help="Time budget for the run, e.g. 10m; reasoning effort drops as it runs out",
+    )
+
+    parser.add_argument(
+        "--trace",
+        type=str,
+        metavar="PATH",
+        help="Write a Chrome trace-event timeline of the run (open in Perfetto)",
+    )
+
+    args, rest = parser.parse_known_args()
+    if args.command is not None:
+        module = importlib.import_module(COMMANDS[args.command][0], __package__)
+        return module.main(rest)
+    if rest:
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+    missing = [
+        option
+        for option, value in (
+            ("--prd", args.prd),
+            ("--tech-spec", args.tech_spec),
+            ("--repo", args.repo),
+        )
+        if value is None
+    ]
+    if missing:
+        parser.error(f"the following arguments are required: {', '.join(missing)}")
 
     prd_path = Path(args.prd)
     tech_spec_path = Path(args.tech_spec)
@@ -46,6 +147,26 @@ def main():
         print(f"Error: Tech spec file not found: {tech_spec_path}", file=sys.stderr)
         sys.exit(1)
 
+    if "://" not in repo_url and not repo_url.startswith("git@"):
+        if not Path(repo_url).expanduser().is_dir():
+            print(f"Error: Repository directory not found: {repo_url}", file=sys.stderr)
+            sys.exit(1)
+
+    if args.replay and not Path(args.replay).exists():
+        print(f"Error: Cassette file not found: {args.replay}", file=sys.stderr)
+        sys.exit(1)
+
+    import asyncio
+    import contextlib
+    import os
+
+    from .cassette import Cassette, use_cassette
+    from .codec import write_stories
+    from .config import Settings
+    from .routing import ROUTES, resolve_route
+    from .tracing import Tracer, use_tracer
+    from .types import WorkflowInput
+
     # Read file contents and create workflow input
     prd_content = prd_path.read_text()
     tech_spec_content = tech_spec_path.read_text()
@@ -55,13 +176,37 @@ def main():
         repo_url=repo_url,
     )
 
-    # Display current configuration
+    session = contextlib.nullcontext()
+    if args.record:
+        session = use_cassette(Cassette.record(Path(args.record)))
+    elif args.replay:
+        # Nothing is sent on replay, so no real key is needed
+        os.environ.setdefault("OPENAI_API_KEY", "replay")
+        session = use_cassette(Cassette.load(Path(args.replay), args.replay_speed))
+
+    # Display the model and reasoning effort each stage is routed to
     settings = Settings()  # pyright: ignore[reportCallIssue]
-    print(f"Model: {settings.model}")
-    print(f"Reasoning Effort: {settings.reasoning_effort}")
+    print("Models:")
+    for name in ROUTES:
+        route = resolve_route(name, settings)
+        effort = f" ({route.reasoning_effort} effort)" if route.reasoning_effort else ""
+        print(f"  {name}: {route.model}{effort}")
     print()
 
-    asyncio.run(w1(workflow_input))
+    tracer = Tracer()
+    tracing = use_tracer(tracer) if args.trace else contextlib.nullcontext()
+
+    try:
+        with session, tracing:
+            stories = asyncio.run(w1(workflow_input, args.deadline))
+    finally:
+        if args.trace:
+            tracer.export_chrome_trace(args.trace)
+            print(f"Trace written to {args.trace}")
+
+    if args.output:
+        write_stories(Path(args.output), stories)
+        print(f"Stories written to {args.output}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,136 @@
+"""Versioned JSON and binary serialization for StoryMachine types.
+
+Every cache, checkpoint, output file and eval export goes through this module
+so that stories have one on-disk shape. Two encodings share the same schema:
+
+- JSON: `{"schema_version": 1, "stories": [{...}, ...]}`, human readable.
+- Binary: a magic header and schema version followed by zlib-compressed
+  JSON rows (`[id, title, acceptance_criteria, enriched_context]`), which is
+  an order of magnitude smaller at comparable encode/decode speed.
+
+See `benchmarks/bench_codec.py` for throughput on a 10k-story corpus.
+"""
+
+import json
+import struct
+import zlib
+from pathlib import Path
+from typing import Any, List, Union
+
+from .types import Story, WorkflowInput, new_story_id
+
+SCHEMA_VERSION = 1
+
+BINARY_MAGIC = b"SMST"
+_BINARY_HEADER = struct.Struct(">4sH")
+
+
+class SchemaVersionError(ValueError):
+    """Raised when encoded data uses an unsupported schema version."""
+
+
+def story_to_dict(story: Story) -> dict[str, Any]:
+    """Convert a Story to a JSON-compatible dict."""
+    return {
+        "id": story.id,
+        "title": story.title,
+        "acceptance_criteria": list(story.acceptance_criteria),
+        "enriched_context": story.enriched_context,
+    }
+
+
+def story_from_dict(data: dict[str, Any]) -> Story:
+    """Build a Story from a dict, such as one `create_stories` tool item.
+
+    Tool output has no `id`, and may omit `enriched_context`; a fresh id is
+    assigned in that case.
+    """
+    return Story(
+        title=data["title"],
+        acceptance_criteria=list(data["acceptance_criteria"]),
+        enriched_context=data.get("enriched_context"),
+        id=data.get("id") or new_story_id(),
+    )
+
+
+def workflow_input_to_dict(workflow_input: WorkflowInput) -> dict[str, Any]:
+    """Convert a WorkflowInput to a JSON-compatible dict."""
+    return {
+        "prd_content": workflow_input.prd_content,
+        "tech_spec_content": workflow_input.tech_spec_content,
+        "repo_url": workflow_input.repo_url,
+        "repo_context": workflow_input.repo_context,
+    }
+
+
+def workflow_input_from_dict(data: dict[str, Any]) -> WorkflowInput:
+    """Build a WorkflowInput from a dict."""
+    return WorkflowInput(
+        prd_content=data["prd_content"],
+        tech_spec_content=data["tech_spec_content"],
+        repo_url=data["repo_url"],
+        repo_context=data.get("repo_context"),
+    )
+
+
+def check_schema_version(version: int) -> None:
+    """Raise SchemaVersionError unless `version` is the current schema version."""
+    if version != SCHEMA_VERSION:
+        raise SchemaVersionError(
+            f"Unsupported schema version {version}, expected {SCHEMA_VERSION}"
+        )
+
+
+def encode_stories_json(stories: List[Story]) -> str:
+    """Encode stories as a versioned JSON document."""
+    return json.dumps(
+        {
+            "schema_version": SCHEMA_VERSION,
+            "stories": [story_to_dict(story) for story in stories],
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+def encode_stories_binary(stories: List[Story]) -> bytes:
+    """Encode stories in the compact binary format."""
+    rows = [[s.id, s.title, s.acceptance_criteria, s.enriched_context] for s in stories]
+    payload = json.dumps(rows, ensure_ascii=False, separators=(",", ":"))
+    return _BINARY_HEADER.pack(BINARY_MAGIC, SCHEMA_VERSION) + zlib.compress(
+        payload.encode(), 1
+    )
+
+
+def decode_stories(data: Union[str, bytes]) -> List[Story]:
+    """Decode stories from either encoding, detecting which one was used."""
+    if isinstance(data, bytes) and data.startswith(BINARY_MAGIC):
+        _, version = _BINARY_HEADER.unpack_from(data)
+        check_schema_version(version)
+        rows = json.loads(zlib.decompress(data[_BINARY_HEADER.size :]))
+        return [
+            Story(
+                title=title,
+                acceptance_criteria=criteria,
+                enriched_context=context,
+                id=story_id,
+            )
+            for story_id, title, criteria, context in rows
+        ]
+
+    document = json.loads(data)
+    check_schema_version(document.get("schema_version", 0))
+    return [story_from_dict(item) for item in document["stories"]]
+
+
+def write_stories(path: Path, stories: List[Story]) -> None:
+    """Write stories to a file, as JSON for `.json` paths and binary otherwise."""
+    if path.suffix == ".json":
+        path.write_text(encode_stories_json(stories))
+    else:
+        path.write_bytes(encode_stories_binary(stories))
+
+
+def read_stories(path: Path) -> List[Story]:
+    """Read stories written by `write_stories`."""
+    return decode_stories(path.read_bytes())
@@ -1,3 +1,5 @@
+from typing import Dict, Literal
+
 from pydantic import Field
 from pydantic_settings import BaseSettings
 
@@ -9,6 +11,48 @@ class Settings(BaseSettings):
     gitlab_token: str | None = Field(None, frozen=True, alias="GITLAB_TOKEN")
     model: str = Field("gpt-5", alias="MODEL")
     reasoning_effort: str = Field("low", alias="REASONING_EFFORT")
+    # JSON objects keyed by route, e.g. {"problem_break_down": "o3"}
+    route_models: Dict[str, str] = Field(default_factory=dict, alias="ROUTE_MODELS")
+    route_reasoning_efforts: Dict[str, str] = Field(
+        default_factory=dict, alias="ROUTE_REASONING_EFFORTS"
+    )
+    adaptive_reasoning_effort: bool = Field(True, alias="ADAPTIVE_REASONING_EFFORT")
+    effort_large_prompt_tokens: int = Field(60000, alias="EFFORT_LARGE_PROMPT_TOKENS")
+    fused_detailing: bool = Field(False, alias="FUSED_DETAILING")
+    early_detailing: bool = Field(False, alias="EARLY_DETAILING")
+    batch_acceptance_criteria: bool = Field(False, alias="BATCH_ACCEPTANCE_CRITERIA")
+    batch_token_budget: int = Field(8000, alias="BATCH_TOKEN_BUDGET")
+    response_cache_dir: str | None = Field(None, alias="RESPONSE_CACHE_DIR")
+    hedge_requests: bool = Field(False, alias="HEDGE_REQUESTS")
+    hedge_percentile: float = Field(90, alias="HEDGE_PERCENTILE")
+    hedge_max_rate: float = Field(0.1, alias="HEDGE_MAX_RATE")
+    # "off", "flag" (report likely duplicates) or "merge" (combine them)
+    duplicate_stories: Literal["off", "flag", "merge"] = Field(
+        "flag", alias="DUPLICATE_STORIES"
+    )
+    # Reached by most LLM rewordings of one story (see tests/test_dedupe.py)
+    duplicate_threshold: float = Field(0.55, alias="DUPLICATE_THRESHOLD")
+    split_codebase_questions: bool = Field(True, alias="SPLIT_CODEBASE_QUESTIONS")
+    ask_concurrency: int = Field(4, alias="ASK_CONCURRENCY")
+    ask_max_iterations: int = Field(25, alias="ASK_MAX_ITERATIONS")
+    repo_index: str | None = Field(None, alias="REPO_INDEX")
+    single_flight: bool = Field(True, alias="SINGLE_FLIGHT")
+    job_queue: str | None = Field(None, alias="JOB_QUEUE")
+    job_lease_seconds: float = Field(300, alias="JOB_LEASE_SECONDS")
+    job_max_attempts: int = Field(3, alias="JOB_MAX_ATTEMPTS")
+
+    class Config:
+        env_file = ".env"
+
+
+class LogSettings(BaseSettings):
+    """Logging settings, readable before (and without) the API key."""
+
+    log_file: str = Field("storymachine.log", alias="LOG_FILE")
+    log_field_cap: int = Field(2000, alias="LOG_FIELD_CAP")
+    log_full_payloads: bool = Field(False, alias="LOG_FULL_PAYLOADS")
+    log_payload_file: str = Field("storymachine.payloads.log", alias="LOG_PAYLOAD_FILE")
 
     class Config:
         env_file = ".env"
+        extra = "ignore"
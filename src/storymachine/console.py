@@ -0,0 +1,35 @@
+"""Console output of a workflow run.
+
+The CLI narrates a run on stdout: stage headers, story lists and model
+reasoning. Server sessions run many workflows in one process, where that
+output would interleave, so they turn it off with `quiet_console` for their
+own context. `asyncio.to_thread` copies the context, so activities running in
+worker threads follow the setting of the run that started them.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+_enabled: ContextVar[bool] = ContextVar("console_output", default=True)
+
+
+def console_enabled() -> bool:
+    """Whether the current run prints to the console."""
+    return _enabled.get()
+
+
+def echo(*values: Any, **kwargs: Any) -> None:
+    """`print`, unless console output is off for the current run."""
+    if _enabled.get():
+        print(*values, **kwargs)
+
+
+@contextmanager
+def quiet_console() -> Iterator[None]:
+    """Turn console output off for the current context during a block."""
+    token = _enabled.set(False)
+    try:
+        yield
+    finally:
+        _enabled.reset(token)
@@ -0,0 +1,198 @@
+"""Near-duplicate story detection, without model calls.
+
+Each story's title and acceptance criteria become a bag of words, without
+filler such as "as a user I want" and with plural and tense endings cut off,
+so "ships" and "shipped" count as one word. Two stories are compared by the
+cosine similarity of their TF-IDF vectors: words that many of the stories
+share weigh less than the words that set a story apart. LLM rewordings of
+one story keep most of its distinctive words but rarely its word order, so
+words are compared alone rather than as phrases.
+
+Up to EXACT_MAX_STORIES stories, every pair is compared. Larger lists are
+compared only where two stories share a word that can matter: words common
+enough that they could not make two stories similar on their own are left
+out of the index (all-pairs similarity search with maximum-weight bounds).
+This still finds every duplicate pair. A 1,000-story portfolio takes well
+under a second (see `benchmarks/bench_dedupe.py`).
+
+Duplicates are grouped transitively. `merge_duplicates` keeps the first
+story of each group and adds the other stories' distinct acceptance criteria
+to it.
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass, replace
+from typing import Dict, List, Tuple
+
+from .types import Story
+
+# Lists up to this size are compared pair by pair, without an index
+EXACT_MAX_STORIES = 200
+# Share of the threshold that a story's unindexed words may add up to. More
+# would shrink the index, but leave fewer pairs that its sums can rule out.
+LEFT_OUT_SHARE = 0.3
+
+# Words that every story shares, which would make unrelated stories look alike
+_FILLER = {
+    "a", "an", "the", "as", "i", "want", "so", "that", "to", "of", "and",
+    "or", "in", "on", "for", "with", "be", "is", "are", "can", "user",
+    "given", "when", "then", "should", "it", "my", "we", "our", "this",
+}  # fmt: skip
+# Endings cut off words, longest first, so word forms compare equal
+_SUFFIXES = ("ations", "ation", "ments", "ment", "ings", "ing", "ies", "ed", "es", "s")  # fmt: skip
+_WORD = re.compile(r"[a-z0-9]+")
+# Size tags such as "[S]" or "[M]" at the start of titles
+_SIZE_TAG = re.compile(r"^\s*\[[A-Za-z]+\]\s*")
+
+
+@dataclass(frozen=True)
+class DuplicatePair:
+    """Two stories (by position) whose similarity reached the threshold."""
+
+    first: int
+    second: int
+    similarity: float
+
+
+def _stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[: -len(suffix)]
+            break
+    # "shipped" -> "shipp" -> "ship"
+    if len(word) > 3 and word[-1] == word[-2]:
+        word = word[:-1]
+    return word
+
+
+def words(story: Story) -> List[str]:
+    """Stemmed words of a story's title and acceptance criteria, less filler."""
+    text = " ".join([_SIZE_TAG.sub("", story.title), *story.acceptance_criteria])
+    return [_stem(w) for w in _WORD.findall(text.lower()) if w not in _FILLER]
+
+
+def tfidf_vectors(stories: List[Story]) -> List[Dict[str, float]]:
+    """Unit-length TF-IDF vectors, with document frequencies from `stories`."""
+    counts = [Counter(words(story)) for story in stories]
+    frequency = Counter(word for count in counts for word in count)
+    total = len(stories)
+    vectors = []
+    for count in counts:
+        vector = {
+            word: (1 + math.log(n))
+            * (math.log((1 + total) / (1 + frequency[word])) + 1)
+            for word, n in count.items()
+        }
+        norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+        vectors.append({word: value / norm for word, value in vector.items()})
+    return vectors
+
+
+def cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
+    """Cosine similarity of two unit-length vectors."""
+    if len(b) < len(a):
+        a, b = b, a
+    return sum(value * b.get(word, 0.0) for word, value in a.items())
+
+
+def _indexed_pairs(
+    vectors: List[Dict[str, float]], threshold: float
+) -> List[DuplicatePair]:
+    """Pairs at least `threshold` similar, without comparing every pair.
+
+    Each story indexes its words, with their weights, except its most common
+    ones: as many as could not add up to LEFT_OUT_SHARE of the threshold
+    even against the highest weight each has in any story. A later story
+    adds up its products with the earlier stories through the index. Only
+    where that sum, plus the most the left-out words could add, reaches the
+    threshold are the left-out words compared too. No duplicate pair is
+    missed.
+    """
+    frequency = Counter(word for vector in vectors for word in vector)
+    highest: Dict[str, float] = {}
+    for vector in vectors:
+        for word, value in vector.items():
+            highest[word] = max(value, highest.get(word, 0.0))
+    # Slightly low, so that rounding cannot drop a pair
+    limit = threshold * (1 - 1e-9)
+    left_out_limit = limit * LEFT_OUT_SHARE
+    index: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+    left_out: List[Dict[str, float]] = []
+    left_out_bound: List[float] = []
+    pairs = []
+    for position, vector in enumerate(vectors):
+        scores: Dict[int, float] = defaultdict(float)
+        for word, value in vector.items():
+            for other, other_value in index.get(word, ()):
+                scores[other] += value * other_value
+        for other, score in scores.items():
+            if score + left_out_bound[other] >= limit:
+                similarity = score + cosine(vector, left_out[other])
+                if similarity >= threshold:
+                    pairs.append(DuplicatePair(other, position, similarity))
+        rest: Dict[str, float] = {}
+        bound, index_rest = 0.0, False
+        for word in sorted(vector, key=lambda w: (-frequency[w], w)):
+            value = vector[word]
+            if not index_rest and bound + value * highest[word] < left_out_limit:
+                bound += value * highest[word]
+                rest[word] = value
+            else:
+                index_rest = True
+                index[word].append((position, value))
+        left_out.append(rest)
+        left_out_bound.append(bound)
+    return pairs
+
+
+def find_duplicates(stories: List[Story], threshold: float) -> List[DuplicatePair]:
+    """Pairs of stories at least `threshold` similar, most similar first."""
+    vectors = tfidf_vectors(stories)
+    if len(stories) > EXACT_MAX_STORIES:
+        pairs = _indexed_pairs(vectors, threshold)
+    else:
+        pairs = []
+        for first in range(len(stories)):
+            for second in range(first + 1, len(stories)):
+                similarity = cosine(vectors[first], vectors[second])
+                if similarity >= threshold:
+                    pairs.append(DuplicatePair(first, second, similarity))
+    pairs.sort(key=lambda p: (-p.similarity, p.first, p.second))
+    return pairs
+
+
+def duplicate_groups(count: int, pairs: List[DuplicatePair]) -> List[List[int]]:
+    """Positions of stories that are duplicates of each other, in order."""
+    parent = list(range(count))
+
+    def root(index: int) -> int:
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    for pair in pairs:
+        a, b = root(pair.first), root(pair.second)
+        parent[max(a, b)] = min(a, b)
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for index in range(count):
+        groups[root(index)].append(index)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def merge_duplicates(stories: List[Story], pairs: List[DuplicatePair]) -> List[Story]:
+    """Keep the first story of each duplicate group, with the group's criteria."""
+    merged = list(stories)
+    dropped = set()
+    for group in duplicate_groups(len(stories), pairs):
+        keep, *others = group
+        criteria = list(stories[keep].acceptance_criteria)
+        for other in others:
+            criteria.extend(
+                c for c in stories[other].acceptance_criteria if c not in criteria
+            )
+            dropped.add(other)
+        merged[keep] = replace(stories[keep], acceptance_criteria=criteria)
+    return [story for index, story in enumerate(merged) if index not in dropped]
@@ -0,0 +1,169 @@
+"""Hedged model requests to cut tail latency.
+
+When a call on a route has taken longer than a percentile of that route's
+recent latencies, a duplicate is sent (the same call, or a separate `hedge`
+callable when the duplicate has to be made differently). The first to finish wins and the
+other is cancelled. Each attempt runs in its own thread and checks a cancel
+flag between stream events, so a cancelled attempt closes its connection
+instead of running to completion.
+
+Extra spend is capped: across the process, at most `max_rate` of all calls
+are hedged. `HedgeStats` counts hedges and wins, and estimates the latency
+saved. That estimate is the mean of recorded latencies longer than the
+caller's wait, minus that wait.
+"""
+
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Optional, TypeVar
+
+from .config import Settings
+
+T = TypeVar("T")
+
+# Latencies kept per route, and needed before a route is hedged at all
+LATENCY_WINDOW = 100
+MIN_SAMPLES = 5
+
+
+class HedgeCancelled(Exception):
+    """Raised inside an attempt that lost the race."""
+
+
+@dataclass
+class HedgeStats:
+    """Process-wide hedging counters."""
+
+    calls: int = 0
+    hedged: int = 0
+    hedge_wins: int = 0
+    saved_seconds: float = 0.0
+
+    @property
+    def hedge_rate(self) -> float:
+        return self.hedged / self.calls if self.calls else 0.0
+
+
+class Hedger:
+    """Runs calls with a hedge after a per-route latency percentile."""
+
+    def __init__(
+        self,
+        percentile: float = 90,
+        max_rate: float = 0.1,
+        min_samples: int = MIN_SAMPLES,
+    ):
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.min_samples = min_samples
+        self.stats = HedgeStats()
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def delay(self, route: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None while samples are few."""
+        with self._lock:
+            samples = sorted(self._latencies.get(route, ()))
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+        return samples[index]
+
+    def record(self, route: str, seconds: float) -> None:
+        with self._lock:
+            window = self._latencies.setdefault(route, deque(maxlen=LATENCY_WINDOW))
+            window.append(seconds)
+
+    def _estimated_saving(self, route: str, latency: float) -> float:
+        with self._lock:
+            slower = [s for s in self._latencies.get(route, ()) if s > latency]
+        return sum(slower) / len(slower) - latency if slower else 0.0
+
+    def _reserve_hedge(self) -> bool:
+        with self._lock:
+            if self.stats.hedged + 1 > self.max_rate * self.stats.calls:
+                return False
+            self.stats.hedged += 1
+            return True
+
+    def run(
+        self,
+        route: str,
+        attempt: Callable[[threading.Event], T],
+        on_hedge: Optional[Callable[[float], None]] = None,
+        hedge: Optional[Callable[[threading.Event], T]] = None,
+    ) -> tuple[T, bool]:
+        """Run `attempt`, hedging it once if slow; returns (result, hedge_won).
+
+        `attempt` is called with a cancel event. It should check the event
+        often and raise HedgeCancelled once it is set. The duplicate runs
+        `hedge` if given, otherwise `attempt` again.
+        """
+        with self._lock:
+            self.stats.calls += 1
+        delay = self.delay(route)
+        pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hedge")
+        cancels = {}
+
+        def submit(started: float, call: Callable[[threading.Event], T]) -> Future:
+            cancel = threading.Event()
+            # Each thread needs its own copy of the caller's context
+            future = pool.submit(contextvars.copy_context().run, call, cancel)
+            cancels[future] = (cancel, started)
+            return future
+
+        try:
+            primary = submit(time.monotonic(), attempt)
+            pending = {primary}
+            if delay is not None:
+                done, _ = wait(pending, timeout=delay)
+                if not done and self._reserve_hedge():
+                    if on_hedge is not None:
+                        on_hedge(delay)
+                    pending.add(submit(time.monotonic(), hedge or attempt))
+
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is not None:
+                        error = error or future.exception()
+                        continue
+                    for other in pending:
+                        cancels[other][0].set()
+                    now = time.monotonic()
+                    latency = now - cancels[future][1]
+                    hedge_won = future is not primary
+                    if hedge_won:
+                        # Compare what the caller waited with slower primaries
+                        waited = now - cancels[primary][1]
+                        saving = self._estimated_saving(route, waited)
+                        with self._lock:
+                            self.stats.hedge_wins += 1
+                            self.stats.saved_seconds += saving
+                    self.record(route, latency)
+                    return future.result(), hedge_won
+            assert error is not None
+            raise error
+        finally:
+            # Losers notice their cancel event and exit on their own
+            pool.shutdown(wait=False)
+
+
+_hedger: Optional[Hedger] = None
+_hedger_lock = threading.Lock()
+
+
+def get_hedger(settings: Settings) -> Hedger:
+    """The process-wide hedger, so latency history is shared across runs."""
+    global _hedger
+    with _hedger_lock:
+        if _hedger is None:
+            _hedger = Hedger(
+                percentile=settings.hedge_percentile, max_rate=settings.hedge_max_rate
+            )
+        return _hedger
@@ -0,0 +1,570 @@
+"""Durable SQLite job queue for the slow workflow steps.
+
+With `JOB_QUEUE` set, server sessions and eval runs do not call the model
+themselves for codebase context, story breakdown and story detailing.
+They enqueue a job and await its result. `storymachine worker` processes
+claim jobs from the same database file.
+
+- Priority: lower numbers run first. Steps a reviewer is waiting on are
+  `INTERACTIVE`, unattended runs are `BATCH`.
+- Leases: a claimed job is leased to one worker, which renews the lease
+  while it runs. If the worker dies, the lease expires and another worker
+  picks the job up.
+- Retries: a failed job is queued again with exponential backoff until it
+  has used `max_attempts`.
+- Idempotency: each job has a key made from its session, kind and payload.
+  Enqueueing the same key again returns the existing job. A restarted
+  session that repeats its steps gets the stored results instead of new
+  model calls.
+
+Each job carries its conversation (id, cache chain and pending items) in the
+payload. The result carries the updated conversation back, so a session's
+exchanges stay in one server-side conversation whichever worker runs them.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .cassette import request_digest
+from .codec import (
+    story_from_dict,
+    story_to_dict,
+    workflow_input_from_dict,
+    workflow_input_to_dict,
+)
+from .config import Settings
+from .logging import current_run_id, get_logger, log_context
+from .types import Story, WorkflowInput
+
+INTERACTIVE = 0
+BATCH = 10
+
+# Longest wait before a failed job is retried
+MAX_BACKOFF_SECONDS = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    idempotency_key TEXT UNIQUE,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority, available_at, id);
+"""
+
+
+class JobFailed(RuntimeError):
+    """Raised when a job has failed on every attempt."""
+
+
+@dataclass
+class Job:
+    """One row of the queue."""
+
+    id: int
+    kind: str
+    payload: Dict[str, Any]
+    priority: int
+    status: str
+    attempts: int
+    max_attempts: int
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+def _job_from_row(row: sqlite3.Row) -> Job:
+    return Job(
+        id=row["id"],
+        kind=row["kind"],
+        payload=json.loads(row["payload"]),
+        priority=row["priority"],
+        status=row["status"],
+        attempts=row["attempts"],
+        max_attempts=row["max_attempts"],
+        result=json.loads(row["result"]) if row["result"] else None,
+        error=row["error"],
+    )
+
+
+class JobQueue:
+    """Jobs in one SQLite file, shared by any number of processes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # A connection per operation keeps the queue safe to use from any thread
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connect() as db:
+            # Take the write lock up front so two workers cannot claim one job
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        priority: int = BATCH,
+        idempotency_key: Optional[str] = None,
+        max_attempts: int = 3,
+    ) -> int:
+        """Add a job, or return the id of the job already holding the key.
+
+        A failed job holding the key is queued again with fresh attempts, so a
+        step that failed can be retried by submitting it again.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            if idempotency_key is not None:
+                row = db.execute(
+                    "SELECT id, status FROM jobs WHERE idempotency_key = ?",
+                    (idempotency_key,),
+                ).fetchone()
+                if row is not None and row["status"] == "failed":
+                    db.execute(
+                        "UPDATE jobs SET status = 'queued', payload = ?,"
+                        " priority = ?, attempts = 0, max_attempts = ?,"
+                        " error = NULL, lease_owner = NULL, lease_expires = NULL,"
+                        " available_at = ?, updated_at = ? WHERE id = ?",
+                        (
+                            json.dumps(payload),
+                            priority,
+                            max_attempts,
+                            now,
+                            now,
+                            row["id"],
+                        ),
+                    )
+                if row is not None:
+                    return row["id"]
+            cursor = db.execute(
+                "INSERT INTO jobs (kind, payload, priority, idempotency_key,"
+                " max_attempts, available_at, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    kind,
+                    json.dumps(payload),
+                    priority,
+                    idempotency_key,
+                    max_attempts,
+                    now,
+                    now,
+                    now,
+                ),
+            )
+            assert cursor.lastrowid is not None
+            return cursor.lastrowid
+
+    def claim(
+        self, worker_id: str, lease_seconds: float, now: Optional[float] = None
+    ) -> Optional[Job]:
+        """Lease the most urgent ready job to `worker_id`, if there is one.
+
+        Jobs whose lease has expired count as ready again. Those that have
+        used all their attempts are marked failed instead.
+        """
+        now = time.time() if now is None else now
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'failed', error = 'lease expired',"
+                " lease_owner = NULL, updated_at = ?"
+                " WHERE status = 'running' AND lease_expires <= ?"
+                " AND attempts >= max_attempts",
+                (now, now),
+            )
+            row = db.execute(
+                "SELECT id FROM jobs"
+                " WHERE (status = 'queued' AND available_at <= ?)"
+                " OR (status = 'running' AND lease_expires <= ?)"
+                " ORDER BY priority, id LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1,"
+                " lease_owner = ?, lease_expires = ?, updated_at = ? WHERE id = ?",
+                (worker_id, now + lease_seconds, now, row["id"]),
+            )
+            return _job_from_row(
+                db.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            )
+
+    def renew(self, job_id: int, worker_id: str, lease_seconds: float) -> bool:
+        """Extend a lease; False if the worker no longer holds it."""
+        now = time.time()
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ?"
+                " WHERE id = ? AND lease_owner = ? AND status = 'running'",
+                (now + lease_seconds, now, job_id, worker_id),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: int, worker_id: str, result: Dict[str, Any]) -> bool:
+        """Store a job's result; False if the lease was lost to another worker."""
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = 'done', result = ?, lease_owner = NULL,"
+                " updated_at = ? WHERE id = ? AND lease_owner = ? AND status = 'running'",
+                (json.dumps(result), time.time(), job_id, worker_id),
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: int, worker_id: str, error: str) -> None:
+        """Queue a failed job for a retry, or mark it failed if out of attempts."""
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute(
+                "SELECT attempts, max_attempts FROM jobs"
+                " WHERE id = ? AND lease_owner = ? AND status = 'running'",
+                (job_id, worker_id),
+            ).fetchone()
+            if row is None:
+                return
+            if row["attempts"] >= row["max_attempts"]:
+                status, available_at = "failed", now
+            else:
+                status = "queued"
+                available_at = now + min(MAX_BACKOFF_SECONDS, 2 ** row["attempts"])
+            db.execute(
+                "UPDATE jobs SET status = ?, error = ?, available_at = ?,"
+                " lease_owner = NULL, updated_at = ? WHERE id = ?",
+                (status, error, available_at, now, job_id),
+            )
+
+    def get(self, job_id: int) -> Job:
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise KeyError(job_id)
+        return _job_from_row(row)
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs in each status."""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"
+            ).fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+# Job handlers. Each runs in a worker process and returns a JSON-ready dict.
+
+
+def _conversation_to_dict() -> Dict[str, Any]:
+    from .ai import current_conversation
+
+    state = current_conversation()
+    return {"id": state.id, "chain": state.chain, "pending_items": state.pending_items}
+
+
+def _start_conversation(data: Dict[str, Any]) -> None:
+    from .ai import new_conversation
+
+    state = new_conversation()
+    state.id = data.get("id")
+    state.chain = data.get("chain", "")
+    state.pending_items = list(data.get("pending_items", []))
+
+
+def _usage() -> Dict[str, Any]:
+    from .ai import current_conversation
+
+    state = current_conversation()
+    return {
+        "calls": state.calls,
+        "cached_calls": state.cached_calls,
+        "input_tokens": state.input_tokens,
+        "output_tokens": state.output_tokens,
+        "model_tokens": state.model_tokens,
+    }
+
+
+def _codebase_context(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from .activities import get_codebase_context
+
+    workflow_input = workflow_input_from_dict(payload["workflow_input"])
+    return {"repo_context": asyncio.run(get_codebase_context(workflow_input))}
+
+
+def _problem_break_down(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from .activities import problem_break_down
+
+    stories = problem_break_down(
+        workflow_input_from_dict(payload["workflow_input"]),
+        [story_from_dict(s) for s in payload["stories"]],
+        payload["comments"],
+    )
+    return {"stories": [story_to_dict(story) for story in stories]}
+
+
+def _detail_story(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from .activities import define_acceptance_criteria, detail_story, enrich_context
+
+    workflow_input = workflow_input_from_dict(payload["workflow_input"])
+    story = story_from_dict(payload["story"])
+    comments = payload["comments"]
+    for step in payload["steps"]:
+        if step == "detail_story":
+            story = detail_story(story, workflow_input, comments)
+        elif step == "acceptance_criteria":
+            story = define_acceptance_criteria(story, comments)
+        else:
+            story = enrich_context(story, workflow_input, comments)
+    return {"story": story_to_dict(story)}
+
+
+HANDLERS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    "codebase_context": _codebase_context,
+    "problem_break_down": _problem_break_down,
+    "detail_story": _detail_story,
+}
+
+
+def run_job(job: Job) -> Dict[str, Any]:
+    """Run a job in this process, inside the conversation and deadline it carries."""
+    from .routing import revision_scope, start_run_budget
+
+    _start_conversation(job.payload.get("conversation", {}))
+    # Time spent queued counts against the run's deadline
+    deadline_at = job.payload.get("deadline_at")
+    start_run_budget(deadline_at - time.time() if deadline_at is not None else None)
+    with revision_scope(job.payload.get("revision", 0)):
+        result = HANDLERS[job.kind](job.payload)
+    return {**result, "conversation": _conversation_to_dict(), "usage": _usage()}
+
+
+class Worker:
+    """Claims and runs jobs until stopped."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        worker_id: Optional[str] = None,
+        lease_seconds: float = 300,
+        poll_interval: float = 0.5,
+    ):
+        self.queue = queue
+        self.id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+
+    def _keep_lease(self, job: Job, done: threading.Event) -> None:
+        while not done.wait(self.lease_seconds / 3):
+            if not self.queue.renew(job.id, self.id, self.lease_seconds):
+                return
+
+    def run_one(self) -> bool:
+        """Run the next ready job; False if there was none."""
+        job = self.queue.claim(self.id, self.lease_seconds)
+        if job is None:
+            return False
+        logger = get_logger()
+        done = threading.Event()
+        renewer = threading.Thread(
+            target=self._keep_lease, args=(job, done), daemon=True
+        )
+        renewer.start()
+        with log_context(
+            run_id=job.payload.get("run_id"),
+            job_id=job.id,
+            job_kind=job.kind,
+            worker_id=self.id,
+        ):
+            logger.info("job_started", attempt=job.attempts, priority=job.priority)
+            start = time.perf_counter()
+            try:
+                result = run_job(job)
+            except Exception as e:
+                logger.error("job_failed", attempt=job.attempts, error=repr(e))
+                self.queue.fail(job.id, self.id, repr(e))
+            else:
+                if self.queue.complete(job.id, self.id, result):
+                    logger.info(
+                        "job_completed", duration_seconds=time.perf_counter() - start
+                    )
+                else:
+                    logger.warning("job_lease_lost")
+            finally:
+                done.set()
+        return True
+
+    def run(self, stop: Optional[threading.Event] = None) -> None:
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            if not self.run_one():
+                stop.wait(self.poll_interval)
+
+
+@dataclass
+class JobSubmitter:
+    """Runs one session's workflow steps as queued jobs."""
+
+    queue: JobQueue
+    session_id: str
+    priority: int = BATCH
+    max_attempts: int = 3
+    poll_interval: float = 0.2
+    submitted: List[int] = field(default_factory=list)
+
+    async def _run(self, kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        from .ai import ConversationState, current_conversation, merge_usage
+        from .routing import current_revision, current_run_budget
+
+        payload = {**payload, "revision": current_revision()}
+        key = request_digest(
+            {"session": self.session_id, "kind": kind, "payload": payload}
+        )
+        # Not part of the key: a rerun of the same steps reuses their results
+        payload["conversation"] = _conversation_to_dict()
+        payload["run_id"] = current_run_id()
+        budget = current_run_budget()
+        if budget is not None:
+            payload["deadline_at"] = time.time() + budget.remaining()
+        job_id = await asyncio.to_thread(
+            self.queue.enqueue, kind, payload, self.priority, key, self.max_attempts
+        )
+        self.submitted.append(job_id)
+        while True:
+            job = await asyncio.to_thread(self.queue.get, job_id)
+            if job.status == "done":
+                break
+            if job.status == "failed":
+                raise JobFailed(f"{kind} job {job_id} failed: {job.error}")
+            await asyncio.sleep(self.poll_interval)
+
+        assert job.result is not None
+        conversation = job.result["conversation"]
+        state = current_conversation()
+        state.id = conversation["id"]
+        state.chain = conversation["chain"]
+        state.pending_items = conversation["pending_items"]
+        merge_usage(state, ConversationState(**job.result["usage"]))
+        return job.result
+
+    async def codebase_context(self, workflow_input: WorkflowInput) -> str:
+        payload = {"workflow_input": workflow_input_to_dict(workflow_input)}
+        return (await self._run("codebase_context", payload))["repo_context"]
+
+    async def problem_break_down(
+        self, workflow_input: WorkflowInput, stories: List[Story], comments: str
+    ) -> List[Story]:
+        payload = {
+            "workflow_input": workflow_input_to_dict(workflow_input),
+            "stories": [story_to_dict(story) for story in stories],
+            "comments": comments,
+        }
+        result = await self._run("problem_break_down", payload)
+        return [story_from_dict(s) for s in result["stories"]]
+
+    async def detail_story(
+        self,
+        story: Story,
+        workflow_input: WorkflowInput,
+        comments: str,
+        steps: List[str],
+    ) -> Story:
+        """Run detailing `steps` (route names) on a story, in order."""
+        payload = {
+            "workflow_input": workflow_input_to_dict(workflow_input),
+            "story": story_to_dict(story),
+            "comments": comments,
+            "steps": steps,
+        }
+        return story_from_dict((await self._run("detail_story", payload))["story"])
+
+
+def submitter_from_settings(
+    settings: Settings, session_id: str, priority: int
+) -> Optional[JobSubmitter]:
+    """A submitter on the configured queue, or None when `JOB_QUEUE` is unset."""
+    if not settings.job_queue:
+        return None
+    return JobSubmitter(
+        JobQueue(settings.job_queue),
+        session_id,
+        priority=priority,
+        max_attempts=settings.job_max_attempts,
+    )
+
+
+def _worker_process(path: str, lease_seconds: float) -> None:
+    Worker(JobQueue(path), lease_seconds=lease_seconds).run()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point for `storymachine worker`."""
+    parser = argparse.ArgumentParser(
+        prog="storymachine worker",
+        description="Run queued StoryMachine jobs from JOB_QUEUE",
+    )
+    parser.add_argument(
+        "--queue", help="Job queue database (defaults to the JOB_QUEUE setting)"
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes to start",
+    )
+    args = parser.parse_args(argv)
+
+    settings = Settings()  # pyright: ignore[reportCallIssue]
+    path = args.queue or settings.job_queue
+    if not path:
+        parser.error("set JOB_QUEUE or pass --queue")
+    JobQueue(path)  # Create the schema once, before the workers race for it
+
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_worker_process, args=(path, settings.job_lease_seconds))
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    print(f"{len(processes)} workers running jobs from {path}")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
@@ -0,0 +1,324 @@
+"""Local checkouts as repositories, without the GitHub or GitLab API.
+
+`--repo` may be a directory instead of a URL. The codebase context stage
+then lists files with `scan_tree` instead of `list_tree`, and answers each
+question with a model that explores the checkout through three tools instead
+of `ask`: `answer_question` (a keyword search returning the best-matching
+files with their matching lines), `list_files` and `read_lines`.
+
+The scan follows .gitignore. Inside a git work tree, git itself lists the
+files (tracked plus untracked, not ignored). Elsewhere the .gitignore files
+are read directly. Vendored and generated directories and binary files are
+skipped. Files are searched through memory maps, so large files are not
+copied into memory.
+"""
+
+import mmap
+import os
+import re
+import subprocess
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+VENDORED_DIRS = {
+    ".git",
+    ".hg",
+    ".svn",
+    ".tox",
+    ".venv",
+    "venv",
+    "__pycache__",
+    ".mypy_cache",
+    ".pytest_cache",
+    ".ruff_cache",
+    "node_modules",
+    "bower_components",
+    "vendor",
+    "third_party",
+    "site-packages",
+    "dist",
+    "build",
+}
+
+BINARY_EXTENSIONS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".webp", ".pdf",
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".jar", ".war", ".whl",
+    ".so", ".dylib", ".dll", ".exe", ".o", ".a", ".class", ".pyc",
+    ".woff", ".woff2", ".ttf", ".otf", ".eot", ".mp3", ".mp4", ".mov",
+    ".wav", ".sqlite", ".db", ".parquet",
+}  # fmt: skip
+
+# Bytes read to tell text from binary, as git does
+SNIFF_BYTES = 8000
+# Larger files are listed but not searched
+MAX_SEARCH_BYTES = 2_000_000
+# Caps on what one tool call returns to the model
+MAX_LISTED_FILES = 200
+MAX_READ_LINES = 200
+
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]{3,}")
+_STOPWORDS = {
+    "what", "where", "which", "when", "does", "with", "that", "this", "there",
+    "their", "from", "into", "used", "using", "have", "been", "should",
+    "would", "could", "about", "implemented", "handled", "existing", "code",
+    "codebase", "repository", "file", "files", "they", "them",
+    "then", "than", "each", "will", "also", "other", "some", "such", "need",
+}  # fmt: skip
+
+
+def local_repo_path(repo: str) -> Optional[Path]:
+    """The checkout directory if `repo` is a local path, else None."""
+    if "://" in repo or repo.startswith("git@"):
+        return None
+    path = Path(repo).expanduser()
+    return path.resolve() if path.is_dir() else None
+
+
+@dataclass
+class _Rule:
+    pattern: str
+    negated: bool
+    dir_only: bool
+    anchored: bool
+
+    def matches(self, relative: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        if self.anchored:
+            return fnmatchcase(relative, self.pattern)
+        # Unanchored patterns match the name at any depth
+        name = relative.rsplit("/", 1)[-1]
+        return fnmatchcase(name, self.pattern) or fnmatchcase(
+            relative, f"*/{self.pattern}"
+        )
+
+
+def _read_gitignore(path: Path) -> List[_Rule]:
+    rules = []
+    try:
+        lines = path.read_text(errors="replace").splitlines()
+    except OSError:
+        return rules
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negated = line.startswith("!")
+        line = line[1:] if negated else line
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        # A slash anywhere but the end anchors the pattern to its directory
+        anchored = "/" in line
+        line = line.lstrip("/").replace("**/", "*/").replace("/**", "/*")
+        rules.append(_Rule(line, negated, dir_only, anchored))
+    return rules
+
+
+def _ignored(rules: List[Tuple[str, List[_Rule]]], relative: str, is_dir: bool) -> bool:
+    ignored = False
+    for base, base_rules in rules:
+        if base and not relative.startswith(base + "/"):
+            continue
+        local = relative[len(base) + 1 :] if base else relative
+        for rule in base_rules:
+            if rule.matches(local, is_dir):
+                ignored = not rule.negated
+    return ignored
+
+
+def _walk(root: Path) -> Iterator[str]:
+    """Relative paths of files under `root`, honouring .gitignore files."""
+    stack: List[Tuple[Path, str, List[Tuple[str, List[_Rule]]]]] = [(root, "", [])]
+    while stack:
+        directory, relative, rules = stack.pop()
+        own = _read_gitignore(directory / ".gitignore")
+        if own:
+            rules = [*rules, (relative, own)]
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            path = f"{relative}/{entry.name}" if relative else entry.name
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if is_dir and entry.name in VENDORED_DIRS:
+                continue
+            if _ignored(rules, path, is_dir):
+                continue
+            if is_dir:
+                stack.append((Path(entry.path), path, rules))
+            elif entry.is_file(follow_symlinks=False):
+                yield path
+
+
+def _git_files(root: Path) -> Optional[List[str]]:
+    """Files git would track under `root`, or None outside a git work tree."""
+    try:
+        result = subprocess.run(
+            ["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+            cwd=root,
+            capture_output=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return [p for p in result.stdout.decode(errors="replace").split("\0") if p]
+
+
+def is_binary(path: Path) -> bool:
+    """Whether a file looks binary, by extension or a NUL byte near the start."""
+    if path.suffix.lower() in BINARY_EXTENSIONS:
+        return True
+    try:
+        with open(path, "rb") as f:
+            return b"\0" in f.read(SNIFF_BYTES)
+    except OSError:
+        return True
+
+
+def scan_tree(root: Path, use_git: bool = True) -> List[Dict[str, Any]]:
+    """List text files under `root` in the shape `list_tree` returns."""
+    paths = _git_files(root) if use_git else None
+    if paths is None:
+        paths = list(_walk(root))
+    tree = []
+    for path in sorted(paths):
+        if VENDORED_DIRS.intersection(path.split("/")[:-1]):
+            continue
+        full = root / path
+        if not full.is_file() or is_binary(full):
+            continue
+        tree.append({"path": path, "type": "blob", "size": full.stat().st_size})
+    return tree
+
+
+def search_terms(question: str) -> List[str]:
+    """Distinctive words of a question, in order, for a keyword search."""
+    terms = []
+    for word in _WORD.findall(question):
+        lowered = word.lower()
+        if lowered not in _STOPWORDS and lowered not in terms:
+            terms.append(lowered)
+    return terms
+
+
+def _matching_lines(
+    data: mmap.mmap, pattern: "re.Pattern[bytes]", limit: int
+) -> Tuple[set, List[Tuple[int, str]]]:
+    found = set()
+    lines: List[Tuple[int, str]] = []
+    line_number, counted_to = 1, 0
+    for match in pattern.finditer(data):
+        found.add(match.group().lower().decode())
+        if len(lines) >= limit or (lines and match.start() < counted_to):
+            continue
+        line_number += data[counted_to : match.start()].count(b"\n")
+        start = data.rfind(b"\n", 0, match.start()) + 1
+        end = data.find(b"\n", match.end())
+        end = len(data) if end == -1 else end
+        counted_to = end
+        text = data[start:end].decode(errors="replace").strip()
+        lines.append((line_number, text[:200]))
+    return found, lines
+
+
+def search(
+    root: Path,
+    paths: List[str],
+    terms: List[str],
+    max_files: int = 8,
+    lines_per_file: int = 3,
+) -> List[Tuple[str, List[str], List[Tuple[int, str]]]]:
+    """Files best matching `terms`, by distinct terms in path and content.
+
+    Returns (path, matched terms, [(line number, line)]) per file.
+    """
+    if not terms:
+        return []
+    pattern = re.compile(
+        b"|".join(re.escape(term.encode()) for term in terms), re.IGNORECASE
+    )
+    scored = []
+    for path in paths:
+        path_terms = {term for term in terms if term in path.lower()}
+        content_terms: set = set()
+        lines: List[Tuple[int, str]] = []
+        full = root / path
+        try:
+            size = full.stat().st_size
+            if 0 < size <= MAX_SEARCH_BYTES:
+                with (
+                    open(full, "rb") as f,
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data,
+                ):
+                    content_terms, lines = _matching_lines(
+                        data, pattern, lines_per_file
+                    )
+        except OSError:
+            continue
+        matched = path_terms | content_terms
+        if matched:
+            score = len(matched) + len(path_terms)
+            scored.append((score, path, sorted(matched), lines))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [(path, matched, lines) for _, path, matched, lines in scored[:max_files]]
+
+
+def answer_question(root: Path, question: str, paths: List[str]) -> str:
+    """Files and lines of the checkout that relate to a question."""
+    results = search(root, paths, search_terms(question))
+    if not results:
+        return "No matching files found in the local checkout."
+    parts = []
+    for path, matched, lines in results:
+        parts.append(f"- {path} (matches: {', '.join(matched)})")
+        parts.extend(f"    {number}: {text}" for number, text in lines)
+    return "\n".join(parts)
+
+
+def list_files(paths: List[str], directory: str) -> str:
+    """Checkout files under `directory` ("" for all), one per line."""
+    prefix = directory.strip("/")
+    matched = [p for p in paths if not prefix or p.startswith(prefix + "/")]
+    if not matched:
+        return f"No files under {directory!r}."
+    listed = "\n".join(matched[:MAX_LISTED_FILES])
+    if len(matched) > MAX_LISTED_FILES:
+        listed += f"\n... and {len(matched) - MAX_LISTED_FILES} more"
+    return listed
+
+
+def read_lines(root: Path, path: str, start: int, end: int) -> str:
+    """Numbered lines `start` to `end` (1-based, inclusive) of a checkout file.
+
+    At most MAX_READ_LINES lines are returned. The file is memory-mapped, so
+    only the pages up to the last requested line are read.
+    """
+    start = max(start, 1)
+    end = min(end, start + MAX_READ_LINES - 1)
+    full = root / path
+    try:
+        if full.stat().st_size == 0:
+            return f"{path} is empty."
+        with (
+            open(full, "rb") as f,
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data,
+        ):
+            offset, number = 0, 1
+            while number < start:
+                offset = data.find(b"\n", offset) + 1
+                if offset == 0 or offset == len(data):
+                    return f"{path} has only {number} lines."
+                number += 1
+            lines = []
+            while number <= end and offset < len(data):
+                stop = data.find(b"\n", offset)
+                stop = len(data) if stop == -1 else stop
+                text = data[offset:stop].decode(errors="replace").rstrip("\r")
+                lines.append(f"{number}: {text}")
+                offset, number = stop + 1, number + 1
+    except OSError as error:
+        return f"Could not read {path}: {error.strerror}"
+    return "\n".join(lines)
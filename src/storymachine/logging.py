@@ -1,45 +1,295 @@
-"""Structured logging configuration for StoryMachine."""
+"""Structured logging configuration for StoryMachine.
 
-import inspect
+Logging is configured on the first `get_logger` call, not on import, and the
+log file is opened by the writer thread when the first event arrives.
+
+Log calls only enqueue their event dict. A background thread caps oversized
+fields, renders JSON and writes in batches, so large payloads (full model
+responses, codebase context) are never serialized or written on the caller's
+thread. Queued events are flushed on interpreter exit.
+"""
+
+import atexit
+import hashlib
+import json
 import os
+import queue
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
 from pathlib import Path
+from types import CodeType
+from typing import Any, Callable, Iterator, List, Optional, TextIO
 
 import structlog
 
+from .config import LogSettings
+
+_SENTINEL = object()
+
+
+def _to_json(value: Any) -> Any:
+    """JSON fallback that dumps pydantic models, such as model output items."""
+    model_dump = getattr(value, "model_dump", None)
+    if callable(model_dump):
+        return model_dump(mode="json")
+    return str(value)
+
+
+def cap_large_fields(
+    event_dict: dict[str, Any],
+    cap: int,
+    on_full_payload: Optional[Callable[[dict[str, Any]], None]] = None,
+) -> dict[str, Any]:
+    """Replace fields larger than `cap` characters with a truncated digest.
+
+    A capped field becomes `{"truncated": <prefix>, "length": n, "sha256": h}`.
+    If `on_full_payload` is given, it receives the untruncated value keyed by
+    the same hash, so the full payload can be looked up from the digest.
+    """
+    for key, value in event_dict.items():
+        if key == "event" or value is None or isinstance(value, (bool, int, float)):
+            continue
+        text = value if isinstance(value, str) else json.dumps(value, default=_to_json)
+        if len(text) <= cap:
+            continue
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        event_dict[key] = {
+            "truncated": text[:cap],
+            "length": len(text),
+            "sha256": digest,
+        }
+        if on_full_payload is not None:
+            on_full_payload(
+                {
+                    "sha256": digest,
+                    "event": event_dict.get("event"),
+                    "field": key,
+                    "value": value,
+                }
+            )
+    return event_dict
+
+
+class BackgroundLogWriter:
+    """Queue-backed log writer that renders and writes events on its own thread."""
+
+    def __init__(
+        self,
+        log_file: Path,
+        field_cap: int,
+        payload_file: Optional[Path] = None,
+        batch_size: int = 256,
+    ):
+        self._log_file = log_file
+        self._payload_file = payload_file
+        self._field_cap = field_cap
+        self._batch_size = batch_size
+        self._render = structlog.processors.JSONRenderer(default=_to_json)
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, event_dict: dict[str, Any]) -> None:
+        """Enqueue an event for writing, starting the writer thread if needed."""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="storymachine-log-writer", daemon=True
+                    )
+                    self._thread.start()
+        # Copied, so the caller may go on changing what it logged
+        self._queue.put(
+            {
+                key: value.copy() if isinstance(value, (dict, list)) else value
+                for key, value in event_dict.items()
+            }
+        )
+
+    def flush(self) -> None:
+        """Block until every queued event has been written."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """Flush queued events and stop the writer thread."""
+        if self._thread is not None:
+            self._queue.put(_SENTINEL)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        # Files are opened on the writer thread, on first use
+        with self._log_file.open("a") as log:
+            payloads: Optional[TextIO] = None
+            try:
+                while True:
+                    batch = [self._queue.get()]
+                    while len(batch) < self._batch_size:
+                        try:
+                            batch.append(self._queue.get_nowait())
+                        except queue.Empty:
+                            break
+
+                    lines: List[str] = []
+                    payload_lines: List[str] = []
+                    stop = False
+                    for event_dict in batch:
+                        if event_dict is _SENTINEL:
+                            stop = True
+                            continue
+                        lines.append(self._render_line(event_dict, payload_lines))
+
+                    if lines:
+                        log.write("".join(lines))
+                        log.flush()
+                    if payload_lines and self._payload_file is not None:
+                        if payloads is None:
+                            payloads = self._payload_file.open("a")
+                        payloads.write("".join(payload_lines))
+                        payloads.flush()
+
+                    for _ in batch:
+                        self._queue.task_done()
+                    if stop:
+                        return
+            finally:
+                if payloads is not None:
+                    payloads.close()
+
+    def _render_line(self, event_dict: dict[str, Any], payload_lines: List[str]) -> str:
+        on_full_payload: Optional[Callable[[dict[str, Any]], None]] = None
+        if self._payload_file is not None:
+
+            def keep_payload(payload: dict[str, Any]) -> None:
+                payload_lines.append(str(self._render(None, "", payload)) + "\n")
+
+            on_full_payload = keep_payload
+
+        try:
+            cap_large_fields(event_dict, self._field_cap, on_full_payload)
+            return str(self._render(None, "", event_dict)) + "\n"
+        except Exception as e:  # never let a bad event kill the writer thread
+            return json.dumps({"event": "log_render_failed", "error": repr(e)}) + "\n"
+
+
+class QueueLogger:
+    """structlog logger that hands event dicts to a BackgroundLogWriter."""
+
+    def __init__(self, writer: BackgroundLogWriter):
+        self._writer = writer
+
+    def msg(self, event_dict: dict[str, Any]) -> None:
+        self._writer.submit(event_dict)
+
+    log = debug = info = warn = warning = msg
+    fatal = failure = err = error = critical = exception = msg
+
+
+class QueueLoggerFactory:
+    """Logger factory producing QueueLoggers that share one writer."""
+
+    def __init__(self, writer: BackgroundLogWriter):
+        self._writer = writer
+
+    def __call__(self, *args: Any) -> QueueLogger:
+        return QueueLogger(self._writer)
+
+
+def _hand_off(_logger: Any, _method_name: str, event_dict: Any) -> Any:
+    """Pass the event dict through unrendered; rendering happens in the writer."""
+    return (event_dict,), {}
+
+
+_writer: Optional[BackgroundLogWriter] = None
+
+# Bound loggers keyed by the calling function's code object
+_call_site_loggers: dict[CodeType, structlog.BoundLogger] = {}
+
 
 def configure_logging() -> None:
     """Configure structured logging with JSON output to file."""
-    log_file = Path("storymachine.log")
+    global _writer
+    settings = LogSettings()  # pyright: ignore[reportCallIssue]
+    if _writer is not None:
+        _writer.close()
+    _writer = BackgroundLogWriter(
+        log_file=Path(settings.log_file),
+        field_cap=settings.log_field_cap,
+        payload_file=Path(settings.log_payload_file)
+        if settings.log_full_payloads
+        else None,
+    )
+    atexit.register(_writer.close)
+    _call_site_loggers.clear()
 
     structlog.configure(
         processors=[
             structlog.contextvars.merge_contextvars,
             structlog.processors.add_log_level,
+            structlog.processors.TimeStamper(fmt="iso", utc=True),
             structlog.processors.StackInfoRenderer(),
             structlog.dev.set_exc_info,
-            structlog.processors.JSONRenderer(),
+            # Tracebacks must be captured on the calling thread
+            structlog.processors.format_exc_info,
+            _hand_off,
         ],
         wrapper_class=structlog.make_filtering_bound_logger(20),  # INFO level
-        logger_factory=structlog.WriteLoggerFactory(file=log_file.open("a")),
+        logger_factory=QueueLoggerFactory(_writer),
         cache_logger_on_first_use=False,
     )
 
 
+def flush_logs() -> None:
+    """Block until all queued log events have been written."""
+    if _writer is not None:
+        _writer.flush()
+
+
 def get_logger() -> structlog.BoundLogger:
-    """Get a logger with automatic file and function context."""
-    frame = inspect.currentframe()
-    if frame and frame.f_back:
-        caller_frame = frame.f_back
-        func_name = caller_frame.f_code.co_name
-        file_name = os.path.basename(caller_frame.f_code.co_filename)
-
-        return structlog.get_logger().bind(
-            file=file_name,
-            function=func_name,
+    """Get a logger with automatic file and function context.
+
+    The file/function binding is built once per call site and reused; run,
+    story and stage identifiers come from the current log context (see
+    `log_context`), so concurrent sessions stay attributable.
+    """
+    code = sys._getframe(1).f_code
+    logger = _call_site_loggers.get(code)
+    if logger is None:
+        if _writer is None:
+            configure_logging()
+        logger = structlog.get_logger().bind(
+            file=os.path.basename(code.co_filename),
+            function=code.co_name,
         )
+        _call_site_loggers[code] = logger
+    return logger
+
+
+def new_run_id() -> str:
+    """Generate an identifier for one workflow run."""
+    return uuid.uuid4().hex[:12]
+
+
+def current_run_id() -> Optional[str]:
+    """The run_id bound to the current context, if any."""
+    return structlog.contextvars.get_contextvars().get("run_id")
+
+
+def bind_log_context(**values: Any) -> None:
+    """Bind identifiers (run_id, story_index, stage, ...) to the current context."""
+    structlog.contextvars.bind_contextvars(**values)
+
 
-    return structlog.get_logger()
+def unbind_log_context(*keys: str) -> None:
+    """Remove identifiers previously bound with `bind_log_context`."""
+    structlog.contextvars.unbind_contextvars(*keys)
 
 
-# Configure logging on import
-configure_logging()
+@contextmanager
+def log_context(**values: Any) -> Iterator[None]:
+    """Bind identifiers for the duration of a block, restoring previous values."""
+    with structlog.contextvars.bound_contextvars(**values):
+        yield
@@ -0,0 +1,186 @@
+"""Event-loop-native progress display for concurrent workflow tasks.
+
+`ProgressRenderer` tracks every in-flight task with its elapsed time and the
+number of tokens streamed so far. On a TTY it redraws one line per task from
+an asyncio task on the workflow's event loop, without a thread of its own.
+Elsewhere (CI logs, pipes) it prints one plain line when a task
+starts and one when it ends, with no carriage-return frames.
+
+While a TTY renderer is active, `sys.stdout` goes through it: the frame is
+erased before anything else is printed (story titles, review prompts, output
+from worker threads) and redrawn below it on the next tick, so the cursor-up
+escapes never overwrite printed lines.
+
+Model calls report tokens with `add_tokens`, which finds the task through a
+context variable; `asyncio.to_thread` copies the context, so activities run
+in worker threads report to the task that started them.
+"""
+
+import asyncio
+import itertools
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional, TextIO
+
+FRAMES = "|/-\\"
+
+
+@dataclass
+class TaskProgress:
+    """State of one in-flight task."""
+
+    label: str
+    started: float
+    tokens: int = 0
+
+    def line(self, now: float) -> str:
+        tokens = f"  {self.tokens:,} tokens" if self.tokens else ""
+        return f"{self.label}  {now - self.started:.1f}s{tokens}"
+
+
+_current_task: ContextVar[Optional[TaskProgress]] = ContextVar(
+    "current_progress_task", default=None
+)
+
+
+def add_tokens(count: int) -> None:
+    """Add streamed or generated tokens to the current task, if any."""
+    task = _current_task.get()
+    if task is not None:
+        task.tokens += count
+
+
+class _PausingOutput:
+    """Stands in for `sys.stdout`, erasing the progress frame before writes."""
+
+    def __init__(self, renderer: "ProgressRenderer", target: TextIO):
+        self._renderer = renderer
+        self._target = target
+
+    def write(self, text: str) -> int:
+        renderer = self._renderer
+        with renderer._lock:
+            renderer._clear()
+            written = self._target.write(text)
+            self._target.flush()
+            if text:
+                renderer._line_open = not text.endswith("\n")
+        return written
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._target, name)
+
+
+class ProgressRenderer:
+    """Shows all in-flight tasks, redrawn in place on a TTY."""
+
+    def __init__(
+        self,
+        stream: Optional[TextIO] = None,
+        interval: float = 0.1,
+        tty: Optional[bool] = None,
+        enabled: bool = True,
+    ):
+        self.stream = stream if stream is not None else sys.stderr
+        self.interval = interval
+        # When disabled, tasks are still tracked (and count tokens) but not shown
+        self.enabled = enabled
+        self.tty = self.stream.isatty() if tty is None else tty
+        self.tasks: Dict[int, TaskProgress] = {}
+        self._ids = itertools.count()
+        self._frames = itertools.cycle(FRAMES)
+        self._drawn = 0
+        self._loop_task: Optional[asyncio.Task] = None
+        # Held while drawing or printing, since worker threads print too
+        self._lock = threading.RLock()
+        # Set while a printed line has no newline yet (e.g. an input prompt)
+        self._line_open = False
+        self._stdout: Optional[TextIO] = None
+
+    def __enter__(self) -> "ProgressRenderer":
+        # Entered from a coroutine; frames are drawn by a task on its loop
+        if self.tty and self.enabled:
+            self._loop_task = asyncio.get_running_loop().create_task(self._draw_loop())
+            self._stdout = sys.stdout
+            sys.stdout = _PausingOutput(self, sys.stdout)
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            self._loop_task = None
+        if self._stdout is not None:
+            sys.stdout = self._stdout
+            self._stdout = None
+        with self._lock:
+            self._clear()
+
+    @contextmanager
+    def task(self, label: str) -> Iterator[TaskProgress]:
+        """Track a block as an in-flight task with the given label."""
+        task_id = next(self._ids)
+        task = TaskProgress(label=label, started=time.monotonic())
+        self.tasks[task_id] = task
+        token = _current_task.set(task)
+        if self.tty:
+            self._draw()
+        else:
+            self._write(f"started: {label}\n")
+        failed = False
+        try:
+            yield task
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            _current_task.reset(token)
+            del self.tasks[task_id]
+            if self.tty:
+                self._draw()
+            else:
+                status = "failed" if failed else "done"
+                self._write(f"{status}: {task.line(time.monotonic())}\n")
+
+    async def _draw_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.tasks:
+                self._draw()
+
+    def _draw(self) -> None:
+        with self._lock:
+            if self._line_open:
+                return
+            if not self.tasks:
+                self._clear()
+                return
+            self._draw_frame()
+
+    def _draw_frame(self) -> None:
+        now = time.monotonic()
+        frame = next(self._frames)
+        lines = [f"{frame} {task.line(now)}" for task in list(self.tasks.values())]
+        out = [f"\x1b[{self._drawn}F" if self._drawn else "", "\x1b[?25l"]
+        out.extend(f"\x1b[2K{line}\n" for line in lines)
+        # Blank out lines left over from a taller previous frame
+        extra = self._drawn - len(lines)
+        if extra > 0:
+            out.append("\x1b[2K\n" * extra + f"\x1b[{extra}F")
+        self._drawn = len(lines)
+        self._write("".join(out))
+
+    def _clear(self) -> None:
+        if self._drawn:
+            n = self._drawn
+            self._write(f"\x1b[{n}F" + "\x1b[2K\n" * n + f"\x1b[{n}F\x1b[?25h")
+            self._drawn = 0
+
+    def _write(self, text: str) -> None:
+        if not self.enabled:
+            return
+        self.stream.write(text)
+        self.stream.flush()
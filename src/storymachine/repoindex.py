@@ -0,0 +1,485 @@
+"""Persistent symbol, import and path index of a local checkout.
+
+`storymachine index-repo PATH` parses every text file that `scan_tree`
+lists and stores the results in SQLite:
+
+- definitions: functions, classes, methods, types and module-level names,
+  with file and line
+- references: identifier counts per file
+- the module graph: each file's module name and the modules it imports
+
+Python is parsed with `ast`. Other languages (JavaScript/TypeScript, Go,
+Java/Kotlin/C#/Scala, Ruby, Rust, PHP) use line patterns. Updates are
+incremental: only files whose size or mtime changed are parsed again.
+
+The codebase context stage answers location questions from the index: where
+a named function, class or module is defined, and which files import a
+module. A question is answered only when all of it is such a lookup and every
+identifier it names is in the index. The remaining questions go to the `ask`
+agent. When the
+checkout's commit has moved since the last update, the index updates itself
+before it is used.
+"""
+
+import argparse
+import ast
+import re
+import sqlite3
+import subprocess
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .localrepo import MAX_SEARCH_BYTES, scan_tree
+
+INDEX_VERSION = "1"
+INDEX_FILENAME = "storymachine-index.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, module TEXT COLLATE NOCASE, size INTEGER, mtime_ns INTEGER
+);
+CREATE TABLE IF NOT EXISTS symbols (
+    name TEXT COLLATE NOCASE, kind TEXT, path TEXT, line INTEGER
+);
+CREATE TABLE IF NOT EXISTS imports (path TEXT, module TEXT COLLATE NOCASE, line INTEGER);
+CREATE TABLE IF NOT EXISTS refs (name TEXT COLLATE NOCASE, path TEXT, count INTEGER);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name);
+CREATE INDEX IF NOT EXISTS symbols_path ON symbols (path);
+CREATE INDEX IF NOT EXISTS imports_module ON imports (module);
+CREATE INDEX IF NOT EXISTS imports_path ON imports (path);
+CREATE INDEX IF NOT EXISTS refs_name ON refs (name);
+CREATE INDEX IF NOT EXISTS refs_path ON refs (path);
+CREATE INDEX IF NOT EXISTS files_module ON files (module);
+"""
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+
+_JS = (".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx")
+_JVM = (".java", ".kt", ".kts", ".scala", ".cs")
+
+# (extensions, kind, pattern with the name as group 1), applied per line
+DEFINITION_PATTERNS: List[Tuple[Tuple[str, ...], str, "re.Pattern[str]"]] = [
+    (_JS, "function", re.compile(r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\*?\s+([\w$]+)")),
+    (_JS, "class", re.compile(r"^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+([\w$]+)")),
+    (_JS, "type", re.compile(r"^\s*(?:export\s+)?(?:interface|type|enum)\s+([\w$]+)")),
+    (_JS, "variable", re.compile(r"^\s*(?:export\s+)?(?:const|let|var)\s+([\w$]+)\s*=")),
+    ((".go",), "function", re.compile(r"^func\s+(?:\([^)]*\)\s*)?(\w+)")),
+    ((".go",), "type", re.compile(r"^type\s+(\w+)")),
+    (_JVM, "class", re.compile(r"^\s*(?:[\w@]+\s+)*(?:class|interface|enum|record|object|trait)\s+(\w+)")),
+    (_JVM, "function", re.compile(r"^\s*(?:(?:public|private|protected|internal|static|final|override|suspend|async)\s+)*fun\s+(?:<[^>]*>\s*)?(\w+)")),
+    ((".rb",), "function", re.compile(r"^\s*def\s+(?:self\.)?(\w+[?!]?)")),
+    ((".rb",), "class", re.compile(r"^\s*(?:class|module)\s+([\w:]+)")),
+    ((".rs",), "function", re.compile(r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:async\s+)?fn\s+(\w+)")),
+    ((".rs",), "type", re.compile(r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:struct|enum|trait|mod|type)\s+(\w+)")),
+    ((".php",), "function", re.compile(r"^\s*(?:(?:public|private|protected|static)\s+)*function\s+(\w+)")),
+    ((".php",), "class", re.compile(r"^\s*(?:abstract\s+|final\s+)?(?:class|interface|trait)\s+(\w+)")),
+]  # fmt: skip
+
+IMPORT_PATTERNS: List[Tuple[Tuple[str, ...], "re.Pattern[str]"]] = [
+    (_JS, re.compile(r"""(?:\bfrom\s*|^\s*import\s*|\brequire\(\s*|\bimport\(\s*)['"]([^'"]+)['"]""")),
+    ((".go",), re.compile(r'^\s*(?:import\s+)?(?:[\w.]+\s+)?"([\w./-]+)"\s*$')),
+    ((".java", ".kt", ".kts", ".scala"), re.compile(r"^\s*import\s+(?:static\s+)?([\w.]+)")),
+    ((".cs",), re.compile(r"^\s*using\s+([\w.]+)\s*;")),
+    ((".rb",), re.compile(r"""^\s*require(?:_relative)?\s*\(?\s*['"]([^'"]+)""")),
+    ((".rs",), re.compile(r"^\s*(?:pub\s+)?use\s+([\w:]+)")),
+    ((".php",), re.compile(r"^\s*use\s+([\w\\]+)")),
+]  # fmt: skip
+
+# Whole questions the index can answer: where named code is defined or
+# imported, never how it works. The subject must name identifiers explicitly.
+_DEFINITION_QUESTIONS = [
+    re.compile(
+        r"where\s+(?:is|are)\s+(?P<subject>.+?)\s+"
+        r"(?:defined|declared|located|implemented)",
+        re.IGNORECASE,
+    ),
+    re.compile(r"where\s+(?:does|do)\s+(?P<subject>.+?)\s+live", re.IGNORECASE),
+    re.compile(
+        r"(?:in\s+)?which\s+(?:files?|modules?)\s+(?:is|are)\s+(?P<subject>.+?)\s+"
+        r"(?:defined|declared|located|implemented)(?:\s+in)?",
+        re.IGNORECASE,
+    ),
+    re.compile(
+        r"which\s+(?:files?|modules?)\s+(?:defines?|declares?)\s+(?P<subject>.+)",
+        re.IGNORECASE,
+    ),
+]
+_IMPORT_QUESTIONS = [
+    re.compile(
+        r"(?:which|what)\s+(?:files?|modules?|packages?)\s+imports?\s+(?P<subject>.+)",
+        re.IGNORECASE,
+    ),
+    re.compile(r"where\s+(?:is|are)\s+(?P<subject>.+?)\s+imported", re.IGNORECASE),
+]
+# Words around the identifiers of a subject, as in "the `User` class"
+_SUBJECT_WORDS = re.compile(
+    r"\b(?:the|class|classes|function|functions|method|methods|module|modules"
+    r"|package|packages|type|types)\b",
+    re.IGNORECASE,
+)
+_SUBJECT_SEPARATOR = re.compile(r"\s*(?:,|\band\b)\s*", re.IGNORECASE)
+_EXPLICIT_IDENTIFIER = re.compile(
+    r"`([^`]+)`|([A-Za-z]+[a-z0-9]*[A-Z]\w*|\w+_\w+|\w+\.\w+(?:\.\w+)*)(?:\(\))?"
+)
+
+
+@dataclass
+class ParsedFile:
+    """What one file defines, imports and mentions."""
+
+    module: Optional[str]
+    symbols: List[Tuple[str, str, int]] = field(default_factory=list)
+    imports: List[Tuple[str, int]] = field(default_factory=list)
+    refs: Counter = field(default_factory=Counter)
+
+
+@dataclass
+class IndexUpdate:
+    """What one `RepoIndex.update` changed."""
+
+    commit: Optional[str]
+    indexed: int
+    removed: int
+    unchanged: int
+    seconds: float
+
+
+def module_name(path: str) -> str:
+    """Module name of a file: dotted for Python, the path minus extension otherwise."""
+    stem = path.rsplit(".", 1)[0] if "." in path.rsplit("/", 1)[-1] else path
+    if not path.endswith(".py"):
+        return stem
+    parts = stem.split("/")
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    if parts and parts[0] in ("src", "lib"):
+        parts = parts[1:]
+    return ".".join(parts)
+
+
+def _parse_python(path: str, text: str, parsed: ParsedFile) -> bool:
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return False
+    package = (parsed.module or "").split(".")
+    if not path.endswith("__init__.py"):
+        package = package[:-1]
+
+    def visit(nodes: List[ast.stmt], owner: Optional[str]) -> None:
+        for node in nodes:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                kind = "method" if owner else "function"
+                parsed.symbols.append((node.name, kind, node.lineno))
+            elif isinstance(node, ast.ClassDef):
+                parsed.symbols.append((node.name, "class", node.lineno))
+                visit(node.body, node.name)
+            elif isinstance(node, (ast.Assign, ast.AnnAssign)) and owner is None:
+                targets = (
+                    node.targets if isinstance(node, ast.Assign) else [node.target]
+                )
+                for target in targets:
+                    if isinstance(target, ast.Name):
+                        parsed.symbols.append((target.id, "variable", node.lineno))
+            elif isinstance(node, ast.Import):
+                for alias in node.names:
+                    parsed.imports.append((alias.name, node.lineno))
+            elif isinstance(node, ast.ImportFrom):
+                base = node.module or ""
+                if node.level:
+                    # Relative imports resolve against this file's package
+                    parent = package[: len(package) - node.level + 1]
+                    base = ".".join(p for p in [*parent, base] if p)
+                parsed.imports.append((base, node.lineno))
+
+    visit(tree.body, None)
+    return True
+
+
+def _parse_by_patterns(path: str, text: str, parsed: ParsedFile) -> None:
+    definitions = [(k, p) for exts, k, p in DEFINITION_PATTERNS if path.endswith(exts)]
+    imports = [p for exts, p in IMPORT_PATTERNS if path.endswith(exts)]
+    if not definitions and not imports:
+        return
+    for number, line in enumerate(text.splitlines(), start=1):
+        for kind, pattern in definitions:
+            if match := pattern.match(line):
+                parsed.symbols.append((match.group(1), kind, number))
+        for pattern in imports:
+            for match in pattern.finditer(line):
+                parsed.imports.append((match.group(1), number))
+
+
+def parse_file(path: str, text: str) -> ParsedFile:
+    """Definitions, imports and identifier counts of one file."""
+    parsed = ParsedFile(module=module_name(path))
+    if not (path.endswith(".py") and _parse_python(path, text, parsed)):
+        _parse_by_patterns(path, text, parsed)
+    parsed.refs.update(_IDENTIFIER.findall(text))
+    return parsed
+
+
+def current_commit(root: Path) -> Optional[str]:
+    """The checked-out commit, or None outside a git work tree."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=root,
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def default_index_path(root: Path) -> Path:
+    """Index location for a checkout: inside .git if there is one."""
+    git_dir = root / ".git"
+    return git_dir / INDEX_FILENAME if git_dir.is_dir() else root / f".{INDEX_FILENAME}"
+
+
+class RepoIndex:
+    """Symbol, import and path index in one SQLite file."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        if self.meta("version") not in (None, INDEX_VERSION):
+            # An index from another version is rebuilt from scratch
+            for table in ("files", "symbols", "imports", "refs", "meta"):
+                self.db.execute(f"DELETE FROM {table}")
+        self.set_meta("version", INDEX_VERSION)
+        self.db.commit()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def meta(self, key: str) -> Optional[str]:
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: Optional[str]) -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+        )
+
+    def _delete(self, path: str) -> None:
+        for table in ("files", "symbols", "imports", "refs"):
+            self.db.execute(f"DELETE FROM {table} WHERE path = ?", (path,))
+
+    def update(self, root: Path) -> IndexUpdate:
+        """Bring the index up to date with the checkout, parsing changed files."""
+        start = time.perf_counter()
+        known = {
+            path: (size, mtime_ns)
+            for path, size, mtime_ns in self.db.execute(
+                "SELECT path, size, mtime_ns FROM files"
+            )
+        }
+        indexed = unchanged = 0
+        seen = set()
+        with self.db:
+            for item in scan_tree(root):
+                path = str(item["path"])
+                seen.add(path)
+                stat = (root / path).stat()
+                if known.get(path) == (stat.st_size, stat.st_mtime_ns):
+                    unchanged += 1
+                    continue
+                self._delete(path)
+                self._insert(path, root / path, stat.st_size, stat.st_mtime_ns)
+                indexed += 1
+            removed = [path for path in known if path not in seen]
+            for path in removed:
+                self._delete(path)
+            commit = current_commit(root)
+            self.set_meta("commit", commit)
+            self.set_meta("root", str(root))
+        return IndexUpdate(
+            commit, indexed, len(removed), unchanged, time.perf_counter() - start
+        )
+
+    def _insert(self, path: str, full: Path, size: int, mtime_ns: int) -> None:
+        parsed = ParsedFile(module=module_name(path))
+        if size <= MAX_SEARCH_BYTES:
+            parsed = parse_file(path, full.read_text(errors="replace"))
+        self.db.execute(
+            "INSERT INTO files (path, module, size, mtime_ns) VALUES (?, ?, ?, ?)",
+            (path, parsed.module, size, mtime_ns),
+        )
+        self.db.executemany(
+            "INSERT INTO symbols (name, kind, path, line) VALUES (?, ?, ?, ?)",
+            [(name, kind, path, line) for name, kind, line in parsed.symbols],
+        )
+        self.db.executemany(
+            "INSERT INTO imports (path, module, line) VALUES (?, ?, ?)",
+            [(path, module, line) for module, line in parsed.imports],
+        )
+        self.db.executemany(
+            "INSERT INTO refs (name, path, count) VALUES (?, ?, ?)",
+            [(name, path, count) for name, count in parsed.refs.items()],
+        )
+
+    def counts(self) -> Dict[str, int]:
+        """Rows in each table."""
+        return {
+            table: self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("files", "symbols", "imports")
+        }
+
+    def definitions(self, name: str, limit: int = 5) -> List[Tuple[str, str, int]]:
+        """(kind, path, line) of each definition of `name`."""
+        return self.db.execute(
+            "SELECT kind, path, line FROM symbols WHERE name = ?"
+            " ORDER BY kind != 'class', path LIMIT ?",
+            (name, limit),
+        ).fetchall()
+
+    def references(
+        self, name: str, exclude: Tuple[str, ...] = (), limit: int = 5
+    ) -> List[str]:
+        """Files that mention `name` most, other than `exclude`."""
+        rows = self.db.execute(
+            "SELECT path FROM refs WHERE name = ? ORDER BY count DESC, path",
+            (name,),
+        )
+        return [path for (path,) in rows if path not in exclude][:limit]
+
+    def modules(self, name: str, limit: int = 5) -> List[Tuple[str, str]]:
+        """(module, path) of modules named `name` or ending in it."""
+        return self.db.execute(
+            "SELECT module, path FROM files"
+            " WHERE module = ? OR module LIKE ? OR module LIKE ? ORDER BY path LIMIT ?",
+            (name, f"%.{name}", f"%/{name}", limit),
+        ).fetchall()
+
+    def importers(self, module: str, limit: int = 5) -> List[str]:
+        """Files that import `module` or a submodule of it."""
+        rows = self.db.execute(
+            "SELECT DISTINCT path FROM imports WHERE module = ? OR module LIKE ?"
+            " ORDER BY path LIMIT ?",
+            (module, f"{module}.%", limit),
+        )
+        return [path for (path,) in rows]
+
+    def answer(self, question: str) -> Optional[str]:
+        """Answer a location question from the index, or None to ask the agent.
+
+        Only a question that is nothing but a definition or import lookup of
+        explicitly named identifiers is answered, and only if every one of
+        them is in the index.
+        """
+        lookup = _location_lookup(question)
+        if lookup is None:
+            return None
+        kind, names = lookup
+        lines: List[str] = []
+        for name in names:
+            found = self._describe(name, importers_only=kind == "import")
+            if not found:
+                return None
+            lines.extend(found)
+        return "\n".join(lines)
+
+    def _describe(self, name: str, importers_only: bool) -> List[str]:
+        lines: List[str] = []
+        if not importers_only:
+            short = name.rsplit(".", 1)[-1]
+            definitions = self.definitions(short)
+            if definitions:
+                lines.append(f"`{name}` is defined in:")
+                lines.extend(f"- {p}:{line} ({kind})" for kind, p, line in definitions)
+                paths = tuple(p for _, p, _ in definitions)
+                used = self.references(short, exclude=paths)
+                if used:
+                    lines.append(f"  referenced in: {', '.join(used)}")
+        for module, path in self.modules(name):
+            lines.append(f"Module `{module}` is {path}")
+            importers = self.importers(module)
+            if importers:
+                lines.append(f"  imported by: {', '.join(importers)}")
+            elif importers_only:
+                lines.append("  imported by no indexed file")
+        return lines
+
+
+def _location_lookup(question: str) -> Optional[Tuple[str, List[str]]]:
+    """("definition" or "import", identifiers) if the whole question is a lookup."""
+    text = question.strip().rstrip("?.").strip()
+    for kind, patterns in (
+        ("definition", _DEFINITION_QUESTIONS),
+        ("import", _IMPORT_QUESTIONS),
+    ):
+        for pattern in patterns:
+            match = pattern.fullmatch(text)
+            if match is None:
+                continue
+            subject = _SUBJECT_WORDS.sub(" ", match.group("subject")).strip()
+            names = []
+            for part in _SUBJECT_SEPARATOR.split(subject):
+                identifier = _EXPLICIT_IDENTIFIER.fullmatch(part)
+                if identifier is None:
+                    return None
+                names.append((identifier.group(1) or identifier.group(2)).strip("()"))
+            return (kind, names) if names else None
+    return None
+
+
+def open_index(
+    local_root: Optional[Path], index_path: Optional[str]
+) -> Optional[RepoIndex]:
+    """The index for a checkout, updated if its commit moved; None if unbuilt.
+
+    `index_path` overrides the default location, e.g. an index built from a
+    clone of a repository that is otherwise read through its API.
+    """
+    path = Path(index_path) if index_path else None
+    if path is None and local_root is not None:
+        path = default_index_path(local_root)
+    if path is None or not path.exists():
+        return None
+    index = RepoIndex(path)
+    if local_root is not None and index.meta("commit") != current_commit(local_root):
+        index.update(local_root)
+    return index
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point for `storymachine index-repo`."""
+    parser = argparse.ArgumentParser(
+        prog="storymachine index-repo",
+        description="Build or update the symbol index of a local checkout",
+    )
+    parser.add_argument("path", help="Local checkout to index")
+    parser.add_argument(
+        "--index",
+        help="Index file (default: storymachine-index.sqlite in the checkout's .git)",
+    )
+    args = parser.parse_args(argv)
+
+    root = Path(args.path).expanduser().resolve()
+    if not root.is_dir():
+        parser.error(f"not a directory: {args.path}")
+    path = Path(args.index) if args.index else default_index_path(root)
+    index = RepoIndex(path)
+    try:
+        update = index.update(root)
+        counts = index.counts()
+    finally:
+        index.close()
+    print(
+        f"Indexed {update.indexed} files ({update.unchanged} unchanged, "
+        f"{update.removed} removed) in {update.seconds:.2f}s"
+    )
+    print(
+        f"{counts['files']} files, {counts['symbols']} definitions, "
+        f"{counts['imports']} imports at {update.commit or 'working tree'}"
+    )
+    print(f"Index written to {path}")
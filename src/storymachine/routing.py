@@ -0,0 +1,188 @@
+"""Per-stage model and reasoning effort selection.
+
+Each model call names its route, which is the stage making the call. Routes
+without an override use `MODEL` and `REASONING_EFFORT`. Question generation
+and context enrichment default to a small, fast model, and the problem
+breakdown keeps the main reasoning model. `ROUTE_MODELS` and
+`ROUTE_REASONING_EFFORTS` (JSON objects keyed by route) override these
+choices. An empty model name falls back to `MODEL`.
+
+`adapt_effort` then adjusts the route's reasoning effort for each call. It
+lowers effort for repeated revisions of one story, for very large prompts,
+and as a run with a deadline uses up its time budget.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, Optional, Tuple
+
+from .config import Settings
+
+ROUTES = (
+    "repo_questions",
+    "problem_break_down",
+    "acceptance_criteria",
+    "enrich_context",
+    "detail_story",
+    "local_repo",
+)
+
+DEFAULT_ROUTE_MODELS: Dict[str, str] = {
+    "repo_questions": "gpt-5-mini",
+    "enrich_context": "gpt-5-mini",
+    "local_repo": "gpt-5-mini",
+}
+
+EFFORT_LEVELS = ("minimal", "low", "medium", "high")
+# Per-story calls from this revision on are small edits; use the lowest effort
+MINIMAL_EFFORT_REVISION = 3
+PER_STORY_ROUTES = {"acceptance_criteria", "enrich_context", "detail_story"}
+
+
+@dataclass(frozen=True)
+class Route:
+    """Model and reasoning effort for one kind of model call."""
+
+    name: str
+    model: str
+    # None when the model does not take reasoning parameters
+    reasoning_effort: Optional[str]
+
+
+def supports_reasoning_parameters(model: str) -> bool:
+    """Check if the model supports reasoning and text parameters."""
+    reasoning_capable_models = {
+        "o1-preview",
+        "o1-mini",
+        "o1",
+        "o3-mini",
+        "o3",
+        "o4-mini",
+        "gpt-5",
+        "gpt-5-mini",
+        "gpt-5-nano",
+        "codex-mini-latest",
+    }
+
+    return (
+        model in reasoning_capable_models
+        or model.startswith("o1-")
+        or model.startswith("o3-")
+        or model.startswith("o4-")
+        or model.startswith("codex-")
+        or (model.startswith("gpt-5") and not model.startswith("gpt-5-chat"))
+    )
+
+
+def resolve_route(name: str, settings: Settings) -> Route:
+    """Pick the model and reasoning effort for a route."""
+    models = {**DEFAULT_ROUTE_MODELS, **settings.route_models}
+    model = models.get(name) or settings.model
+    effort = settings.route_reasoning_efforts.get(name, settings.reasoning_effort)
+    return Route(
+        name=name,
+        model=model,
+        reasoning_effort=effort if supports_reasoning_parameters(model) else None,
+    )
+
+
+@dataclass
+class RunBudget:
+    """Wall-clock time budget of one workflow run."""
+
+    deadline_seconds: float
+    started: float = field(default_factory=time.monotonic)
+
+    def remaining(self, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        return self.deadline_seconds - (now - self.started)
+
+
+@dataclass(frozen=True)
+class EffortDecision:
+    """Reasoning effort chosen for one call, and why it differs from the route's."""
+
+    effort: Optional[str]
+    reasons: Tuple[str, ...] = ()
+
+
+_budget: ContextVar[Optional[RunBudget]] = ContextVar("run_budget", default=None)
+_revision: ContextVar[int] = ContextVar("revision", default=0)
+
+
+def start_run_budget(deadline_seconds: Optional[float]) -> Optional[RunBudget]:
+    """Start the run's time budget in this context; None means no deadline."""
+    budget = RunBudget(deadline_seconds) if deadline_seconds else None
+    _budget.set(budget)
+    return budget
+
+
+def current_run_budget() -> Optional[RunBudget]:
+    """The run's time budget in this context, or None without a deadline."""
+    return _budget.get()
+
+
+def current_revision() -> int:
+    """Revision of the stage running in the current context."""
+    return _revision.get()
+
+
+@contextmanager
+def revision_scope(revision: int) -> Iterator[None]:
+    """Mark model calls in the block as belonging to the given revision."""
+    token = _revision.set(revision)
+    try:
+        yield
+    finally:
+        _revision.reset(token)
+
+
+def _lowest_effort(model: str) -> str:
+    # Only the gpt-5 family accepts "minimal"
+    return "minimal" if model.startswith("gpt-5") else "low"
+
+
+def _step_down(effort: str, model: str) -> str:
+    if effort not in EFFORT_LEVELS:
+        return effort
+    floor = EFFORT_LEVELS.index(_lowest_effort(model))
+    return EFFORT_LEVELS[max(floor, EFFORT_LEVELS.index(effort) - 1)]
+
+
+def adapt_effort(
+    route: Route,
+    prompt_tokens: int,
+    settings: Settings,
+    revision: Optional[int] = None,
+    budget: Optional[RunBudget] = None,
+    now: Optional[float] = None,
+) -> EffortDecision:
+    """Pick the reasoning effort for one call on `route`.
+
+    Revision and budget default to those of the current context.
+    """
+    effort = route.reasoning_effort
+    if effort is None or not settings.adaptive_reasoning_effort:
+        return EffortDecision(effort)
+    revision = _revision.get() if revision is None else revision
+    budget = _budget.get() if budget is None else budget
+
+    reasons = []
+    lowest = _lowest_effort(route.model)
+    if route.name in PER_STORY_ROUTES and revision >= MINIMAL_EFFORT_REVISION:
+        effort = lowest
+        reasons.append(f"revision {revision}")
+    if prompt_tokens > settings.effort_large_prompt_tokens:
+        effort = _step_down(effort, route.model)
+        reasons.append("large prompt")
+    if budget is not None:
+        remaining = budget.remaining(now)
+        if remaining < budget.deadline_seconds / 4:
+            effort = lowest
+            reasons.append("deadline nearly reached")
+        elif remaining < budget.deadline_seconds / 2:
+            effort = _step_down(effort, route.model)
+            reasons.append("over half of deadline used")
+    return EffortDecision(effort, tuple(reasons))
@@ -0,0 +1,203 @@
+"""`storymachine serve`: run many story sessions in one process.
+
+Each WebSocket connection to `/sessions` is one workflow run with its own
+conversation, log context and time budget. All sessions share one warm
+process: the OpenAI client and its connection pool, the response cache and
+the hedger's latency history.
+
+Protocol (JSON messages):
+
+    client: {"type": "start", "prd": "...", "tech_spec": "...",
+             "repo": "https://github.com/owner/repo", "deadline": 600}
+    server: {"type": "session", "session_id": "..."}
+    server: {"type": "stories", "revision": 0, "stories": [...],
+             "duplicates": [{"first": 0, "second": 3, "similarity": 0.82}]}
+    client: {"type": "review", "status": "rejected", "comment": "Split story 2"}
+    server: {"type": "story", "index": 0, "revision": 0, "story": {...}}
+    client: {"type": "review", "status": "accepted"}
+    ...
+    server: {"type": "completed", "stories": [...]}
+
+Every `stories` and `story` message awaits one `review`. Failures end the
+session with `{"type": "error", "message": "..."}`.
+
+With `JOB_QUEUE` set, the session's model work runs as interactive jobs on
+`storymachine worker` processes. A client that reconnects after a restart can
+pass its earlier `session_id` in `start`. Steps already done then return
+their stored results instead of calling the model again.
+"""
+
+import argparse
+import asyncio
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, List, Optional
+
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+
+from .ai import new_conversation
+from .config import Settings
+from .jobs import INTERACTIVE, submitter_from_settings
+from .logging import get_logger, log_context
+from .types import FeedbackResponse, FeedbackStatus, WorkflowInput
+from .workflow import w1
+
+
+class ProtocolError(ValueError):
+    """Raised for a client message that does not follow the protocol."""
+
+
+def parse_start(message: Any) -> tuple[WorkflowInput, Optional[float]]:
+    """Workflow input and deadline from a `start` message."""
+    if not isinstance(message, dict) or message.get("type") != "start":
+        raise ProtocolError("expected a start message")
+    missing = [key for key in ("prd", "tech_spec", "repo") if not message.get(key)]
+    if missing:
+        raise ProtocolError(f"start message is missing {', '.join(missing)}")
+    workflow_input = WorkflowInput(
+        prd_content=message["prd"],
+        tech_spec_content=message["tech_spec"],
+        repo_url=message["repo"],
+    )
+    return workflow_input, message.get("deadline")
+
+
+def parse_review(message: Any) -> FeedbackResponse:
+    """A review answer from a `review` message."""
+    if not isinstance(message, dict) or message.get("type") != "review":
+        raise ProtocolError("expected a review message")
+    try:
+        status = FeedbackStatus(message.get("status"))
+    except ValueError:
+        raise ProtocolError("review status must be 'accepted' or 'rejected'")
+    return FeedbackResponse(status=status, comment=message.get("comment"))
+
+
+class Session:
+    """One client's workflow run, fed reviews by its WebSocket."""
+
+    def __init__(self, websocket: WebSocket, session_id: Optional[str] = None):
+        self.id = session_id or uuid.uuid4().hex
+        self.websocket = websocket
+        self.reviews: asyncio.Queue[FeedbackResponse] = asyncio.Queue()
+        self.outbox: asyncio.Queue[Optional[dict]] = asyncio.Queue()
+
+    def send(self, message: dict) -> None:
+        """Queue a message; sent in order by `write_loop`."""
+        self.outbox.put_nowait(message)
+
+    async def review(self) -> FeedbackResponse:
+        return await self.reviews.get()
+
+    async def write_loop(self) -> None:
+        while (message := await self.outbox.get()) is not None:
+            await self.websocket.send_json(message)
+
+    async def read_loop(self) -> None:
+        """Pass reviews to the workflow until the client disconnects."""
+        while True:
+            message = await self.websocket.receive_json()
+            try:
+                self.reviews.put_nowait(parse_review(message))
+            except ProtocolError as e:
+                self.send({"type": "error", "message": str(e)})
+
+    async def run(self, workflow_input: WorkflowInput, deadline: Optional[float]):
+        """Run the workflow until it finishes or the client goes away."""
+        logger = get_logger()
+        settings = Settings()  # pyright: ignore[reportCallIssue]
+        new_conversation()
+        self.send({"type": "session", "session_id": self.id})
+        writer = asyncio.create_task(self.write_loop())
+        reader = asyncio.create_task(self.read_loop())
+        workflow = asyncio.create_task(
+            w1(
+                workflow_input,
+                review=self.review,
+                deadline=deadline,
+                on_event=self.send,
+                jobs=submitter_from_settings(settings, self.id, INTERACTIVE),
+                # Sessions share the process's stdout and stderr
+                console=False,
+            )
+        )
+        try:
+            await asyncio.wait({workflow, reader}, return_when=asyncio.FIRST_COMPLETED)
+            if not workflow.done():
+                # The reader only stops when the client has gone
+                workflow.cancel()
+                logger.info("session_disconnected")
+                return
+            if workflow.exception() is not None:
+                logger.error("session_failed", error=repr(workflow.exception()))
+                self.send({"type": "error", "message": str(workflow.exception())})
+            else:
+                logger.info("session_completed", story_count=len(workflow.result()))
+        finally:
+            reader.cancel()
+            self.outbox.put_nowait(None)
+            (read_error,) = await asyncio.gather(reader, return_exceptions=True)
+            if isinstance(read_error, Exception) and not isinstance(
+                read_error, WebSocketDisconnect
+            ):
+                logger.error("session_read_failed", error=repr(read_error))
+            await asyncio.gather(writer, return_exceptions=True)
+
+
+def create_app(max_threads: int = 64) -> FastAPI:
+    """The service app; `max_threads` bounds concurrent blocking activities."""
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        # Activities run in worker threads; size the pool for many sessions
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=max_threads)
+        )
+        yield
+
+    app = FastAPI(title="StoryMachine", lifespan=lifespan)
+
+    @app.get("/health")
+    async def health() -> dict:
+        return {"status": "ok"}
+
+    @app.websocket("/sessions")
+    async def sessions(websocket: WebSocket) -> None:
+        await websocket.accept()
+        try:
+            start = await websocket.receive_json()
+            workflow_input, deadline = parse_start(start)
+        except ProtocolError as e:
+            await websocket.send_json({"type": "error", "message": str(e)})
+            await websocket.close(code=1008)
+            return
+        except WebSocketDisconnect:
+            return
+        session = Session(websocket, start.get("session_id"))
+        with log_context(session_id=session.id):
+            await session.run(workflow_input, deadline)
+        await websocket.close()
+
+    return app
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point for `storymachine serve`."""
+    parser = argparse.ArgumentParser(
+        prog="storymachine serve",
+        description="Serve StoryMachine sessions over WebSocket",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--max-threads",
+        type=int,
+        default=64,
+        help="Worker threads for blocking activities, shared by all sessions",
+    )
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    uvicorn.run(create_app(args.max_threads), host=args.host, port=args.port)
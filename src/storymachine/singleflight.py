@@ -0,0 +1,101 @@
+"""Single-flight coalescing of identical in-flight requests.
+
+When sessions or batch runs target the same repository and documents, they
+make the same requests at about the same time. Through a `SingleFlight`, the
+first caller of a key runs the request. Callers that arrive while it is in
+flight wait for it and share its result, or its exception. Once the request
+has finished, the next caller of that key runs it again. Results are not
+kept; the response cache does that.
+
+Keys are the repository tree and `ask` questions per repository, and model
+calls by their response cache key: the same request at the same point of an
+identical conversation. Coalescing is per process.
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Optional, TypeVar
+
+from .cassette import active_cassette
+from .config import Settings
+from .logging import get_logger
+
+T = TypeVar("T")
+
+
+@dataclass
+class _Flight:
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Any = None
+    error: Optional[BaseException] = None
+
+
+@dataclass
+class FlightStats:
+    """Requests run, and requests answered by another caller's run."""
+
+    executed: int = 0
+    shared: int = 0
+
+
+class SingleFlight:
+    """Runs at most one request per key at a time."""
+
+    def __init__(self):
+        self.stats = FlightStats()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> tuple[T, bool]:
+        """Run `fn`, or wait for the call in flight; returns (result, shared)."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.stats.executed += 1
+            else:
+                self.stats.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+
+_flights = SingleFlight()
+
+
+def shared_flights(settings: Settings) -> Optional[SingleFlight]:
+    """The process-wide group, or None when coalescing is off.
+
+    A recording or replay needs every call made in order, so nothing is
+    coalesced while a cassette is in use.
+    """
+    if not settings.single_flight or active_cassette() is not None:
+        return None
+    return _flights
+
+
+def coalesce(
+    flights: Optional[SingleFlight], kind: str, key: Hashable, fn: Callable[[], T]
+) -> T:
+    """Run `fn` through `flights` (if any), logging when a result is shared."""
+    if flights is None:
+        return fn()
+    result, shared = flights.do((kind, key), fn)
+    if shared:
+        get_logger().info("request_shared", kind=kind)
+    return result
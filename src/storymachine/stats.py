@@ -0,0 +1,407 @@
+"""`storymachine stats`: summarize workflow runs from the JSON log.
+
+The log is streamed one line at a time, and lines whose event is not used
+here are skipped before JSON parsing, so multi-gigabyte logs are read in
+constant memory apart from one small summary per run.
+
+Events are grouped into runs by `run_id`. From each run it reports stage
+durations (`stage_completed`), model call latency (`openai_api_duration`),
+token usage (`*_response`, priced by the model each call was routed to),
+review revisions, and calls per story. Responses served from the response
+cache or shared with another run are counted separately and left out of the
+token totals, since no tokens were spent on them. Runs can
+be filtered by start date, model and repo, and exported as CSV or JSON.
+"""
+
+import argparse
+import csv
+import json
+import re
+import sys
+from dataclasses import asdict, dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO
+
+# USD per million (input, output) tokens; runs on other models have no cost
+MODEL_PRICES: Dict[str, tuple[float, float]] = {
+    "gpt-5": (1.25, 10.0),
+    "gpt-5-mini": (0.25, 2.0),
+    "gpt-5-nano": (0.05, 0.40),
+    "o3": (2.0, 8.0),
+    "o4-mini": (1.10, 4.40),
+    "gpt-4.1": (2.0, 8.0),
+    "gpt-4.1-mini": (0.40, 1.60),
+}
+
+PERCENTILES = (50, 90, 99)
+
+_EVENTS = {
+    "workflow_started",
+    "workflow_completed",
+    "stage_completed",
+    "openai_api_duration",
+    "openai_response",
+    "openai_followup_response",
+    "local_repo_response",
+    "stories_rejected",
+    "story_rejected",
+}
+_EVENT_PATTERN = re.compile(r'"event": "([^"]+)"')
+
+
+def estimate_cost(
+    model: Optional[str], input_tokens: int, output_tokens: int
+) -> Optional[float]:
+    """Cost in USD from MODEL_PRICES, or None for models not listed."""
+    prices = MODEL_PRICES.get(model or "")
+    if prices is None:
+        return None
+    return (input_tokens * prices[0] + output_tokens * prices[1]) / 1_000_000
+
+
+def estimate_model_costs(model_tokens: Dict[str, List[int]]) -> Optional[float]:
+    """Summed cost of (input, output) tokens per model, or None if none is priced."""
+    costs = [
+        estimate_cost(model, tokens[0], tokens[1])
+        for model, tokens in model_tokens.items()
+    ]
+    known = [cost for cost in costs if cost is not None]
+    return sum(known) if known else None
+
+
+@dataclass
+class RunSummary:
+    """Aggregated measurements for one workflow run."""
+
+    run_id: str
+    started_at: Optional[str] = None
+    model: Optional[str] = None
+    repo_url: Optional[str] = None
+    completed: bool = False
+    duration_seconds: Optional[float] = None
+    story_count: int = 0
+    api_calls: int = 0
+    responses: int = 0
+    cached_calls: int = 0
+    shared_calls: int = 0
+    breakdown_revisions: int = 0
+    story_revisions: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    stage_seconds: Dict[str, List[float]] = field(default_factory=dict)
+    api_seconds: Dict[str, List[float]] = field(default_factory=dict)
+    # (input, output) tokens per model, when responses log their routed model
+    model_tokens: Dict[str, List[int]] = field(default_factory=dict)
+
+    @property
+    def day(self) -> Optional[str]:
+        return self.started_at[:10] if self.started_at else None
+
+    @property
+    def calls_per_story(self) -> Optional[float]:
+        return self.api_calls / self.story_count if self.story_count else None
+
+    @property
+    def cost_usd(self) -> Optional[float]:
+        if not self.model_tokens:
+            return estimate_cost(self.model, self.input_tokens, self.output_tokens)
+        return estimate_model_costs(self.model_tokens)
+
+
+def iter_events(lines: Iterable[str]) -> Iterator[dict[str, Any]]:
+    """Parse log lines, skipping unused events and lines that are not JSON."""
+    for line in lines:
+        # Nested fields may also have an "event" key, so check every match
+        if _EVENTS.isdisjoint(_EVENT_PATTERN.findall(line)):
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            continue
+
+
+def collect_runs(events: Iterable[dict[str, Any]]) -> Dict[str, RunSummary]:
+    """Group events into per-run summaries keyed by run_id."""
+    runs: Dict[str, RunSummary] = {}
+    for event in events:
+        run_id = event.get("run_id")
+        if not run_id:
+            continue
+        run = runs.get(run_id)
+        if run is None:
+            run = runs[run_id] = RunSummary(run_id=run_id)
+
+        name = event.get("event")
+        stage = event.get("stage", "none")
+        if name == "workflow_started":
+            run.started_at = event.get("timestamp")
+            run.model = event.get("model")
+            run.repo_url = event.get("repo_url")
+        elif name == "workflow_completed":
+            run.completed = True
+            run.story_count = event.get("story_count", 0)
+            run.duration_seconds = event.get("duration_seconds")
+        elif name == "stage_completed":
+            run.stage_seconds.setdefault(stage, []).append(event["duration_seconds"])
+        elif name == "openai_api_duration":
+            run.api_calls += 1
+            run.api_seconds.setdefault(stage, []).append(event["duration_seconds"])
+        elif name in (
+            "openai_response",
+            "openai_followup_response",
+            "local_repo_response",
+        ):
+            run.responses += 1
+            if event.get("cached"):
+                run.cached_calls += 1
+                continue
+            if event.get("shared"):
+                run.shared_calls += 1
+                continue
+            input_tokens = event.get("input_tokens") or 0
+            output_tokens = event.get("output_tokens") or 0
+            run.input_tokens += input_tokens
+            run.output_tokens += output_tokens
+            if event.get("model"):
+                tokens = run.model_tokens.setdefault(event["model"], [0, 0])
+                tokens[0] += input_tokens
+                tokens[1] += output_tokens
+        elif name == "stories_rejected":
+            run.breakdown_revisions += 1
+        elif name == "story_rejected":
+            run.story_revisions += 1
+    return runs
+
+
+def filter_runs(
+    runs: Iterable[RunSummary],
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    model: Optional[str] = None,
+    repo: Optional[str] = None,
+) -> List[RunSummary]:
+    """Keep runs started within [since, until] on the given model and repo."""
+    kept = []
+    for run in runs:
+        if model is not None and run.model != model:
+            continue
+        if repo is not None and repo not in (run.repo_url or ""):
+            continue
+        if since is not None or until is not None:
+            if run.day is None:
+                continue
+            day = date.fromisoformat(run.day)
+            if (since is not None and day < since) or (
+                until is not None and day > until
+            ):
+                continue
+        kept.append(run)
+    return kept
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Linearly interpolated percentile of a non-empty list."""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def latency_table(runs: List[RunSummary], attribute: str) -> Dict[str, dict]:
+    """Count and percentiles per stage for `stage_seconds` or `api_seconds`."""
+    by_stage: Dict[str, List[float]] = {}
+    for run in runs:
+        for stage, values in getattr(run, attribute).items():
+            by_stage.setdefault(stage, []).extend(values)
+    return {
+        stage: {
+            "count": len(values),
+            **{f"p{q}": percentile(values, q) for q in PERCENTILES},
+            "max": max(values),
+        }
+        for stage, values in sorted(by_stage.items())
+    }
+
+
+def daily_trend(runs: List[RunSummary]) -> List[dict]:
+    """Runs, tokens and cost per start day."""
+    days: Dict[str, dict] = {}
+    for run in runs:
+        day = days.setdefault(
+            run.day or "unknown",
+            {"runs": 0, "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0},
+        )
+        day["runs"] += 1
+        day["input_tokens"] += run.input_tokens
+        day["output_tokens"] += run.output_tokens
+        day["cost_usd"] += run.cost_usd or 0.0
+    return [{"day": day, **values} for day, values in sorted(days.items())]
+
+
+def _mean(values: List[float]) -> Optional[float]:
+    return sum(values) / len(values) if values else None
+
+
+def build_report(runs: List[RunSummary]) -> dict:
+    """Summarize runs into the structure printed and exported as JSON."""
+    calls_per_story = [r.calls_per_story for r in runs if r.calls_per_story]
+    return {
+        "runs": len(runs),
+        "completed_runs": sum(r.completed for r in runs),
+        "stage_seconds": latency_table(runs, "stage_seconds"),
+        "api_seconds": latency_table(runs, "api_seconds"),
+        "mean_calls_per_story": _mean(calls_per_story),
+        "mean_breakdown_revisions": _mean([r.breakdown_revisions for r in runs]),
+        "mean_story_revisions": _mean([r.story_revisions for r in runs]),
+        "cached_calls": sum(r.cached_calls for r in runs),
+        "shared_calls": sum(r.shared_calls for r in runs),
+        "input_tokens": sum(r.input_tokens for r in runs),
+        "output_tokens": sum(r.output_tokens for r in runs),
+        "cost_usd": sum(r.cost_usd or 0.0 for r in runs),
+        "daily": daily_trend(runs),
+    }
+
+
+def _format_optional(value: Optional[float], spec: str = ".2f") -> str:
+    return "-" if value is None else format(value, spec)
+
+
+def print_report(report: dict, out: TextIO = sys.stdout) -> None:
+    """Print the report as plain-text tables."""
+    print(f"Runs: {report['runs']} ({report['completed_runs']} completed)", file=out)
+    for title, key in (
+        ("Stage duration (s)", "stage_seconds"),
+        ("Model call latency by stage (s)", "api_seconds"),
+    ):
+        print(f"\n{title}", file=out)
+        header = "".join(f"{f'p{q}':>9}" for q in PERCENTILES)
+        print(f"  {'stage':<28}{'count':>7}{header}{'max':>9}", file=out)
+        for stage, row in report[key].items():
+            cells = "".join(f"{row[f'p{q}']:>9.2f}" for q in PERCENTILES)
+            print(f"  {stage:<28}{row['count']:>7}{cells}{row['max']:>9.2f}", file=out)
+
+    print(
+        f"\nCalls per story: {_format_optional(report['mean_calls_per_story'])}",
+        file=out,
+    )
+    print(
+        "Revisions per run: "
+        f"{_format_optional(report['mean_breakdown_revisions'])} breakdown, "
+        f"{_format_optional(report['mean_story_revisions'])} story",
+        file=out,
+    )
+    print(
+        f"Calls not sent: {report['cached_calls']:,} cached, "
+        f"{report['shared_calls']:,} shared",
+        file=out,
+    )
+    print(
+        f"Tokens: {report['input_tokens']:,} in, {report['output_tokens']:,} out, "
+        f"${report['cost_usd']:.2f}",
+        file=out,
+    )
+
+    print("\nDaily trend", file=out)
+    for day in report["daily"]:
+        print(
+            f"  {day['day']:<12}{day['runs']:>5} runs "
+            f"{day['input_tokens'] + day['output_tokens']:>12,} tokens "
+            f"${day['cost_usd']:>9.2f}",
+            file=out,
+        )
+
+
+CSV_FIELDS = [
+    "run_id",
+    "started_at",
+    "model",
+    "repo_url",
+    "completed",
+    "duration_seconds",
+    "story_count",
+    "api_calls",
+    "cached_calls",
+    "shared_calls",
+    "calls_per_story",
+    "breakdown_revisions",
+    "story_revisions",
+    "input_tokens",
+    "output_tokens",
+    "cost_usd",
+]
+
+
+def write_csv(runs: List[RunSummary], out: TextIO) -> None:
+    """Write one row per run."""
+    writer = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    for run in runs:
+        writer.writerow({name: getattr(run, name) for name in CSV_FIELDS})
+
+
+def write_json(runs: List[RunSummary], report: dict, out: TextIO) -> None:
+    """Write the report with per-run details."""
+    run_rows = []
+    for run in runs:
+        row = asdict(run)
+        row.update(calls_per_story=run.calls_per_story, cost_usd=run.cost_usd)
+        run_rows.append(row)
+    json.dump({**report, "run_details": run_rows}, out, indent=2)
+    out.write("\n")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point for `storymachine stats`."""
+    parser = argparse.ArgumentParser(
+        prog="storymachine stats",
+        description="Summarize StoryMachine runs from the JSON log",
+    )
+    parser.add_argument(
+        "--log", type=str, help="Log file to read (default: LOG_FILE setting)"
+    )
+    parser.add_argument(
+        "--since", type=date.fromisoformat, help="Only runs started on/after YYYY-MM-DD"
+    )
+    parser.add_argument(
+        "--until",
+        type=date.fromisoformat,
+        help="Only runs started on/before YYYY-MM-DD",
+    )
+    parser.add_argument("--model", type=str, help="Only runs using this model")
+    parser.add_argument(
+        "--repo", type=str, help="Only runs whose repo URL contains this"
+    )
+    parser.add_argument(
+        "--format", choices=["table", "csv", "json"], default="table", dest="fmt"
+    )
+    parser.add_argument("--output", type=str, help="Write to this file, not stdout")
+    args = parser.parse_args(argv)
+
+    if args.log is None:
+        from .config import LogSettings
+
+        args.log = LogSettings().log_file  # pyright: ignore[reportCallIssue]
+    log_path = Path(args.log)
+    if not log_path.exists():
+        print(f"Error: Log file not found: {log_path}", file=sys.stderr)
+        sys.exit(1)
+
+    with log_path.open(errors="replace") as lines:
+        runs = collect_runs(iter_events(lines))
+    selected = filter_runs(runs.values(), args.since, args.until, args.model, args.repo)
+    selected.sort(key=lambda run: run.started_at or "")
+    report = build_report(selected)
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        if args.fmt == "csv":
+            write_csv(selected, out)
+        elif args.fmt == "json":
+            write_json(selected, report, out)
+        else:
+            print_report(report, out)
+    finally:
+        if args.output:
+            out.close()
@@ -0,0 +1,91 @@
+"""Incremental parsing of streamed tool-call arguments for StoryMachine."""
+
+import json
+from typing import Any, Callable, Generic, Iterable, Iterator, List, TypeVar
+
+from .codec import story_from_dict
+from .types import Story
+
+T = TypeVar("T")
+
+
+class ItemStreamParser(Generic[T]):
+    """Yield items of a `{"stories": [...]}` argument string as they complete.
+
+    Argument deltas are fed in as they arrive; each object directly inside the
+    top-level array is decoded as soon as its closing brace is seen, so callers
+    can act on the first item while the model is still writing the rest.
+    Trailing output that never completes (a truncated response) is ignored.
+    """
+
+    def __init__(self, factory: Callable[[dict[str, Any]], T]):
+        self._factory = factory
+        self._buffer = ""
+        self._pos = 0
+        # Stack of open containers, "{" or "[", outside of strings
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._item_start = -1
+        self.items: List[T] = []
+
+    def feed(self, delta: str) -> List[T]:
+        """Consume a chunk of argument text and return newly completed items."""
+        self._buffer += delta
+        completed: List[T] = []
+        buffer = self._buffer
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                # Items are the objects at path: root object -> array -> object
+                if char == "{" and self._stack == ["{", "["]:
+                    self._item_start = i
+                self._stack.append(char)
+            elif char in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if char == "}" and self._stack == ["{", "["] and self._item_start >= 0:
+                    item = self._factory(json.loads(buffer[self._item_start : i + 1]))
+                    completed.append(item)
+                    self._item_start = -1
+
+        # Drop text that can no longer be part of an item
+        if self._item_start >= 0:
+            self._buffer = buffer[self._item_start :]
+            self._item_start = 0
+        else:
+            self._buffer = ""
+        self._pos = len(self._buffer)
+
+        self.items.extend(completed)
+        return completed
+
+    def feed_all(self, deltas: Iterable[str]) -> Iterator[T]:
+        """Consume an iterable of deltas, yielding each item as it completes."""
+        for delta in deltas:
+            yield from self.feed(delta)
+
+
+class StoryStreamParser(ItemStreamParser[Story]):
+    """Incremental parser for `create_stories` tool arguments."""
+
+    def __init__(self):
+        super().__init__(story_from_dict)
+
+
+def recover_stories(arguments: str) -> List[Story]:
+    """Recover the complete stories from a possibly truncated argument string."""
+    parser = StoryStreamParser()
+    parser.feed(arguments)
+    return parser.items
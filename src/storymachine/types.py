@@ -1,17 +1,32 @@
 """Common types for StoryMachine workflow."""
 
-from dataclasses import dataclass
+import uuid
+from dataclasses import dataclass, field
 from enum import Enum
-from typing import List, Optional
+from typing import Optional, Sequence, Tuple
 
 
-@dataclass
+def new_story_id() -> str:
+    """Generate a short, stable identifier for a story."""
+    return uuid.uuid4().hex[:12]
+
+
+@dataclass(frozen=True, slots=True)
 class Story:
-    """A user story with title and acceptance criteria."""
+    """A user story with title and acceptance criteria.
+
+    Stories are immutable, and acceptance criteria are stored as a tuple; use
+    `dataclasses.replace` to derive updated copies.
+    """
 
     title: str
-    acceptance_criteria: List[str]
+    acceptance_criteria: Sequence[str]
     enriched_context: Optional[str] = None
+    id: str = field(default_factory=new_story_id)
+
+    def __post_init__(self) -> None:
+        criteria: Tuple[str, ...] = tuple(self.acceptance_criteria)
+        object.__setattr__(self, "acceptance_criteria", criteria)
 
     def __str__(self) -> str:
         criteria_text = "\n- ".join(self.acceptance_criteria)
@@ -21,7 +36,7 @@ class Story:
         return result
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class WorkflowInput:
     """Input data for the story generation workflow."""
 
@@ -1,112 +1,477 @@
 """Top-level workflow orchestration for StoryMachine."""
 
-from typing import List
+import asyncio
+import inspect
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, replace
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from .activities import (
     get_human_input,
     get_codebase_context,
     problem_break_down,
     define_acceptance_criteria,
+    define_acceptance_criteria_batch,
+    detail_story,
     enrich_context,
-    spinner,
     print_story_titles,
     print_story_with_criteria,
     print_final_stories,
 )
-from .types import FeedbackStatus, Story, WorkflowInput
-from .logging import get_logger
+from .ai import (
+    ConversationState,
+    current_conversation,
+    fork_conversation,
+    get_prompt,
+    merge_usage,
+)
+from .cassette import active_cassette
+from .codec import story_to_dict
+from .config import Settings
+from .console import echo, quiet_console
+from .dedupe import find_duplicates, merge_duplicates
+from .hedging import get_hedger
+from .jobs import JobSubmitter
+from .types import FeedbackResponse, FeedbackStatus, Story, WorkflowInput
+from .logging import (
+    get_logger,
+    log_context,
+    new_run_id,
+)
+from .progress import ProgressRenderer
+from .routing import revision_scope, start_run_budget
+from .tracing import span
+
+
+# Reviews may answer directly (CLI, evals) or asynchronously (server sessions)
+Review = Callable[[], Union[FeedbackResponse, Awaitable[FeedbackResponse]]]
+
+
+async def _ask(review: Review) -> FeedbackResponse:
+    """Get a review answer without blocking the loop on the reviewer."""
+    with span("human_review"):
+        if inspect.iscoroutinefunction(review):
+            return await review()
+        # A blocking reviewer (a console prompt) runs off the event loop
+        response = await asyncio.to_thread(review)
+        if inspect.isawaitable(response):
+            response = await response
+    return response
+
+
+@contextmanager
+def stage(name: str, revision: int = 0, **attributes: Any) -> Iterator[None]:
+    """Label logs with the stage, trace it as a span and log its duration.
+
+    `revision` counts earlier rejected attempts; reasoning effort adapts to it.
+    """
+    start = time.perf_counter()
+    with (
+        log_context(stage=name),
+        span(name, revision=revision, **attributes),
+        revision_scope(revision),
+    ):
+        try:
+            yield
+        finally:
+            get_logger().info(
+                "stage_completed", duration_seconds=time.perf_counter() - start
+            )
+
+
+def _check_duplicates(
+    stories: List[Story], settings: Settings
+) -> tuple[List[Story], List[tuple[int, int, float]]]:
+    """Merge likely duplicate stories, or return them to be flagged.
+
+    Returns the stories and the (first, second, similarity) positions left
+    to flag.
+    """
+    if settings.duplicate_stories == "off":
+        return stories, []
+    pairs = find_duplicates(stories, settings.duplicate_threshold)
+    if not pairs:
+        return stories, []
+    if settings.duplicate_stories == "merge":
+        merged = merge_duplicates(stories, pairs)
+        get_logger().info(
+            "duplicate_stories_merged", before=len(stories), after=len(merged)
+        )
+        return merged, []
+    get_logger().info("duplicate_stories_found", pairs=len(pairs))
+    return stories, [(p.first, p.second, round(p.similarity, 3)) for p in pairs]
+
+
+# Stories detailed at once while the breakdown is still being written
+EARLY_DETAILING_CONCURRENCY = 4
+
+
+class EarlyDetailing:
+    """Details stories in the background as the breakdown streams them.
+
+    Each streamed story gets acceptance criteria and enriched context in its
+    own conversation, which starts with the sources. A result is used only
+    for a story the breakdown review approves unchanged; the rest are dropped.
+    """
+
+    def __init__(self, workflow_input: WorkflowInput, fused: bool = False):
+        self.streamed: List[Story] = []
+        self._workflow_input = workflow_input
+        self._fused = fused
+        self._loop = asyncio.get_running_loop()
+        self._semaphore = asyncio.Semaphore(EARLY_DETAILING_CONCURRENCY)
+        self._conversation = current_conversation()
+        self._sources = [
+            {
+                "role": "user",
+                "content": get_prompt(
+                    "story_sources.md",
+                    prd_content=workflow_input.prd_content,
+                    tech_spec_content=workflow_input.tech_spec_content,
+                    repo_context=workflow_input.repo_context or "",
+                ),
+            }
+        ]
+        self._tasks: Dict[str, Tuple[Story, asyncio.Task]] = {}
+
+    def on_story(self, story: Story) -> None:
+        """Print a streamed story's title and queue it (from any thread)."""
+        if not self.streamed:
+            echo("Generated Stories:")
+        self.streamed.append(story)
+        echo(f"{len(self.streamed)}. {story.title}")
+        self._loop.call_soon_threadsafe(self._start, story)
+
+    def _start(self, story: Story) -> None:
+        self._tasks[story.id] = (story, asyncio.create_task(self._detail(story)))
+
+    async def _detail(self, story: Story) -> Tuple[Story, ConversationState]:
+        async with self._semaphore:
+            state = fork_conversation(self._sources)
+            with stage("early_detailing", story_id=story.id):
+                if self._fused:
+                    story = await asyncio.to_thread(
+                        detail_story, story, self._workflow_input
+                    )
+                    return story, state
+                story = await asyncio.to_thread(define_acceptance_criteria, story)
+                story = await asyncio.to_thread(
+                    enrich_context, story, self._workflow_input
+                )
+            return story, state
+
+    async def take(self, story: Story) -> Optional[Story]:
+        """The detailed story, if `story` was streamed and is unchanged."""
+        entry = self._tasks.pop(story.id, None)
+        if entry is None:
+            return None
+        streamed, task = entry
+        if streamed != story:
+            task.cancel()
+            return None
+        try:
+            detailed, state = await task
+        except Exception as e:
+            get_logger().warning(
+                "early_detailing_failed", story_id=story.id, error=str(e)
+            )
+            return None
+        merge_usage(self._conversation, state)
+        get_logger().info("early_detailing_used", story_id=story.id)
+        return detailed
+
+    def discard(self) -> None:
+        """Drop the stories streamed so far and any work left on them."""
+        for _, task in self._tasks.values():
+            if task.done() and not task.cancelled() and task.exception() is None:
+                merge_usage(self._conversation, task.result()[1])
+            task.cancel()
+        self._tasks.clear()
+        self.streamed = []
 
 
-async def w1(workflow_input: WorkflowInput) -> List[Story]:
-    """Simple workflow: break down PRD and tech spec into user stories."""
+async def w1(
+    workflow_input: WorkflowInput,
+    review: Optional[Review] = None,
+    deadline: Optional[float] = None,
+    on_event: Optional[Callable[[dict], None]] = None,
+    jobs: Optional[JobSubmitter] = None,
+    console: bool = True,
+) -> List[Story]:
+    """Simple workflow: break down PRD and tech spec into user stories.
+
+    Each review asks the user on the CLI unless `review` supplies the answer,
+    e.g. approving everything for unattended eval runs. With a `deadline` in
+    seconds, reasoning effort is lowered as the run uses up its time.
+
+    `on_event` receives JSON-ready dicts: the story list and its likely
+    duplicates before each breakdown review (`stories`), each detailed story before its review
+    (`story`), and the final stories (`completed`).
+
+    With `jobs`, codebase context, breakdown and detailing run as queued
+    jobs on worker processes instead of in this process.
+
+    With `console` off, nothing is printed and no progress is drawn, as for
+    server sessions that share one process.
+    """
+    review = review or get_human_input
+    emit = on_event or (lambda event: None)
     logger = get_logger()
-    logger.info("workflow_started")
-
-    # Get codebase context questions
-    print("\n--- Getting Codebase Context ---\n")
-    with spinner("Analyzing codebase needs"):
-        workflow_input.repo_context = await get_codebase_context(workflow_input)
-
-    logger.info(
-        "codebase_context_obtained", context_length=len(workflow_input.repo_context)
-    )
-
-    # Set default empty states
-    stories: List[Story] = []
-    comments = ""
-
-    while True:
-        # Generate or revise stories based on current state
-        spinner_text = "Machining Stories" if not stories else "Revising Stories"
-        with spinner(spinner_text):
-            stories = problem_break_down(workflow_input, stories, comments)
-
-        log_event = "stories_generated" if not comments else "stories_revised"
-        logger.info(log_event, count=len(stories))
-
-        # Display story titles
-        print_story_titles(stories)
-
-        # Get user feedback
-        response = get_human_input()
-
-        if response.status == FeedbackStatus.ACCEPTED:
-            logger.info("stories_approved")
-            print("Stories approved!")
-            break
-        else:
-            logger.info("stories_rejected", comment=response.comment)
-            print(f"Stories rejected. Comments: {response.comment}")
-            print("\nRevising stories based on feedback...\n")
-            comments = response.comment or ""
-
-    # Define acceptance criteria and enrich context for each story
-    for i, story in enumerate(stories):
-        print(f"\n--- Detailing Story {i + 1} ---")
+    settings = Settings()  # pyright: ignore[reportCallIssue]
+    start = time.perf_counter()
+    # Activities run in worker threads, which must share this conversation
+    current_conversation()
+    start_run_budget(deadline)
+
+    with (
+        log_context(run_id=new_run_id()),
+        nullcontext() if console else quiet_console(),
+        ProgressRenderer(enabled=console) as progress,
+        span("workflow", repo_url=workflow_input.repo_url, model=settings.model),
+    ):
+        logger.info(
+            "workflow_started",
+            repo_url=workflow_input.repo_url,
+            model=settings.model,
+            deadline_seconds=deadline,
+            fused_detailing=settings.fused_detailing,
+            batch_acceptance_criteria=settings.batch_acceptance_criteria,
+        )
+
+        # Get codebase context questions
+        echo("\n--- Getting Codebase Context ---\n")
+        with progress.task("Analyzing codebase needs"), stage("codebase_context"):
+            if jobs is not None:
+                repo_context = await jobs.codebase_context(workflow_input)
+            else:
+                repo_context = await get_codebase_context(workflow_input)
+        workflow_input = replace(workflow_input, repo_context=repo_context)
+
+        logger.info("codebase_context_obtained", context_length=len(repo_context))
 
         # Set default empty states
-        updated_story = story
+        stories: List[Story] = []
         comments = ""
+        breakdown_revisions = 0
+
+        # Stream the breakdown and start detailing each story as it arrives;
+        # recorded sessions replay in order, so not while using a cassette
+        early = (
+            EarlyDetailing(workflow_input, fused=settings.fused_detailing)
+            if settings.early_detailing
+            and jobs is None
+            and not settings.batch_acceptance_criteria
+            and active_cassette() is None
+            else None
+        )
 
         while True:
-            # Generate or revise acceptance criteria based on current state
-            spinner_text = (
-                "Defining Acceptance Criteria"
-                if not comments
-                else "Revising Acceptance Criteria"
-            )
-            with spinner(spinner_text):
-                updated_story = define_acceptance_criteria(updated_story, comments)
+            # Generate or revise stories based on current state
+            label = "Machining stories" if not stories else "Revising stories"
+            with (
+                progress.task(label),
+                stage("problem_break_down", revision=breakdown_revisions),
+            ):
+                if jobs is not None:
+                    stories = await jobs.problem_break_down(
+                        workflow_input, stories, comments
+                    )
+                else:
+                    stories = await asyncio.to_thread(
+                        problem_break_down,
+                        workflow_input,
+                        stories,
+                        comments,
+                        early.on_story if early is not None else None,
+                    )
 
-            # Enrich context with PRD and tech spec details
-            spinner_text = (
-                "Detailing the story" if not comments else "Revising the story"
-            )
-            with spinner(spinner_text):
-                updated_story = enrich_context(updated_story, workflow_input, comments)
+            log_event = "stories_generated" if not comments else "stories_revised"
+            logger.info(log_event, count=len(stories))
 
-            # Display story and its ACs
-            print_story_with_criteria(updated_story)
+            stories, duplicates = _check_duplicates(stories, settings)
 
-            # Get user feedback for this story
-            response = get_human_input()
+            # Display story titles, unless they were printed as they streamed
+            if early is None or early.streamed != stories:
+                print_story_titles(stories)
+            else:
+                echo()
+            for first, second, similarity in duplicates:
+                echo(
+                    f"Possible duplicates: stories {first + 1} and {second + 1} "
+                    f"({similarity:.0%} similar)"
+                )
+            if duplicates:
+                echo()
+            emit(
+                {
+                    "type": "stories",
+                    "revision": breakdown_revisions,
+                    "stories": [story_to_dict(story) for story in stories],
+                    "duplicates": [
+                        {"first": first, "second": second, "similarity": similarity}
+                        for first, second, similarity in duplicates
+                    ],
+                }
+            )
+
+            # Get user feedback
+            response = await _ask(review)
 
             if response.status == FeedbackStatus.ACCEPTED:
-                logger.info("story_approved", story_index=i)
-                print("Story approved!")
-                stories[i] = updated_story  # Update the story in the list
+                logger.info("stories_approved")
+                echo("Stories approved!")
                 break
             else:
-                logger.info(
-                    "story_rejected",
-                    story_index=i,
-                    comment=response.comment,
-                )
-                print(f"Story rejected. Comments: {response.comment}")
-                print("\nRevising story based on feedback...\n")
+                logger.info("stories_rejected", comment=response.comment)
+                echo(f"Stories rejected. Comments: {response.comment}")
+                echo("\nRevising stories based on feedback...\n")
                 comments = response.comment or ""
+                breakdown_revisions += 1
+                if early is not None:
+                    early.discard()
+
+        # Define acceptance criteria for all approved stories up front, if batching
+        batched = settings.batch_acceptance_criteria and not settings.fused_detailing
+        if batched:
+            with (
+                progress.task("Defining acceptance criteria"),
+                stage("acceptance_criteria_batch"),
+            ):
+                stories = await asyncio.to_thread(
+                    define_acceptance_criteria_batch,
+                    stories,
+                    settings.batch_token_budget,
+                )
+
+        # Define acceptance criteria and enrich context for each story
+        for i, story in enumerate(stories):
+            with (
+                span("story", story_index=i, story_id=story.id),
+                log_context(story_index=i),
+            ):
+                echo(f"\n--- Detailing Story {i + 1} ---")
+
+                # Set default empty states
+                updated_story = story
+                comments = ""
+                revisions = 0
+                prefix = f"Story {i + 1}: "
+
+                while True:
+                    suffix = f" (revision {revisions})" if revisions else ""
+                    detailed = None
+                    if early is not None and not revisions:
+                        with progress.task(f"{prefix}detailing"):
+                            detailed = await early.take(updated_story)
+                    if detailed is not None:
+                        # Detailed while the breakdown was still being written
+                        updated_story = detailed
+                    elif jobs is not None:
+                        # One job per review round, running the same steps
+                        if settings.fused_detailing:
+                            steps = ["detail_story"]
+                        elif comments or not batched:
+                            steps = ["acceptance_criteria", "enrich_context"]
+                        else:
+                            steps = ["enrich_context"]
+                        with (
+                            progress.task(f"{prefix}detailing{suffix}"),
+                            stage("detail_story_job", revision=revisions),
+                        ):
+                            updated_story = await jobs.detail_story(
+                                updated_story, workflow_input, comments, steps
+                            )
+                    elif settings.fused_detailing:
+                        # Acceptance criteria and context in a single model call
+                        with (
+                            progress.task(f"{prefix}detailing{suffix}"),
+                            stage("detail_story", revision=revisions),
+                        ):
+                            updated_story = await asyncio.to_thread(
+                                detail_story, updated_story, workflow_input, comments
+                            )
+                    else:
+                        # Generate or revise acceptance criteria based on current state;
+                        # batched criteria only need a per-story call on revision
+                        if comments or not batched:
+                            with (
+                                progress.task(f"{prefix}acceptance criteria{suffix}"),
+                                stage("acceptance_criteria", revision=revisions),
+                            ):
+                                updated_story = await asyncio.to_thread(
+                                    define_acceptance_criteria, updated_story, comments
+                                )
+
+                        # Enrich context with PRD and tech spec details
+                        with (
+                            progress.task(f"{prefix}enrich context{suffix}"),
+                            stage("enrich_context", revision=revisions),
+                        ):
+                            updated_story = await asyncio.to_thread(
+                                enrich_context, updated_story, workflow_input, comments
+                            )
+
+                    # Display story and its ACs
+                    print_story_with_criteria(updated_story)
+                    emit(
+                        {
+                            "type": "story",
+                            "index": i,
+                            "revision": revisions,
+                            "story": story_to_dict(updated_story),
+                        }
+                    )
+
+                    # Get user feedback for this story
+                    response = await _ask(review)
+
+                    if response.status == FeedbackStatus.ACCEPTED:
+                        logger.info("story_approved", story_index=i)
+                        echo("Story approved!")
+                        stories[i] = updated_story  # Update the story in the list
+                        break
+                    else:
+                        logger.info(
+                            "story_rejected",
+                            story_index=i,
+                            comment=response.comment,
+                        )
+                        echo(f"Story rejected. Comments: {response.comment}")
+                        echo("\nRevising story based on feedback...\n")
+                        comments = response.comment or ""
+                        revisions += 1
+
+        if early is not None:
+            early.discard()
+        logger.info(
+            "workflow_completed",
+            story_count=len(stories),
+            duration_seconds=time.perf_counter() - start,
+        )
+        if settings.hedge_requests:
+            hedge_stats = get_hedger(settings).stats
+            logger.info(
+                "hedge_stats", hedge_rate=hedge_stats.hedge_rate, **asdict(hedge_stats)
+            )
 
-    # Print final list of all stories with their ACs
-    print_final_stories(stories)
+        # Print final list of all stories with their ACs
+        print_final_stories(stories)
+        emit(
+            {
+                "type": "completed",
+                "stories": [story_to_dict(story) for story in stories],
+            }
+        )
 
-    return stories
+        return stories
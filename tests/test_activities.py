@@ -0,0 +1,154 @@
+"""Tests for activities module."""
+
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from storymachine.activities import (
+    chunk_stories_by_token_budget,
+    define_acceptance_criteria_batch,
+    detail_story,
+    merge_answers,
+    split_questions,
+)
+from storymachine.types import Story, WorkflowInput
+
+
+@pytest.fixture
+def workflow_input(
+    sample_prd_content: str, sample_tech_spec_content: str
+) -> WorkflowInput:
+    """Workflow input built from the sample documents."""
+    return WorkflowInput(
+        prd_content=sample_prd_content,
+        tech_spec_content=sample_tech_spec_content,
+        repo_url="https://github.com/owner/repo",
+        repo_context="Auth lives in app/auth.py",
+    )
+
+
+class TestDetailStory:
+    """Tests for the fused acceptance criteria + enrichment stage."""
+
+    def test_detail_story_makes_a_single_call_with_combined_prompt(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        workflow_input: WorkflowInput,
+        mock_openai_response: MagicMock,
+    ) -> None:
+        """Test that one API call carries the story, sources and feedback."""
+        call = MagicMock(return_value=mock_openai_response)
+        monkeypatch.setattr("storymachine.activities.call_openai_api", call)
+        story = Story(title="As a user, I want to log in", acceptance_criteria=[])
+
+        updated = detail_story(story, workflow_input, comments="Add lockout")
+
+        assert call.call_count == 1
+        prompt = call.call_args.args[0]
+        assert "As a user, I want to log in" in prompt
+        assert "Add lockout" in prompt
+        assert workflow_input.prd_content in prompt
+        assert workflow_input.tech_spec_content in prompt
+        assert "Auth lives in app/auth.py" in prompt
+        assert updated.title == "As a new user, I want to register with my email"
+
+    def test_detail_story_keeps_story_when_no_tool_output(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        workflow_input: WorkflowInput,
+    ) -> None:
+        """Test that the original story is returned if the model emits nothing."""
+        empty_response = MagicMock()
+        empty_response.output = []
+        monkeypatch.setattr(
+            "storymachine.activities.call_openai_api",
+            MagicMock(return_value=empty_response),
+        )
+        story = Story(title="Unchanged", acceptance_criteria=["AC"])
+
+        assert detail_story(story, workflow_input) is story
+
+
+class TestDefineAcceptanceCriteriaBatch:
+    """Tests for batched acceptance criteria generation."""
+
+    def test_chunks_respect_token_budget(self) -> None:
+        """Test that stories are split into budget-sized chunks in order."""
+        stories = [Story(title="x" * 400, acceptance_criteria=[]) for _ in range(5)]
+
+        chunks = chunk_stories_by_token_budget(stories, token_budget=250)
+
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        assert [s for chunk in chunks for s in chunk] == stories
+
+    def test_oversized_story_gets_its_own_chunk(self) -> None:
+        """Test that a story larger than the budget is still sent."""
+        stories = [Story(title="x" * 4000, acceptance_criteria=[])]
+
+        assert chunk_stories_by_token_budget(stories, token_budget=10) == [stories]
+
+    def test_results_are_matched_by_id_not_title(
+        self, monkeypatch: pytest.MonkeyPatch, sample_stories: list[Story]
+    ) -> None:
+        """Test that criteria map back by id, even if the model renames stories."""
+        first, second = sample_stories
+        tool_call = MagicMock()
+        tool_call.type = "function_call"
+        tool_call.arguments = json.dumps(
+            {
+                "stories": [
+                    {"id": second.id, "acceptance_criteria": ["Login works"]},
+                    {"id": "not-a-story", "acceptance_criteria": ["Ignored"]},
+                ]
+            }
+        )
+        response = MagicMock()
+        response.output = [tool_call]
+        call = MagicMock(return_value=response)
+        monkeypatch.setattr("storymachine.activities.call_openai_api", call)
+
+        updated = define_acceptance_criteria_batch(sample_stories)
+
+        assert call.call_count == 1
+        assert first.id in call.call_args.args[0]
+        assert updated[0] is first
+        assert updated[1].id == second.id
+        assert updated[1].title == second.title
+        assert updated[1].acceptance_criteria == ("Login works",)
+
+
+class TestSplitQuestions:
+    """Tests for splitting generated codebase questions."""
+
+    def test_list_items_become_questions_with_their_details(self) -> None:
+        """Test that top-level items split and sub-items stay with their parent."""
+        text = (
+            "## Authentication\n"
+            "1. Where are sessions created?\n"
+            "   - Include the cookie settings.\n"
+            "2) How are passwords hashed?\n"
+            "\n"
+            "## Storage\n"
+            "- Which ORM is used\n"
+            "  for the user table?\n"
+        )
+
+        assert split_questions(text) == [
+            "Where are sessions created? - Include the cookie settings.",
+            "How are passwords hashed?",
+            "Which ORM is used for the user table?",
+        ]
+
+    def test_text_without_a_list_is_one_question(self) -> None:
+        """Test that unlisted text is asked as a whole."""
+        assert split_questions("How is auth done?\nAnd logging?") == [
+            "How is auth done?\nAnd logging?"
+        ]
+        assert split_questions("  ") == []
+
+    def test_answers_are_merged_in_sections(self) -> None:
+        """Test that each answer is placed under its question."""
+        assert merge_answers(["Q1?", "Q2?"], ["A1\n", "A2"]) == (
+            "## Q1?\n\nA1\n\n## Q2?\n\nA2"
+        )
@@ -0,0 +1,56 @@
+"""Tests for cache module and cached model calls."""
+
+from pathlib import Path
+
+import pytest
+
+from benchmarks.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+from storymachine.ai import call_openai_api, new_conversation
+from storymachine.cache import ResponseCache, response_cache_key
+
+
+def test_cache_key_depends_on_conversation_but_not_its_id() -> None:
+    """Test that keys ignore the conversation id but include the chain."""
+    params = {"model": "m", "input": [{"role": "user", "content": "hi"}]}
+
+    first = response_cache_key("", {**params, "conversation": "conv_1"})
+    same = response_cache_key("", {**params, "conversation": "conv_2"})
+    later = response_cache_key(first, params)
+
+    assert first == same
+    assert later != first
+
+
+def test_cache_round_trip(tmp_path: Path) -> None:
+    """Test that stored data is returned and unknown keys miss."""
+    cache = ResponseCache(tmp_path)
+    cache.put("ab" * 32, {"id": "resp_1"})
+
+    assert cache.get("ab" * 32) == {"id": "resp_1"}
+    assert cache.get("cd" * 32) is None
+
+
+def test_repeated_conversation_is_served_from_cache(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test cache hits, and that a later miss first syncs the conversation."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
+    monkeypatch.setenv("RESPONSE_CACHE_DIR", str(tmp_path / "cache"))
+
+    def run(prompts: list[str]) -> int:
+        state = new_conversation()
+        for prompt in prompts:
+            call_openai_api(prompt)
+        return state.cached_calls
+
+    with FakeOpenAIServer(FakeOpenAIConfig()) as server:
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        assert run(["first", "second"]) == 0
+        assert run(["first", "second"]) == 2
+        assert server.stats.calls["/v1/responses"] == 2
+        assert run(["first", "second", "third"]) == 2
+
+    calls = server.stats.calls
+    assert calls["/v1/responses"] == 3
+    assert sum(n for path, n in calls.items() if path.endswith("/items")) == 1
@@ -0,0 +1,131 @@
+"""Tests for cassette module."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+import storymachine.activities as activities
+import storymachine.ai as ai
+from benchmarks.bench_e2e import ScriptedFeedback, fake_environment
+from benchmarks.fake_openai import FakeAskGithub, FakeOpenAIConfig, FakeOpenAIServer
+from storymachine.cassette import (
+    Cassette,
+    CassetteMismatchError,
+    through,
+    use_cassette,
+)
+from storymachine.types import WorkflowInput
+from storymachine.workflow import w1
+
+
+class TestCassette:
+    """Tests for recording and replaying interactions."""
+
+    def test_replay_returns_recorded_results_without_calling(
+        self, tmp_path: Path
+    ) -> None:
+        """Test that replay serves results in order and skips the real call."""
+        path = tmp_path / "session.cassette"
+        with use_cassette(Cassette.record(path)):
+            assert through("list_tree", "repo", lambda: ["a.py"]) == ["a.py"]
+            assert through("ask", ["repo", "q"], lambda: "answer") == "answer"
+
+        def fail():
+            raise AssertionError("called during replay")
+
+        with use_cassette(Cassette.load(path)) as cassette:
+            assert through("list_tree", "repo", fail) == ["a.py"]
+            assert through("ask", ["repo", "q"], fail) == "answer"
+        assert cassette.remaining == 0
+
+    def test_changed_request_raises(self, tmp_path: Path) -> None:
+        """Test that a request differing from the recording is reported."""
+        path = tmp_path / "session.cassette"
+        with use_cassette(Cassette.record(path)):
+            through("ask", ["repo", "q"], lambda: "answer")
+
+        with use_cassette(Cassette.load(path)):
+            with pytest.raises(CassetteMismatchError, match="request differs"):
+                through("ask", ["repo", "changed"], lambda: "answer")
+
+    def test_exhausted_cassette_raises(self, tmp_path: Path) -> None:
+        """Test that calls beyond the recording are reported."""
+        path = tmp_path / "session.cassette"
+        with use_cassette(Cassette.record(path)):
+            pass
+
+        with use_cassette(Cassette.load(path)):
+            with pytest.raises(CassetteMismatchError, match="exhausted"):
+                through("human_input", None, lambda: {})
+
+    def test_concurrent_calls_replay_out_of_order(self, tmp_path: Path) -> None:
+        """Test that replayed calls may arrive in a different order."""
+        path = tmp_path / "session.cassette"
+        with use_cassette(Cassette.record(path)):
+            through("ask", ["repo", "first"], lambda: "one")
+            through("ask", ["repo", "second"], lambda: "two")
+
+        with use_cassette(Cassette.load(path)) as cassette:
+            assert through("ask", ["repo", "second"], lambda: "") == "two"
+            assert through("ask", ["repo", "first"], lambda: "") == "one"
+        assert cassette.remaining == 0
+
+    def test_sessions_use_their_own_cassette(self, tmp_path: Path) -> None:
+        """Test that concurrent sessions each record to their own cassette."""
+
+        async def session(name: str) -> Cassette:
+            with use_cassette(Cassette.record(tmp_path / name)) as cassette:
+                await asyncio.sleep(0)
+                await asyncio.to_thread(through, "ask", name, lambda: name)
+            return cassette
+
+        async def both() -> list[Cassette]:
+            return list(await asyncio.gather(session("a"), session("b")))
+
+        first, second = asyncio.run(both())
+        assert [entry["result"] for entry in first.entries] == ["a"]
+        assert [entry["result"] for entry in second.entries] == ["b"]
+
+    def test_no_cassette_calls_through(self) -> None:
+        """Test that calls run normally with no active cassette."""
+        assert through("ask", None, lambda: "live") == "live"
+
+
+def test_workflow_replays_offline(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a recorded run replays to identical stories with no network."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
+    monkeypatch.setenv("BATCH_ACCEPTANCE_CRITERIA", "true")
+    path = tmp_path / "session.cassette"
+    workflow_input = WorkflowInput(
+        prd_content="PRD", tech_spec_content="Spec", repo_url="https://x/repo"
+    )
+    config = FakeOpenAIConfig(story_count=2)
+
+    ai.new_conversation()
+    monkeypatch.setattr(
+        activities, "_prompt_human_input", ScriptedFeedback(["n:Merge them"])
+    )
+    with (
+        FakeOpenAIServer(config) as server,
+        fake_environment(server, FakeAskGithub(config)),
+        use_cassette(Cassette.record(path)),
+    ):
+        recorded = asyncio.run(w1(workflow_input))
+
+    # Replay against an unreachable server, with review answers unavailable
+    ai.new_conversation()
+    monkeypatch.setattr(activities, "_prompt_human_input", None)
+    monkeypatch.setenv("OPENAI_BASE_URL", "http://127.0.0.1:9/v1")
+    ask_github = FakeAskGithub(config)
+    monkeypatch.setitem(sys.modules, "ask_github", ask_github.install())
+    with use_cassette(Cassette.load(path)) as cassette:
+        replayed = asyncio.run(w1(workflow_input))
+
+    assert replayed == recorded
+    assert cassette.remaining == 0
+    assert not ask_github.calls
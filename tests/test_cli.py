@@ -1,11 +1,12 @@
 """Tests for cli module."""
 
+import argparse
 import sys
 from pathlib import Path
 
 import pytest
 
-from storymachine.cli import main
+from storymachine.cli import main, parse_duration
 
 
 def test_main_parses_args_and_ingests_files(
@@ -21,7 +22,7 @@ def test_main_parses_args_and_ingests_files(
 
     called: dict[str, str] = {}
 
-    async def fake_w1(workflow_input):
+    async def fake_w1(workflow_input, deadline=None):
         called["prd_content"] = str("PRD content" in workflow_input.prd_content)
         called["tech_spec_content"] = str(
             "Tech spec content" in workflow_input.tech_spec_content
@@ -60,8 +61,10 @@ def test_main_parses_args_and_ingests_files(
     assert called["prd_content"] == "True"
     assert called["tech_spec_content"] == "True"
 
-    # Verify expected output structure
-    assert "Model:" in out
+    # Verify expected output structure: the model resolved for each route
+    assert "Models:" in out
+    assert "  problem_break_down: gpt-test" in out
+    assert "  repo_questions: gpt-5-mini" in out
 
 
 def test_main_missing_required_args_shows_usage(
@@ -84,6 +87,47 @@ def test_main_missing_required_args_shows_usage(
     assert "--tech-spec" in err
 
 
+def test_help_lists_subcommands(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test that --help lists the subcommands without importing them."""
+    with monkeypatch.context():
+        monkeypatch.setattr(sys, "argv", ["storymachine", "--help"])
+        monkeypatch.delitem(sys.modules, "storymachine.server", raising=False)
+
+        with pytest.raises(SystemExit) as excinfo:
+            main()
+
+    assert excinfo.value.code == 0
+    out = capsys.readouterr().out
+    for command in ("serve", "worker", "index-repo", "stats"):
+        assert command in out
+    assert "storymachine.server" not in sys.modules
+
+
+def test_subcommand_receives_remaining_arguments(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that a subcommand's module gets the arguments after its name."""
+    received: list[list[str]] = []
+
+    class FakeModule:
+        @staticmethod
+        def main(argv: list[str]) -> None:
+            received.append(argv)
+
+    with monkeypatch.context():
+        monkeypatch.setattr(
+            "storymachine.cli.importlib.import_module", lambda name, package: FakeModule
+        )
+        monkeypatch.setattr(
+            sys, "argv", ["storymachine", "stats", "--log-file", "run.log"]
+        )
+        main()
+
+    assert received == [["--log-file", "run.log"]]
+
+
 def test_main_missing_prd_file_exits(
     monkeypatch: pytest.MonkeyPatch, tmp_path: Path, capsys: pytest.CaptureFixture[str]
 ) -> None:
@@ -154,3 +198,12 @@ def test_main_missing_tech_spec_file_exits(
     assert excinfo.value.code == 1
     err = capsys.readouterr().err
     assert f"Error: Tech spec file not found: {missing_tech}" in err
+
+
+def test_parse_duration_accepts_units() -> None:
+    """Test that --deadline values parse to seconds."""
+    assert parse_duration("90") == 90
+    assert parse_duration("10m") == 600
+    assert parse_duration("1.5h") == 5400
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_duration("soon")
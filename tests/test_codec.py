@@ -0,0 +1,86 @@
+"""Tests for codec module."""
+
+import json
+from dataclasses import FrozenInstanceError
+from pathlib import Path
+
+import pytest
+
+from storymachine.codec import (
+    SchemaVersionError,
+    decode_stories,
+    encode_stories_binary,
+    encode_stories_json,
+    read_stories,
+    story_from_dict,
+    workflow_input_from_dict,
+    workflow_input_to_dict,
+    write_stories,
+)
+from storymachine.types import Story, WorkflowInput
+
+
+@pytest.fixture
+def stories() -> list[Story]:
+    """Stories exercising optional and non-ASCII fields."""
+    return [
+        Story(title="Café login", acceptance_criteria=["Given ü, then ✓"]),
+        Story(title="Profile", acceptance_criteria=[], enriched_context="- ctx"),
+    ]
+
+
+class TestStoryCodec:
+    """Tests for story encoding and decoding."""
+
+    def test_json_round_trip_preserves_ids(self, stories: list[Story]) -> None:
+        """Test that JSON encoding round trips every field, including ids."""
+        assert decode_stories(encode_stories_json(stories)) == stories
+
+    def test_binary_round_trip_preserves_ids(self, stories: list[Story]) -> None:
+        """Test that binary encoding round trips every field, including ids."""
+        assert decode_stories(encode_stories_binary(stories)) == stories
+
+    def test_unknown_schema_version_is_rejected(self, stories: list[Story]) -> None:
+        """Test that documents from another schema version are refused."""
+        document = json.loads(encode_stories_json(stories))
+        document["schema_version"] = 99
+
+        with pytest.raises(SchemaVersionError):
+            decode_stories(json.dumps(document))
+
+    def test_tool_items_get_fresh_ids(self) -> None:
+        """Test that tool output without ids still builds stories."""
+        story = story_from_dict({"title": "T", "acceptance_criteria": ["A"]})
+
+        assert story.id
+        assert story.enriched_context is None
+
+    @pytest.mark.parametrize("name", ["stories.json", "stories.smst"])
+    def test_write_and_read_stories(
+        self, tmp_path: Path, stories: list[Story], name: str
+    ) -> None:
+        """Test that files round trip in both formats."""
+        path = tmp_path / name
+        write_stories(path, stories)
+
+        assert read_stories(path) == stories
+
+
+def test_workflow_input_round_trip() -> None:
+    """Test that WorkflowInput round trips through its dict form."""
+    workflow_input = WorkflowInput("prd", "spec", "https://github.com/o/r", "ctx")
+
+    assert workflow_input_from_dict(workflow_input_to_dict(workflow_input)) == (
+        workflow_input
+    )
+
+
+def test_story_is_immutable() -> None:
+    """Test that stories are frozen and slotted, with immutable criteria."""
+    story = Story(title="T", acceptance_criteria=["A"])
+
+    with pytest.raises(FrozenInstanceError):
+        story.title = "changed"  # type: ignore[misc]
+    assert not hasattr(story, "__dict__")
+    assert story.acceptance_criteria == ("A",)
+    assert hash(story) == hash(Story(title="T", acceptance_criteria=["A"], id=story.id))
@@ -151,3 +151,13 @@ class TestSettings:
         settings = Settings()  # pyright: ignore[reportCallIssue]
 
         assert settings.model == "gpt-test"
+
+    def test_settings_rejects_unknown_duplicate_mode(self, monkeypatch) -> None:
+        """Test that DUPLICATE_STORIES only accepts off, flag or merge."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        monkeypatch.setenv("DUPLICATE_STORIES", "merged")
+
+        with pytest.raises(ValidationError) as exc_info:
+            Settings()  # pyright: ignore[reportCallIssue]
+
+        assert "DUPLICATE_STORIES" in str(exc_info.value)
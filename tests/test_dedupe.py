@@ -0,0 +1,320 @@
+"""Tests for near-duplicate story detection."""
+
+import asyncio
+import time
+
+import pytest
+
+from benchmarks.bench_dedupe import make_portfolio
+from benchmarks.bench_e2e import fake_environment
+from benchmarks.fake_openai import FakeAskGithub, FakeOpenAIConfig, FakeOpenAIServer
+from storymachine.ai import new_conversation
+from storymachine.config import Settings
+from storymachine.dedupe import (
+    cosine,
+    find_duplicates,
+    merge_duplicates,
+    tfidf_vectors,
+    words,
+)
+from storymachine.types import (
+    FeedbackResponse,
+    FeedbackStatus,
+    Story,
+    WorkflowInput,
+)
+from storymachine.workflow import w1
+
+
+@pytest.fixture(autouse=True)
+def isolated_cwd(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Run in a temp directory so no project .env or log file is used."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
+
+
+EXPORT = Story(
+    title="[M] As an admin, I want to export invoices as CSV",
+    acceptance_criteria=[
+        "Given invoices exist, when I click export, then a CSV file downloads",
+        "Given no invoices exist, when I click export, then I see an empty state",
+    ],
+    id="a",
+)
+EXPORT_AGAIN = Story(
+    title="[S] As an admin, I want to export my invoices to CSV",
+    acceptance_criteria=[
+        "Given invoices exist, when I click export, then a CSV file downloads",
+        "Given invoices exist, when the export finishes, then I get an email",
+    ],
+    id="b",
+)
+RESET = Story(
+    title="[S] As a user, I want to reset my password",
+    acceptance_criteria=[
+        "Given a registered email, when I request a reset, then a link is sent",
+    ],
+    id="c",
+)
+
+
+# Stories as a model writes them for one PRD, each with a model's rewording
+# of it, as happens when two breakdown passes cover the same ground
+REWORDED = [
+    (
+        Story(
+            title="[S] As a user, I want to reset my password via email",
+            acceptance_criteria=[
+                "Given I entered a registered email, when I request a password reset, then a reset link is emailed to me",
+                "Given the reset link is older than 24 hours, when I open it, then I see that the link has expired",
+                "Given I set a new password, when I submit it, then I can log in with the new password",
+            ],
+        ),
+        Story(
+            title="[S] As a customer, I want to receive a password reset link by email so I can regain access",
+            acceptance_criteria=[
+                "A password reset email with a link is sent when a registered email address is submitted",
+                "Reset links expire after 24 hours and show an expired message",
+                "After choosing a new password, I can sign in with the new password",
+            ],
+        ),
+    ),
+    (
+        Story(
+            title="[M] As a shopper, I want to filter products by price range",
+            acceptance_criteria=[
+                "Given the product list, when I set a minimum and maximum price, then only products in that price range are shown",
+                "Given a price filter is active, when I clear it, then all products are shown again",
+                "Given no products match the price range, then an empty state is shown",
+            ],
+        ),
+        Story(
+            title="[M] As a shopper, I want a price range filter on the product list",
+            acceptance_criteria=[
+                "Setting a min and max price shows only products priced within the range",
+                "Clearing the price filter shows all products again",
+                "When no products are within the price range, an empty state message is displayed",
+            ],
+        ),
+    ),
+    (
+        Story(
+            title="[L] As a team owner, I want to invite teammates by email",
+            acceptance_criteria=[
+                "Given I enter a valid email address, when I send the invite, then the teammate receives an invitation email",
+                "Given the invitation is accepted, then the teammate is added to my team",
+                "Given the email address is already a member, when I invite it, then I see an error",
+            ],
+        ),
+        Story(
+            title="[M] As a team owner, I want to send email invitations to new team members",
+            acceptance_criteria=[
+                "Sending an invite to a valid email address delivers an invitation email to that person",
+                "Accepting the invitation adds the person to the team",
+                "Inviting an email that already belongs to a team member shows an error",
+            ],
+        ),
+    ),
+    (
+        Story(
+            title="[S] As a user, I want to receive a notification when my order ships",
+            acceptance_criteria=[
+                "Given my order status changes to shipped, then I receive an email notification with the tracking number",
+                "Given push notifications are enabled, when my order ships, then I get a push notification",
+                "Given I opted out of shipping notifications, then no notification is sent",
+            ],
+        ),
+        Story(
+            title="[S] As a customer, I want to be notified when my order is shipped",
+            acceptance_criteria=[
+                "When an order is marked as shipped, an email with the tracking number is sent to the customer",
+                "Customers with push notifications enabled also receive a push notification on shipment",
+                "No shipping notification is sent to customers who opted out",
+            ],
+        ),
+    ),
+]
+# Different stories of the same product, which share much of its vocabulary
+RELATED = [
+    Story(
+        title="[S] As a user, I want to change my password from settings",
+        acceptance_criteria=[
+            "Given I am logged in, when I enter my current and a new password, then my password is updated",
+            "Given the current password is wrong, when I submit, then I see an error",
+        ],
+    ),
+    Story(
+        title="[S] As a user, I want to change my email address",
+        acceptance_criteria=[
+            "Given I enter a new email address, when I confirm it via the link sent to it, then my email is updated",
+            "Given the email address is already used, then I see an error",
+        ],
+    ),
+    Story(
+        title="[M] As a shopper, I want to sort products by price",
+        acceptance_criteria=[
+            "Given the product list, when I choose sort by price ascending, then the cheapest products are shown first",
+            "Given the product list, when I choose sort by price descending, then the most expensive products are shown first",
+        ],
+    ),
+    Story(
+        title="[M] As a shopper, I want to filter products by brand",
+        acceptance_criteria=[
+            "Given the product list, when I select one or more brands, then only products of those brands are shown",
+            "Given a brand filter is active, when I clear it, then all products are shown again",
+        ],
+    ),
+    Story(
+        title="[M] As a team owner, I want to remove a teammate from my team",
+        acceptance_criteria=[
+            "Given a teammate is a member, when I remove them, then they lose access to the team",
+            "Given I try to remove myself as the only owner, then I see an error",
+        ],
+    ),
+    Story(
+        title="[M] As an admin, I want to export payments as PDF",
+        acceptance_criteria=[
+            "Given payments exist, when I click Export PDF, then a PDF report of payments downloads",
+            "Given a date range filter is applied, when I export, then only payments in that range are included",
+        ],
+    ),
+]
+
+
+def test_words_ignore_size_tags_filler_and_word_endings() -> None:
+    """Test that size tags and boilerplate are dropped and word forms merged."""
+    items = set(words(RESET))
+
+    assert {"reset", "password", "link", "sent"} <= items
+    assert not {"s", "as", "user", "want", "i"} & items
+    assert words(Story(title="shipped ships shipping", acceptance_criteria=[])) == [
+        "ship",
+        "ship",
+        "ship",
+    ]
+
+
+def test_default_threshold_pairs_model_rewordings_only() -> None:
+    """Test that the default threshold pairs each rewording with its story.
+
+    Related stories of the same product must stay apart.
+    """
+    threshold = Settings().duplicate_threshold  # pyright: ignore[reportCallIssue]
+    stories = [story for pair in REWORDED for story in pair] + RELATED
+
+    pairs = find_duplicates(stories, threshold)
+
+    assert sorted((p.first, p.second) for p in pairs) == [
+        (0, 1),
+        (2, 3),
+        (4, 5),
+        (6, 7),
+    ]
+
+
+def test_find_duplicates_pairs_reworded_stories_only() -> None:
+    """Test that reworded stories are paired and unrelated ones are not."""
+    pairs = find_duplicates([EXPORT, RESET, EXPORT_AGAIN], threshold=0.5)
+
+    assert [(p.first, p.second) for p in pairs] == [(0, 2)]
+    assert 0.5 <= pairs[0].similarity < 1
+    assert find_duplicates([EXPORT, RESET, EXPORT_AGAIN], threshold=0.95) == []
+
+
+def test_merge_duplicates_keeps_first_story_with_all_criteria() -> None:
+    """Test that merging keeps the first story and adds new criteria in order."""
+    stories = [EXPORT, RESET, EXPORT_AGAIN]
+
+    merged = merge_duplicates(stories, find_duplicates(stories, threshold=0.5))
+
+    assert [story.id for story in merged] == ["a", "c"]
+    assert merged[0].title == EXPORT.title
+    assert merged[0].acceptance_criteria == (
+        *EXPORT.acceptance_criteria,
+        EXPORT_AGAIN.acceptance_criteria[1],
+    )
+
+
+def test_find_duplicates_handles_a_thousand_stories_quickly() -> None:
+    """Test that a 1,000-story portfolio is checked quickly."""
+    stories = make_portfolio(1000)
+
+    start = time.perf_counter()
+    pairs = find_duplicates(stories, threshold=0.55)
+    elapsed = time.perf_counter() - start
+
+    assert pairs
+    assert all(p.similarity >= 0.55 for p in pairs)
+    assert elapsed < 5
+
+
+def test_large_lists_find_every_pair() -> None:
+    """Test that the index over a large list finds what comparing all pairs does."""
+    stories = make_portfolio(400)
+    vectors = tfidf_vectors(stories)
+
+    expected = {
+        (first, second)
+        for first in range(len(stories))
+        for second in range(first + 1, len(stories))
+        if cosine(vectors[first], vectors[second]) >= 0.4
+    }
+
+    assert expected
+    assert {(p.first, p.second) for p in find_duplicates(stories, 0.4)} == expected
+
+
+def test_w1_merges_duplicate_stories_before_detailing(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that merge mode details only one story per duplicate group."""
+    monkeypatch.setenv("DUPLICATE_STORIES", "merge")
+    events = []
+    # The fake breakdown's stories differ only by a number
+    config = FakeOpenAIConfig(story_count=3)
+    workflow_input = WorkflowInput(
+        prd_content="PRD", tech_spec_content="Spec", repo_url="r"
+    )
+    with (
+        FakeOpenAIServer(config) as server,
+        fake_environment(server, FakeAskGithub(config)),
+    ):
+        new_conversation()
+        stories = asyncio.run(
+            w1(
+                workflow_input,
+                review=lambda: FeedbackResponse(status=FeedbackStatus.ACCEPTED),
+                on_event=events.append,
+            )
+        )
+
+    assert len(events[0]["stories"]) == len(stories) == 1
+    assert events[0]["duplicates"] == []
+    assert [e["type"] for e in events].count("story") == 1
+
+
+def test_w1_flags_duplicate_stories_for_review(
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test that flag mode keeps every story and reports the likely duplicates."""
+    events = []
+    config = FakeOpenAIConfig(story_count=2)
+    workflow_input = WorkflowInput(
+        prd_content="PRD", tech_spec_content="Spec", repo_url="r"
+    )
+    with (
+        FakeOpenAIServer(config) as server,
+        fake_environment(server, FakeAskGithub(config)),
+    ):
+        new_conversation()
+        stories = asyncio.run(
+            w1(
+                workflow_input,
+                review=lambda: FeedbackResponse(status=FeedbackStatus.ACCEPTED),
+                on_event=events.append,
+            )
+        )
+
+    assert len(stories) == 2
+    assert [(d["first"], d["second"]) for d in events[0]["duplicates"]] == [(0, 1)]
+    assert "Possible duplicates: stories 1 and 2" in capsys.readouterr().out
@@ -0,0 +1,64 @@
+"""Tests for markdown rendering in the evals/eval.py notebook."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("marimo")
+pytest.importorskip("fasthtml")
+pytest.importorskip("markdown")
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "evals"))
+
+import eval as eval_notebook  # noqa: E402  # pyright: ignore[reportMissingImports]
+
+
+@pytest.fixture
+def render_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """An empty in-memory cache in front of a temporary disk cache."""
+    monkeypatch.chdir(tmp_path)
+    cache_dir = tmp_path / "render"
+    monkeypatch.setattr(eval_notebook, "RENDER_CACHE_DIR", str(cache_dir))
+    eval_notebook.RENDERED.clear()
+    return cache_dir
+
+
+def test_render_cache_is_reused_from_disk(
+    render_cache: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a rendering is written once and read back in a new session."""
+    html = eval_notebook.render_markdown("# Title\n\n- item")
+
+    assert "<h1" in html
+    assert len(list(render_cache.rglob("*.html"))) == 1
+
+    # A new session starts with an empty in-memory cache
+    eval_notebook.RENDERED.clear()
+
+    def fail(content: str) -> str:
+        raise AssertionError("rendered again")
+
+    monkeypatch.setattr(eval_notebook, "markdown_to_html", fail)
+    assert eval_notebook.render_markdown("# Title\n\n- item") == html
+
+
+def test_empty_cache_dir_disables_the_disk_cache(
+    render_cache: Path, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test that an empty EVAL_RENDER_CACHE keeps renderings in memory only."""
+    monkeypatch.setattr(eval_notebook, "RENDER_CACHE_DIR", "")
+
+    eval_notebook.render_markdown("Some *text*")
+
+    assert not render_cache.exists()
+    assert list(tmp_path.iterdir()) == []
+    assert len(eval_notebook.RENDERED) == 1
+
+
+def test_default_cache_dir_is_outside_the_working_directory() -> None:
+    """Test that renderings are not cached in the current directory by default."""
+    default = Path(eval_notebook.RENDER_CACHE_DIR)
+
+    assert default.is_absolute()
+    assert default.parts[-2:] == ("storymachine", "render")
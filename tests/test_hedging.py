@@ -0,0 +1,140 @@
+"""Tests for hedging module and hedged model calls."""
+
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from benchmarks.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+import storymachine.ai as ai
+from storymachine.ai import call_openai_api, new_conversation
+from storymachine.hedging import HedgeCancelled, Hedger
+
+
+def warmed_hedger(**kwargs) -> Hedger:
+    """A hedger that has seen 0.05s latencies on the "r" route."""
+    hedger = Hedger(**kwargs)
+    for _ in range(10):
+        hedger.record("r", 0.05)
+    hedger.stats.calls = 100
+    return hedger
+
+
+def test_slow_primary_is_hedged_and_cancelled() -> None:
+    """Test that a straggler is raced by a duplicate and loses."""
+    hedger = warmed_hedger(percentile=90, max_rate=0.5)
+    attempts: list[threading.Event] = []
+    primary_cancelled = threading.Event()
+
+    def attempt(cancel: threading.Event) -> str:
+        attempts.append(cancel)
+        if len(attempts) == 1:
+            # The primary stalls until told to stop
+            if cancel.wait(timeout=5):
+                primary_cancelled.set()
+                raise HedgeCancelled()
+            return "primary"
+        return "hedge"
+
+    hedges: list[float] = []
+    result, hedge_won = hedger.run("r", attempt, on_hedge=hedges.append)
+
+    assert (result, hedge_won) == ("hedge", True)
+    assert hedges == [0.05]
+    assert primary_cancelled.wait(timeout=1)
+    assert hedger.stats.hedged == 1
+    assert hedger.stats.hedge_wins == 1
+
+
+def test_no_hedge_without_history_or_budget() -> None:
+    """Test that new routes and spent budgets run the primary alone."""
+
+    def slow(cancel: threading.Event) -> str:
+        time.sleep(0.15)
+        return "primary"
+
+    assert Hedger().run("r", slow) == ("primary", False)
+    spent = warmed_hedger(max_rate=0.1)
+    spent.stats.hedged = 10
+    assert spent.run("r", slow) == ("primary", False)
+    assert spent.stats.hedged == 10
+
+
+def test_failed_attempt_falls_back_to_the_other() -> None:
+    """Test that an error in one attempt does not lose a good result."""
+    hedger = warmed_hedger(max_rate=0.5)
+    calls = []
+
+    def attempt(cancel: threading.Event) -> str:
+        calls.append(cancel)
+        if len(calls) == 1:
+            time.sleep(0.2)
+            raise RuntimeError("primary failed")
+        return "hedge"
+
+    assert hedger.run("r", attempt) == ("hedge", True)
+
+
+def test_hedged_calls_use_the_server_conversation(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that hedged calls that are not hedged send only their own input."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
+    monkeypatch.setenv("HEDGE_REQUESTS", "true")
+
+    with FakeOpenAIServer(FakeOpenAIConfig()) as server:
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        state = new_conversation()
+        call_openai_api("first")
+        call_openai_api("second")
+
+    assert server.stats.calls["/v1/responses"] == 2
+    assert server.stats.conversation_requests == 2
+    assert state.pending_items == []
+    # History is kept locally for a duplicate to carry
+    contents = [item.get("content") for item in state.history]
+    assert contents[0] == "first" and "second" in contents
+
+
+def test_winning_duplicate_moves_the_run_to_a_new_conversation(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that only the duplicate carries history, and its win re-seeds."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
+    monkeypatch.setenv("HEDGE_REQUESTS", "true")
+    hedger = warmed_hedger(max_rate=1.0)
+    for _ in range(10):
+        hedger.record("default", 0.2)
+    monkeypatch.setattr(ai, "get_hedger", lambda settings: hedger)
+
+    sent: list[dict] = []
+    respond = ai._cancellable_response
+
+    def stall_in_conversation(client, params, cancel):
+        sent.append(params)
+        if "conversation" in params and params["input"][-1]["content"] == "second":
+            # This request stalls on the server until it loses
+            cancel.wait(timeout=5)
+            raise HedgeCancelled()
+        return respond(client, params, cancel)
+
+    monkeypatch.setattr(ai, "_cancellable_response", stall_in_conversation)
+
+    with FakeOpenAIServer(FakeOpenAIConfig()) as server:
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        state = new_conversation()
+        call_openai_api("first")
+        first_conversation = state.id
+        call_openai_api("second")
+
+    primary, second_primary, duplicate = sent
+    assert "conversation" in primary and "conversation" in second_primary
+    assert "conversation" not in duplicate
+    assert [item.get("content") for item in duplicate["input"]][0] == "first"
+    # The old conversation may hold the cancelled request, so it is dropped
+    assert state.id is None and first_conversation is not None
+    assert state.pending_items == state.history
+    assert hedger.stats.hedge_wins == 1
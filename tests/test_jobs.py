@@ -0,0 +1,196 @@
+"""Tests for the SQLite job queue and workers."""
+
+import asyncio
+import multiprocessing
+import threading
+
+import pytest
+
+from benchmarks.bench_e2e import fake_environment
+from benchmarks.fake_openai import FakeAskGithub, FakeOpenAIConfig, FakeOpenAIServer
+from storymachine.ai import new_conversation
+from storymachine import jobs
+from storymachine.jobs import BATCH, INTERACTIVE, JobQueue, JobSubmitter, Worker
+from storymachine.logging import current_run_id, log_context
+from storymachine.routing import current_run_budget, start_run_budget
+from storymachine.types import FeedbackResponse, FeedbackStatus, WorkflowInput
+from storymachine.workflow import w1
+
+
+@pytest.fixture(autouse=True)
+def isolated_cwd(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Run in a temp directory so no project .env or log file is used."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
+
+
+def test_interactive_jobs_are_claimed_before_batch_jobs(tmp_path) -> None:
+    """Test that claims follow priority, then submission order."""
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    first_batch = queue.enqueue("detail_story", {"n": 1}, BATCH)
+    queue.enqueue("detail_story", {"n": 2}, BATCH)
+    interactive = queue.enqueue("detail_story", {"n": 3}, INTERACTIVE)
+
+    claimed = [queue.claim("w1", 60), queue.claim("w1", 60)]
+    assert [job.id if job else None for job in claimed] == [interactive, first_batch]
+
+
+def test_enqueue_with_same_key_returns_existing_job(tmp_path) -> None:
+    """Test that an idempotency key maps to one job."""
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    job_id = queue.enqueue("codebase_context", {}, idempotency_key="k")
+
+    assert queue.enqueue("codebase_context", {}, idempotency_key="k") == job_id
+    assert queue.counts() == {"queued": 1}
+
+
+def test_enqueue_with_key_of_failed_job_queues_it_again(tmp_path) -> None:
+    """Test that resubmitting a failed job retries it with fresh attempts."""
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    job_id = queue.enqueue("codebase_context", {}, idempotency_key="k", max_attempts=1)
+    queue.claim("w1", 60)
+    queue.fail(job_id, "w1", "boom")
+    assert queue.counts() == {"failed": 1}
+
+    assert queue.enqueue("codebase_context", {}, idempotency_key="k") == job_id
+    job = queue.claim("w1", 60)
+    assert job is not None
+    assert (job.id, job.attempts, job.error) == (job_id, 1, None)
+
+
+def test_expired_lease_moves_job_to_another_worker(tmp_path) -> None:
+    """Test that a dead worker's job is reclaimed and its late result refused."""
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    job_id = queue.enqueue("detail_story", {})
+    queue.claim("dead", 10, now=1e10)
+
+    assert queue.claim("other", 10, now=1e10 + 5) is None
+    job = queue.claim("other", 10, now=1e10 + 11)
+    assert job is not None
+    assert (job.id, job.attempts) == (job_id, 2)
+    assert not queue.complete(job_id, "dead", {"late": True})
+    assert queue.complete(job_id, "other", {"ok": True})
+    assert queue.get(job_id).result == {"ok": True}
+
+
+def test_failed_job_is_retried_until_out_of_attempts(tmp_path) -> None:
+    """Test that failures back off and retry, then fail the job."""
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    job_id = queue.enqueue("detail_story", {}, max_attempts=2)
+
+    queue.claim("w", 60)
+    queue.fail(job_id, "w", "boom")
+    assert queue.get(job_id).status == "queued"
+    assert queue.claim("w", 60) is None  # Still backing off
+
+    queue.claim("w", 60, now=1e10)
+    queue.fail(job_id, "w", "boom again")
+    job = queue.get(job_id)
+    assert (job.status, job.error) == ("failed", "boom again")
+
+
+def _claim_all(path: str, worker_id: str, claimed) -> None:
+    queue = JobQueue(path)
+    while (job := queue.claim(worker_id, 60)) is not None:
+        claimed.put(job.id)
+
+
+def test_worker_processes_never_claim_the_same_job(tmp_path) -> None:
+    """Test that concurrent worker processes split the queue between them."""
+    path = str(tmp_path / "jobs.db")
+    queue = JobQueue(path)
+    job_ids = [queue.enqueue("detail_story", {"n": n}) for n in range(40)]
+
+    context = multiprocessing.get_context("spawn")
+    claimed = context.Queue()
+    processes = [
+        context.Process(target=_claim_all, args=(path, f"w{n}", claimed))
+        for n in range(4)
+    ]
+    for process in processes:
+        process.start()
+    ids = [claimed.get(timeout=30) for _ in job_ids]
+    for process in processes:
+        process.join(timeout=30)
+
+    assert sorted(ids) == job_ids
+    assert queue.counts() == {"running": 40}
+
+
+def test_w1_runs_steps_as_jobs(tmp_path) -> None:
+    """Test that a queued run matches a local one, and a rerun reuses results."""
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    stop = threading.Event()
+    worker = threading.Thread(
+        target=Worker(queue, "w", poll_interval=0.01).run, args=(stop,)
+    )
+
+    def approve() -> FeedbackResponse:
+        return FeedbackResponse(status=FeedbackStatus.ACCEPTED)
+
+    async def run() -> tuple:
+        state = new_conversation()
+        jobs = JobSubmitter(queue, "session", INTERACTIVE, poll_interval=0.01)
+        stories = await w1(workflow_input, review=approve, jobs=jobs)
+        return stories, state
+
+    config = FakeOpenAIConfig(story_count=2)
+    workflow_input = WorkflowInput(
+        prd_content="PRD", tech_spec_content="Spec", repo_url="r"
+    )
+    with (
+        FakeOpenAIServer(config) as server,
+        fake_environment(server, FakeAskGithub(config)),
+    ):
+        worker.start()
+        try:
+            stories, state = asyncio.run(run())
+            calls = server.stats.calls["/v1/responses"]
+            rerun, _ = asyncio.run(run())
+        finally:
+            stop.set()
+            worker.join()
+
+    assert len(stories) == 2
+    # Context, breakdown and one detailing job per story
+    assert queue.counts() == {"done": 4}
+    assert state.id is not None
+    assert state.calls == 1 + 2 * 5
+    # Same session and inputs: every step comes from the stored results
+    assert server.stats.calls["/v1/responses"] == calls
+    assert [s.title for s in rerun] == [s.title for s in stories]
+
+
+def test_jobs_carry_the_run_id_and_remaining_deadline(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a worker logs under the run's id and keeps its deadline."""
+    seen = {}
+
+    def probe(payload: dict) -> dict:
+        budget = current_run_budget()
+        seen["run_id"] = current_run_id()
+        seen["remaining"] = budget.remaining() if budget else None
+        return {}
+
+    monkeypatch.setitem(jobs.HANDLERS, "probe", probe)
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    stop = threading.Event()
+    worker = threading.Thread(
+        target=Worker(queue, "w", poll_interval=0.01).run, args=(stop,)
+    )
+
+    async def submit() -> None:
+        start_run_budget(60)
+        with log_context(run_id="run-1"):
+            await JobSubmitter(queue, "session", poll_interval=0.01)._run("probe", {})
+
+    worker.start()
+    try:
+        asyncio.run(submit())
+    finally:
+        stop.set()
+        worker.join()
+
+    assert seen["run_id"] == "run-1"
+    assert 0 < seen["remaining"] <= 60
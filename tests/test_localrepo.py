@@ -0,0 +1,195 @@
+"""Tests for local checkout scanning and search."""
+
+import asyncio
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from benchmarks.bench_e2e import fake_environment
+from benchmarks.fake_openai import FakeAskGithub, FakeOpenAIConfig, FakeOpenAIServer
+from storymachine.activities import (
+    ask_local_repo,
+    get_codebase_context,
+    run_local_repo_tool,
+)
+from storymachine.ai import new_conversation
+from storymachine.localrepo import (
+    answer_question,
+    list_files,
+    local_repo_path,
+    read_lines,
+    scan_tree,
+    search_terms,
+)
+from storymachine.types import WorkflowInput
+
+
+@pytest.fixture
+def checkout(tmp_path: Path) -> Path:
+    """A small repository with ignored, vendored and binary files."""
+    root = tmp_path / "repo"
+    files = {
+        ".gitignore": "*.log\nsecret/\n!keep.log\n",
+        "src/auth.py": "import hashlib\n\n\ndef authenticate_user(name):\n    pass\n",
+        "src/billing/invoice.py": "class Invoice:\n    total = 0\n",
+        "src/billing/.gitignore": "/generated.py\n",
+        "src/billing/generated.py": "x = 1\n",
+        "debug.log": "noise\n",
+        "keep.log": "kept\n",
+        "secret/token.py": "TOKEN = 1\n",
+        "node_modules/lib/index.js": "module.exports = {}\n",
+    }
+    for name, content in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    (root / "logo.png").write_bytes(b"\x89PNG\r\n")
+    (root / "data.bin").write_bytes(b"abc\0def")
+    return root
+
+
+EXPECTED = [".gitignore", "keep.log", "src/auth.py", "src/billing/invoice.py"]
+
+
+def test_scan_follows_gitignore_and_skips_vendored_and_binary(checkout) -> None:
+    """Test that the walker applies nested .gitignore files and skip rules."""
+    paths = [item["path"] for item in scan_tree(checkout, use_git=False)]
+
+    assert sorted(paths) == sorted([*EXPECTED, "src/billing/.gitignore"])
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+def test_scan_uses_git_inside_a_work_tree(checkout) -> None:
+    """Test that git lists the files when the checkout is a repository."""
+    subprocess.run(["git", "init", "-q"], cwd=checkout, check=True)
+
+    paths = [item["path"] for item in scan_tree(checkout)]
+
+    assert sorted(paths) == sorted([*EXPECTED, "src/billing/.gitignore"])
+
+
+def test_local_repo_path_only_accepts_directories(checkout) -> None:
+    """Test that URLs and missing paths are not treated as checkouts."""
+    assert local_repo_path(str(checkout)) == checkout.resolve()
+    assert local_repo_path("https://github.com/owner/repo") is None
+    assert local_repo_path(str(checkout / "missing")) is None
+
+
+def test_answer_lists_matching_files_and_lines(checkout) -> None:
+    """Test that a question finds the files and lines it mentions."""
+    assert search_terms("Where is authenticate_user implemented?") == [
+        "authenticate_user"
+    ]
+    paths = [item["path"] for item in scan_tree(checkout, use_git=False)]
+
+    answer = answer_question(checkout, "How does authenticate_user work?", paths)
+
+    assert answer.splitlines() == [
+        "- src/auth.py (matches: authenticate_user)",
+        "    4: def authenticate_user(name):",
+    ]
+
+
+def test_codebase_context_reads_a_local_checkout(checkout, monkeypatch) -> None:
+    """Test that a local path is scanned and explored without ask_github."""
+    monkeypatch.chdir(checkout.parent)
+    monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
+    config = FakeOpenAIConfig()
+    ask_github = FakeAskGithub(config)
+    workflow_input = WorkflowInput(
+        prd_content="PRD", tech_spec_content="Spec", repo_url=str(checkout)
+    )
+    with FakeOpenAIServer(config) as server, fake_environment(server, ask_github):
+        new_conversation()
+        context = asyncio.run(get_codebase_context(workflow_input))
+
+    assert ask_github.calls == {}
+    assert context.startswith("## Where is feature 1 implemented?")
+    # Each answer is the model's, after the search tool's results came back
+    assert context.count("Found:\nNo matching files found") == 5
+
+
+def test_read_lines_and_list_files(checkout) -> None:
+    """Test that files are read as numbered line ranges and listed by directory."""
+    paths = [item["path"] for item in scan_tree(checkout, use_git=False)]
+
+    assert (
+        read_lines(checkout, "src/auth.py", 4, 5)
+        == "4: def authenticate_user(name):\n5:     pass"
+    )
+    assert read_lines(checkout, "src/auth.py", 0, 1) == "1: import hashlib"
+    assert (
+        read_lines(checkout, "src/auth.py", 40, 50) == "src/auth.py has only 5 lines."
+    )
+    assert (
+        list_files(paths, "src/")
+        == "src/auth.py\nsrc/billing/.gitignore\nsrc/billing/invoice.py"
+    )
+    assert list_files(paths, "docs") == "No files under 'docs'."
+
+
+def test_read_file_tool_only_reads_listed_files(checkout) -> None:
+    """Test that the model cannot read files outside the scanned tree."""
+    paths = [item["path"] for item in scan_tree(checkout, use_git=False)]
+
+    def read(path: str) -> str:
+        arguments = f'{{"path": "{path}", "start_line": 1, "end_line": 1}}'
+        return run_local_repo_tool(checkout, paths, "read_file", arguments)
+
+    assert read("src/billing/invoice.py") == "1: class Invoice:"
+    assert read("secret/token.py") == "secret/token.py is not a file of the repository."
+    assert read("../repo/src/auth.py").endswith("is not a file of the repository.")
+    assert run_local_repo_tool(checkout, paths, "read_file", "{").startswith(
+        "Invalid arguments"
+    )
+
+
+def test_ask_local_repo_answers_after_using_the_tools(checkout, monkeypatch) -> None:
+    """Test that the model's answer follows a search of the checkout."""
+    monkeypatch.chdir(checkout.parent)
+    monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
+    paths = [item["path"] for item in scan_tree(checkout, use_git=False)]
+    config = FakeOpenAIConfig()
+    with (
+        FakeOpenAIServer(config) as server,
+        fake_environment(server, FakeAskGithub(config)),
+    ):
+        state = new_conversation()
+        answer = ask_local_repo(checkout, "How does authenticate_user work?", paths, 5)
+
+    assert answer.splitlines() == [
+        "Found:",
+        "- src/auth.py (matches: authenticate_user)",
+        "    4: def authenticate_user(name):",
+    ]
+    assert state.calls == 2
+    assert state.id is None and state.chain == ""
+    assert set(state.model_tokens) == {"gpt-5-mini"}
+    assert server.stats.conversation_requests == 0
+
+
+def test_ask_local_repo_reuses_cached_responses(
+    checkout, tmp_path, monkeypatch
+) -> None:
+    """Test that a repeated ask is answered from the response cache."""
+    monkeypatch.chdir(checkout.parent)
+    monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
+    monkeypatch.setenv("RESPONSE_CACHE_DIR", str(tmp_path / "cache"))
+    paths = [item["path"] for item in scan_tree(checkout, use_git=False)]
+    question = "How does authenticate_user work?"
+    config = FakeOpenAIConfig()
+    with (
+        FakeOpenAIServer(config) as server,
+        fake_environment(server, FakeAskGithub(config)),
+    ):
+        new_conversation()
+        first = ask_local_repo(checkout, question, paths, 5)
+        api_calls = server.stats.calls["/v1/responses"]
+        state = new_conversation()
+        second = ask_local_repo(checkout, question, paths, 5)
+
+    assert second == first
+    assert server.stats.calls["/v1/responses"] == api_calls == 2
+    assert (state.calls, state.cached_calls) == (2, 2)
@@ -0,0 +1,132 @@
+"""Tests for logging module."""
+
+import hashlib
+import json
+from pathlib import Path
+
+import structlog
+from openai.types.responses import ResponseOutputText
+
+from storymachine.logging import (
+    BackgroundLogWriter,
+    cap_large_fields,
+    get_logger,
+    log_context,
+)
+
+
+class TestCapLargeFields:
+    """Tests for cap_large_fields."""
+
+    def test_small_fields_are_untouched(self) -> None:
+        """Test that fields under the cap pass through unchanged."""
+        event = {"event": "x", "count": 3, "text": "short", "items": [1, 2]}
+
+        assert cap_large_fields(dict(event), cap=100) == event
+
+    def test_large_string_is_truncated_with_digest(self) -> None:
+        """Test that an oversized string becomes a prefix, length and hash."""
+        text = "a" * 50
+        event = cap_large_fields({"event": "x", "response": text}, cap=10)
+
+        assert event["response"] == {
+            "truncated": "a" * 10,
+            "length": 50,
+            "sha256": hashlib.sha256(text.encode()).hexdigest(),
+        }
+
+    def test_large_structure_is_sent_to_full_payload_hook(self) -> None:
+        """Test that the untruncated value is handed over under the same hash."""
+        payloads: list[dict] = []
+        output = [{"type": "message", "text": "b" * 100}]
+
+        event = cap_large_fields(
+            {"event": "openai_response", "response_output": output},
+            cap=20,
+            on_full_payload=payloads.append,
+        )
+
+        assert payloads == [
+            {
+                "sha256": event["response_output"]["sha256"],
+                "event": "openai_response",
+                "field": "response_output",
+                "value": output,
+            }
+        ]
+
+
+def test_background_writer_batches_and_writes_sidecar(tmp_path: Path) -> None:
+    """Test that queued events reach the log and full payloads reach the sidecar."""
+    log_file = tmp_path / "storymachine.log"
+    payload_file = tmp_path / "payloads.log"
+    writer = BackgroundLogWriter(log_file, field_cap=8, payload_file=payload_file)
+
+    for i in range(100):
+        writer.submit({"event": "tick", "i": i})
+    writer.submit({"event": "big", "response": "z" * 64})
+    writer.close()
+
+    lines = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert [line["i"] for line in lines[:100]] == list(range(100))
+    assert lines[100]["response"]["length"] == 64
+    (payload,) = [json.loads(line) for line in payload_file.read_text().splitlines()]
+    assert payload["value"] == "z" * 64
+    assert payload["sha256"] == lines[100]["response"]["sha256"]
+
+
+def test_background_writer_dumps_pydantic_models(tmp_path: Path) -> None:
+    """Test that model objects are serialized by the writer with model_dump."""
+    log_file = tmp_path / "storymachine.log"
+    writer = BackgroundLogWriter(log_file, field_cap=1000)
+    item = ResponseOutputText(type="output_text", text="hi", annotations=[])
+
+    writer.submit({"event": "openai_response", "response_output": [item]})
+    writer.close()
+
+    (line,) = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert line["response_output"] == [item.model_dump(mode="json")]
+
+
+def test_background_writer_logs_events_as_submitted(tmp_path: Path) -> None:
+    """Test that changing a logged dict or list afterwards does not change the log."""
+    log_file = tmp_path / "storymachine.log"
+    writer = BackgroundLogWriter(log_file, field_cap=100)
+    items = ["first"]
+    event = {"event": "items", "items": items}
+
+    writer.submit(event)
+    event["event"] = "changed"
+    items.append("second")
+    writer.close()
+
+    (line,) = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert line == {"event": "items", "items": ["first"]}
+
+
+class TestGetLogger:
+    """Tests for get_logger and the log context."""
+
+    def test_logger_is_cached_per_call_site(self) -> None:
+        """Test that repeated calls from one function reuse the bound logger."""
+
+        def call_site():
+            return get_logger()
+
+        def other_call_site():
+            return get_logger()
+
+        assert call_site() is call_site()
+        assert call_site() is not other_call_site()
+
+    def test_log_context_binds_and_restores_identifiers(self) -> None:
+        """Test that run/story/stage identifiers are scoped to the block."""
+        with log_context(run_id="r1", story_index=2):
+            with log_context(stage="enrich_context"):
+                inner = structlog.contextvars.get_contextvars()
+            outer = structlog.contextvars.get_contextvars()
+        after = structlog.contextvars.get_contextvars()
+
+        assert inner == {"run_id": "r1", "story_index": 2, "stage": "enrich_context"}
+        assert outer == {"run_id": "r1", "story_index": 2}
+        assert "run_id" not in after
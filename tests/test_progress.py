@@ -0,0 +1,93 @@
+"""Tests for progress module."""
+
+import asyncio
+import io
+import sys
+
+import pytest
+
+from storymachine.progress import ProgressRenderer, add_tokens
+
+
+def test_plain_output_has_one_line_per_start_and_end() -> None:
+    """Test that non-TTY output is plain lines without control characters."""
+    stream = io.StringIO()
+
+    async def run() -> None:
+        with ProgressRenderer(stream, tty=False) as progress:
+            with progress.task("Story 1: enrich context"):
+                await asyncio.to_thread(add_tokens, 1200)
+
+    asyncio.run(run())
+
+    lines = stream.getvalue().splitlines()
+    assert lines[0] == "started: Story 1: enrich context"
+    assert lines[1].startswith("done: Story 1: enrich context")
+    assert lines[1].endswith("1,200 tokens")
+    assert "\r" not in stream.getvalue() and "\x1b" not in stream.getvalue()
+
+
+def test_failed_task_is_reported() -> None:
+    """Test that a task ending in an exception is marked failed."""
+    stream = io.StringIO()
+
+    async def run() -> None:
+        with ProgressRenderer(stream, tty=False) as progress:
+            with progress.task("Machining stories"):
+                raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run())
+
+    assert stream.getvalue().splitlines()[-1].startswith("failed: Machining")
+
+
+def test_tty_frame_shows_all_in_flight_tasks() -> None:
+    """Test that concurrent tasks are drawn together and cleared at the end."""
+    stream = io.StringIO()
+    frames: list[list[str]] = []
+
+    async def work(progress: ProgressRenderer, label: str) -> None:
+        with progress.task(label):
+            await asyncio.sleep(0.05)
+
+    async def run() -> None:
+        with ProgressRenderer(stream, interval=0.01, tty=True) as progress:
+            pending = asyncio.gather(
+                work(progress, "Story 1: acceptance criteria"),
+                work(progress, "Story 2: enrich context"),
+            )
+            await asyncio.sleep(0.02)
+            frames.append([task.label for task in progress.tasks.values()])
+            await pending
+
+    asyncio.run(run())
+
+    assert frames == [["Story 1: acceptance criteria", "Story 2: enrich context"]]
+    output = stream.getvalue()
+    assert "Story 2: enrich context" in output
+    # The frame is erased and the cursor restored when the renderer exits
+    assert output.endswith("\x1b[?25h")
+
+
+def test_printed_lines_erase_the_frame_first(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that stdout output from worker threads is not drawn over."""
+    # Progress and stdout share one terminal
+    terminal = io.StringIO()
+    monkeypatch.setattr("sys.stdout", terminal)
+
+    async def run() -> None:
+        with ProgressRenderer(terminal, interval=0.01, tty=True) as progress:
+            with progress.task("Story 1: enrich context"):
+                await asyncio.sleep(0.03)
+                await asyncio.to_thread(print, "1. Export reports")
+                await asyncio.sleep(0.03)
+
+    asyncio.run(run())
+
+    output = terminal.getvalue()
+    # The frame was cleared (cursor shown again) just before the line
+    assert "\x1b[?25h1. Export reports\n" in output
+    # and redrawn below it afterwards
+    assert "Story 1: enrich context" in output.split("1. Export reports\n")[1]
+    assert sys.stdout is terminal
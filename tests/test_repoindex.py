@@ -0,0 +1,230 @@
+"""Tests for the local symbol index."""
+
+import asyncio
+import os
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from benchmarks.bench_e2e import fake_environment
+from benchmarks.fake_openai import FakeAskGithub, FakeOpenAIConfig, FakeOpenAIServer
+from storymachine import activities
+from storymachine.activities import get_codebase_context
+from storymachine.ai import new_conversation
+from storymachine.repoindex import (
+    RepoIndex,
+    default_index_path,
+    module_name,
+    open_index,
+    parse_file,
+)
+from storymachine.types import WorkflowInput
+
+AUTH = """\
+from .models import User
+import hashlib
+
+
+class Authenticator:
+    def check(self, user: User) -> bool:
+        return True
+
+
+def authenticate_user(name):
+    return Authenticator().check(name)
+"""
+
+
+@pytest.fixture
+def checkout(tmp_path: Path) -> Path:
+    """A small mixed-language repository."""
+    root = tmp_path / "repo"
+    files = {
+        "src/app/__init__.py": "",
+        "src/app/auth.py": AUTH,
+        "src/app/models.py": "class User:\n    name = ''\n",
+        "src/app/views.py": "from app.auth import authenticate_user\n",
+        "web/session.ts": "import { api } from './api'\nexport function startSession() {}\n",
+        "cmd/main.go": 'package main\n\nimport "net/http"\n\nfunc Serve() {}\n',
+    }
+    for name, content in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    return root
+
+
+def git(root: Path, *args: str) -> None:
+    subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@example.com", *args],
+        cwd=root,
+        check=True,
+        capture_output=True,
+    )
+
+
+def test_parse_python_definitions_and_relative_imports() -> None:
+    """Test that ast parsing finds definitions and resolves relative imports."""
+    parsed = parse_file("src/app/auth.py", AUTH)
+
+    assert parsed.module == "app.auth"
+    assert parsed.symbols == [
+        ("Authenticator", "class", 5),
+        ("check", "method", 6),
+        ("authenticate_user", "function", 10),
+    ]
+    assert parsed.imports == [("app.models", 1), ("hashlib", 2)]
+    assert parsed.refs["Authenticator"] == 2
+
+
+def test_parse_other_languages_by_pattern() -> None:
+    """Test that TypeScript and Go definitions and imports are found."""
+    ts = parse_file(
+        "web/session.ts", "import { api } from './api'\nexport function go() {}\n"
+    )
+    go = parse_file("cmd/main.go", 'import "net/http"\n\nfunc (s *S) Serve() {}\n')
+
+    assert (ts.module, ts.symbols, ts.imports) == (
+        "web/session",
+        [("go", "function", 2)],
+        [("./api", 1)],
+    )
+    assert go.symbols == [("Serve", "function", 3)]
+    assert go.imports == [("net/http", 1)]
+    assert module_name("src/app/__init__.py") == "app"
+
+
+def test_update_only_parses_changed_files(checkout, tmp_path) -> None:
+    """Test that updates reparse changed files and drop removed ones."""
+    index = RepoIndex(tmp_path / "index.sqlite")
+    assert index.update(checkout).indexed == 6
+
+    models = checkout / "src/app/models.py"
+    models.write_text("class Account:\n    pass\n")
+    os.utime(models, ns=(1, 1))
+    (checkout / "cmd/main.go").unlink()
+    update = index.update(checkout)
+
+    assert (update.indexed, update.removed, update.unchanged) == (1, 1, 4)
+    assert index.definitions("Account") == [("class", "src/app/models.py", 1)]
+    assert index.definitions("User") == []
+    assert index.definitions("Serve") == []
+
+
+def test_answers_location_questions_only(checkout, tmp_path) -> None:
+    """Test that where/which questions are answered and others are left."""
+    index = RepoIndex(tmp_path / "index.sqlite")
+    index.update(checkout)
+
+    answer = index.answer("Where is `authenticate_user` defined?")
+    assert answer is not None
+    assert answer.splitlines() == [
+        "`authenticate_user` is defined in:",
+        "- src/app/auth.py:10 (function)",
+        "  referenced in: src/app/views.py",
+    ]
+    importers = index.answer("Which files import app.auth?")
+    assert importers is not None
+    assert "Module `app.auth` is src/app/auth.py" in importers
+    assert "imported by: src/app/views.py" in importers
+    assert index.answer("How does authenticate_user handle lockouts?") is None
+    assert index.answer("Where is billing implemented?") is None
+    # Part of the question is about behaviour
+    assert (
+        index.answer("Where is `authenticate_user` defined and how does it hash?")
+        is None
+    )
+    # Every named identifier has to be in the index
+    assert index.answer("Where are `User` and `Account` defined?") is None
+    both = index.answer("Where are the `User` and `Authenticator` classes defined?")
+    assert both is not None
+    assert "`User` is defined in:" in both and "`Authenticator` is defined in:" in both
+
+
+def test_open_index_updates_when_the_commit_moves(checkout) -> None:
+    """Test that a stale index catches up with a new commit before use."""
+    git(checkout, "init", "-q")
+    git(checkout, "add", ".")
+    git(checkout, "commit", "-qm", "first")
+    index = RepoIndex(default_index_path(checkout))
+    index.update(checkout)
+    index.close()
+
+    (checkout / "src/app/billing.py").write_text("def charge():\n    pass\n")
+    git(checkout, "add", ".")
+    git(checkout, "commit", "-qm", "second")
+    index = open_index(checkout, None)
+
+    assert index is not None
+    assert index.definitions("charge") == [("function", "src/app/billing.py", 1)]
+    assert open_index(checkout.parent, None) is None
+
+
+def index_features(checkout: Path, count: int) -> None:
+    """Define feature_1 to feature_<count> in the checkout and index it."""
+    (checkout / "src/app/feature_flags.py").write_text(
+        "".join(f"def feature_{i}():\n    pass\n" for i in range(1, count + 1))
+    )
+    RepoIndex(default_index_path(checkout)).update(checkout)
+
+
+def run_codebase_context(checkout: Path, monkeypatch) -> tuple[str, list]:
+    """Codebase context of the checkout, and each agent run's (prompt, budget)."""
+    asked = []
+
+    def ask_local_repo(root, question, paths, max_iterations) -> str:
+        asked.append((question, max_iterations))
+        return "agent answer"
+
+    monkeypatch.setattr(activities, "ask_local_repo", ask_local_repo)
+    monkeypatch.chdir(checkout.parent)
+    monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
+    config = FakeOpenAIConfig(question_template="Where is `feature_{i}` defined?")
+    workflow_input = WorkflowInput(
+        prd_content="PRD", tech_spec_content="Spec", repo_url=str(checkout)
+    )
+    with (
+        FakeOpenAIServer(config) as server,
+        fake_environment(server, FakeAskGithub(config)),
+    ):
+        new_conversation()
+        context = asyncio.run(get_codebase_context(workflow_input))
+    return context, asked
+
+
+def test_codebase_context_uses_the_index_first(checkout, monkeypatch) -> None:
+    """Test that indexed answers replace agent runs for location questions."""
+    index_features(checkout, 3)
+
+    context, asked = run_codebase_context(checkout, monkeypatch)
+
+    sections = context.split("## ")[1:]
+    assert len(sections) == 5
+    assert all(f"`feature_{i}` is defined in:" in sections[i - 1] for i in (1, 2, 3))
+    assert sorted(asked) == [
+        ("Where is `feature_4` defined?", 25),
+        ("Where is `feature_5` defined?", 25),
+    ]
+    assert sections[4].endswith("agent answer")
+
+
+def test_index_leaves_one_full_run_for_the_rest(checkout, monkeypatch) -> None:
+    """Test that a single remaining question, or no splitting, gets one long run."""
+    index_features(checkout, 4)
+
+    context, asked = run_codebase_context(checkout, monkeypatch)
+
+    assert asked == [("Where is `feature_5` defined?", 100)]
+    assert context.count("## ") == 5
+
+    index_features(checkout, 3)
+    monkeypatch.setenv("SPLIT_CODEBASE_QUESTIONS", "false")
+    context, asked = run_codebase_context(checkout, monkeypatch)
+
+    assert asked == [
+        ("- Where is `feature_4` defined?\n- Where is `feature_5` defined?", 100)
+    ]
+    assert context.endswith(
+        "## Where is `feature_4` defined? Where is `feature_5` defined?\n\nagent answer"
+    )
@@ -0,0 +1,95 @@
+"""Tests for routing module."""
+
+import pytest
+
+from storymachine.config import Settings
+from storymachine.routing import RunBudget, adapt_effort, resolve_route
+
+
+@pytest.fixture
+def settings(monkeypatch: pytest.MonkeyPatch) -> Settings:
+    """Settings with the default model and effort and no route overrides."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    for name in (
+        "MODEL",
+        "REASONING_EFFORT",
+        "ROUTE_MODELS",
+        "ROUTE_REASONING_EFFORTS",
+    ):
+        monkeypatch.delenv(name, raising=False)
+    return Settings(_env_file=None)  # pyright: ignore[reportCallIssue]
+
+
+def test_default_routes_use_small_model_for_questions_and_enrichment(
+    settings: Settings,
+) -> None:
+    """Test that cheap stages get the small model and the breakdown keeps MODEL."""
+    assert resolve_route("repo_questions", settings).model == "gpt-5-mini"
+    assert resolve_route("enrich_context", settings).model == "gpt-5-mini"
+    breakdown = resolve_route("problem_break_down", settings)
+    assert breakdown.model == "gpt-5"
+    assert breakdown.reasoning_effort == "low"
+
+
+def test_route_overrides_from_environment(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that ROUTE_MODELS and ROUTE_REASONING_EFFORTS are JSON overrides."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv(
+        "ROUTE_MODELS", '{"problem_break_down": "o3", "enrich_context": ""}'
+    )
+    monkeypatch.setenv("ROUTE_REASONING_EFFORTS", '{"problem_break_down": "high"}')
+    settings = Settings(_env_file=None)  # pyright: ignore[reportCallIssue]
+
+    breakdown = resolve_route("problem_break_down", settings)
+    assert (breakdown.model, breakdown.reasoning_effort) == ("o3", "high")
+    # An empty model falls back to MODEL; other defaults stay in place
+    assert resolve_route("enrich_context", settings).model == settings.model
+    assert resolve_route("repo_questions", settings).model == "gpt-5-mini"
+
+
+def test_route_to_non_reasoning_model_drops_effort(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that reasoning effort is only applied to models that accept it."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("ROUTE_MODELS", '{"repo_questions": "gpt-4.1-mini"}')
+    settings = Settings(_env_file=None)  # pyright: ignore[reportCallIssue]
+
+    assert resolve_route("repo_questions", settings).reasoning_effort is None
+
+
+def test_effort_drops_to_minimal_on_third_story_revision(settings: Settings) -> None:
+    """Test that repeated per-story revisions use the lowest effort."""
+    route = resolve_route("acceptance_criteria", settings)
+
+    assert adapt_effort(route, 500, settings, revision=2).effort == "low"
+    decision = adapt_effort(route, 500, settings, revision=3)
+    assert decision.effort == "minimal"
+    assert decision.reasons == ("revision 3",)
+    # The breakdown is not a per-story edit
+    breakdown = resolve_route("problem_break_down", settings)
+    assert adapt_effort(breakdown, 500, settings, revision=3).effort == "low"
+
+
+def test_effort_follows_remaining_deadline(settings: Settings) -> None:
+    """Test that effort steps down as a run's time budget runs out."""
+    settings.route_reasoning_efforts = {"problem_break_down": "high"}
+    route = resolve_route("problem_break_down", settings)
+    budget = RunBudget(deadline_seconds=600, started=0.0)
+
+    assert adapt_effort(route, 500, settings, budget=budget, now=100).effort == "high"
+    assert adapt_effort(route, 500, settings, budget=budget, now=400).effort == "medium"
+    late = adapt_effort(route, 500, settings, budget=budget, now=500)
+    assert late.effort == "minimal"
+    assert late.reasons == ("deadline nearly reached",)
+
+
+def test_large_prompt_lowers_effort_but_not_below_model_floor(
+    settings: Settings,
+) -> None:
+    """Test that large prompts step down, and non-gpt-5 models stop at low."""
+    settings.route_models = {"problem_break_down": "o3"}
+    route = resolve_route("problem_break_down", settings)
+
+    decision = adapt_effort(route, 100_000, settings)
+    assert (decision.effort, decision.reasons) == ("low", ("large prompt",))
@@ -0,0 +1,126 @@
+"""Tests for the eval runner in evals/runner.py."""
+
+import asyncio
+import io
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("marimo")
+pytest.importorskip("fasthtml")
+pytest.importorskip("markdown")
+
+from benchmarks.bench_e2e import fake_environment  # noqa: E402
+from benchmarks.fake_openai import (  # noqa: E402
+    FakeAskGithub,
+    FakeOpenAIConfig,
+    FakeOpenAIServer,
+)
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "evals"))
+
+import runner  # noqa: E402  # pyright: ignore[reportMissingImports]
+from eval import StoryCardEvalItem, StorySetEvalItem  # noqa: E402  # pyright: ignore[reportMissingImports]
+
+
+@pytest.fixture(autouse=True)
+def isolated_cwd(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Run in a temp directory so no project .env or log file is used."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
+
+
+@pytest.fixture
+def manifest(tmp_path: Path) -> Path:
+    """A corpus of two items with their own PRD and tech spec."""
+    corpus = tmp_path / "corpus"
+    lines = []
+    for name in ("billing", "search"):
+        (corpus / name).mkdir(parents=True)
+        (corpus / name / "prd.md").write_text(f"PRD for {name}")
+        (corpus / name / "spec.md").write_text(f"Spec for {name}")
+        item = {
+            "name": name,
+            "prd": f"{name}/prd.md",
+            "tech_spec": f"{name}/spec.md",
+            "repo": f"https://github.com/o/{name}",
+        }
+        lines.append(json.dumps(item))
+    path = corpus / "corpus.jsonl"
+    path.write_text("\n".join(lines) + "\n\n")
+    return path
+
+
+def test_load_corpus_resolves_paths_against_the_manifest(manifest: Path) -> None:
+    """Test that item paths are relative to the manifest and blank lines skipped."""
+    items = runner.load_corpus(manifest)
+
+    assert [item.name for item in items] == ["billing", "search"]
+    assert items[0].prd == manifest.parent / "billing" / "prd.md"
+    assert items[0].prd.read_text() == "PRD for billing"
+
+
+def test_run_corpus_writes_eval_items_and_reuses_the_cache(
+    manifest: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a run writes decodable eval items, and a rerun hits the cache."""
+    monkeypatch.setenv("RESPONSE_CACHE_DIR", str(tmp_path / "cache"))
+    items = runner.load_corpus(manifest)
+    out_dir = tmp_path / "eval-set"
+    config = FakeOpenAIConfig(story_count=2)
+
+    with (
+        FakeOpenAIServer(config) as server,
+        fake_environment(server, FakeAskGithub(config)),
+    ):
+        first = asyncio.run(runner.run_corpus(items, out_dir, 2, report=io.StringIO()))
+        second = asyncio.run(runner.run_corpus(items, out_dir, 2, report=io.StringIO()))
+
+    assert [record.error for record in first] == [None, None]
+    assert all(record.story_count == 2 for record in first)
+    assert all(record.cached_calls == 0 for record in first)
+    assert all(record.cached_calls == record.calls for record in second)
+
+    # Both runs append to the same files
+    sets = [
+        StorySetEvalItem.from_dict(json.loads(line))
+        for line in (out_dir / "story_sets.jsonl").read_text().splitlines()
+    ]
+    cards = [
+        StoryCardEvalItem.from_dict(json.loads(line))
+        for line in (out_dir / "story_cards.jsonl").read_text().splitlines()
+    ]
+    runs = (out_dir / "runs.jsonl").read_text().splitlines()
+    assert len(sets) == 4 and len(cards) == 8 and len(runs) == 4
+    assert {item.prd.content for item in sets} == {"PRD for billing", "PRD for search"}
+    assert cards[0].eval_criteria == runner.DEFAULT_EVAL_CRITERIA
+
+
+def test_compare_fused_runs_both_detailing_variants(
+    manifest: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that the comparison runs each variant into its own directory."""
+    monkeypatch.delenv("FUSED_DETAILING", raising=False)
+    items = runner.load_corpus(manifest)
+    out_dir = tmp_path / "eval-set"
+    config = FakeOpenAIConfig(story_count=2)
+    report = io.StringIO()
+
+    with (
+        FakeOpenAIServer(config) as server,
+        fake_environment(server, FakeAskGithub(config)),
+    ):
+        results = asyncio.run(runner.compare_fused(items, out_dir, 2, report=report))
+
+    assert list(results) == ["two_step", "fused"]
+    two_step, fused = results["two_step"], results["fused"]
+    assert all(record.error is None for record in two_step + fused)
+    # Two detailing round trips fewer per story, each with a tool follow-up
+    assert sum(r.calls for r in two_step) - sum(r.calls for r in fused) == 2 * 2 * 2
+    for variant in results:
+        assert len((out_dir / variant / "runs.jsonl").read_text().splitlines()) == 2
+    assert "fused" in report.getvalue().splitlines()[-1]
+    assert "FUSED_DETAILING" not in os.environ
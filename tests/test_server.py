@@ -0,0 +1,93 @@
+"""Tests for the WebSocket session server."""
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from benchmarks.bench_e2e import fake_environment  # noqa: E402
+from benchmarks.fake_openai import (  # noqa: E402
+    FakeAskGithub,
+    FakeOpenAIConfig,
+    FakeOpenAIServer,
+)
+from storymachine.server import (  # noqa: E402
+    ProtocolError,
+    create_app,
+    parse_review,
+    parse_start,
+)
+from storymachine.types import FeedbackStatus  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_cwd(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Run in a temp directory so no project .env or log file is used."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
+
+
+def test_parse_start_requires_documents_and_repo() -> None:
+    """Test that a start message needs a PRD, tech spec and repository."""
+    with pytest.raises(ProtocolError, match="tech_spec, repo"):
+        parse_start({"type": "start", "prd": "PRD"})
+
+    workflow_input, deadline = parse_start(
+        {
+            "type": "start",
+            "prd": "PRD",
+            "tech_spec": "Spec",
+            "repo": "r",
+            "deadline": 60,
+        }
+    )
+    assert workflow_input.repo_url == "r"
+    assert deadline == 60
+
+
+def test_parse_review_reads_status_and_comment() -> None:
+    """Test that review messages become feedback and bad statuses are refused."""
+    feedback = parse_review(
+        {"type": "review", "status": "rejected", "comment": "Split"}
+    )
+    assert feedback.status == FeedbackStatus.REJECTED
+    assert feedback.comment == "Split"
+
+    with pytest.raises(ProtocolError):
+        parse_review({"type": "review", "status": "maybe"})
+
+
+def test_session_streams_stories_and_takes_reviews() -> None:
+    """Test that a session sends each review point and finishes on approvals."""
+    config = FakeOpenAIConfig(story_count=2)
+    with (
+        FakeOpenAIServer(config) as server,
+        fake_environment(server, FakeAskGithub(config)),
+        TestClient(create_app(max_threads=4)) as client,
+        client.websocket_connect("/sessions") as websocket,
+    ):
+        websocket.send_json(
+            {"type": "start", "prd": "PRD", "tech_spec": "Spec", "repo": "r"}
+        )
+        assert websocket.receive_json()["type"] == "session"
+        types = []
+        while (message := websocket.receive_json())["type"] != "completed":
+            types.append(message["type"])
+            websocket.send_json({"type": "review", "status": "accepted"})
+
+    assert types == ["stories", "story", "story"]
+    assert len(message["stories"]) == 2
+
+
+def test_session_rejects_bad_start_message() -> None:
+    """Test that a session without a valid start message is refused."""
+    with (
+        TestClient(create_app()) as client,
+        client.websocket_connect("/sessions") as websocket,
+    ):
+        websocket.send_json({"type": "review", "status": "accepted"})
+        assert websocket.receive_json() == {
+            "type": "error",
+            "message": "expected a start message",
+        }
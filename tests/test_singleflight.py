@@ -0,0 +1,111 @@
+"""Tests for single-flight request coalescing."""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.bench_e2e import fake_environment
+from benchmarks.fake_openai import FakeAskGithub, FakeOpenAIConfig, FakeOpenAIServer
+from storymachine.ai import ConversationState, new_conversation
+from storymachine.singleflight import SingleFlight
+from storymachine.types import FeedbackResponse, FeedbackStatus, Story, WorkflowInput
+from storymachine.workflow import w1
+
+
+@pytest.fixture(autouse=True)
+def isolated_cwd(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Run in a temp directory so no project .env or log file is used."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
+
+
+def test_concurrent_callers_share_one_execution() -> None:
+    """Test that callers arriving mid-flight get the leader's result."""
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    runs = []
+
+    def slow() -> str:
+        runs.append(1)
+        started.set()
+        release.wait(5)
+        return "tree"
+
+    with ThreadPoolExecutor(4) as pool:
+        leader = pool.submit(flights.do, "repo", slow)
+        started.wait(5)
+        followers = [pool.submit(flights.do, "repo", slow) for _ in range(3)]
+        while flights.stats.shared < 3:
+            time.sleep(0.001)
+        release.set()
+
+    assert leader.result() == ("tree", False)
+    assert [f.result() for f in followers] == [("tree", True)] * 3
+    assert len(runs) == 1
+    # Nothing is kept once the flight has landed
+    assert flights.do("repo", lambda: "fresh") == ("fresh", False)
+
+
+def test_followers_receive_the_leaders_exception() -> None:
+    """Test that a failed flight fails every waiting caller."""
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing() -> None:
+        started.set()
+        release.wait(5)
+        raise ValueError("rate limited")
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(flights.do, "key", failing)
+        started.wait(5)
+        follower = pool.submit(flights.do, "key", failing)
+        while flights.stats.shared < 1:
+            time.sleep(0.001)
+        release.set()
+
+    for future in (leader, follower):
+        with pytest.raises(ValueError, match="rate limited"):
+            future.result()
+
+
+def test_identical_concurrent_runs_share_repo_and_model_requests(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that two runs on the same inputs make one set of requests."""
+    # Every question in flight at once, so both runs ask them together
+    monkeypatch.setenv("ASK_CONCURRENCY", "8")
+
+    def approve() -> FeedbackResponse:
+        return FeedbackResponse(status=FeedbackStatus.ACCEPTED)
+
+    async def run_one() -> tuple[list[Story], ConversationState]:
+        state = new_conversation()
+        return await w1(workflow_input, review=approve), state
+
+    async def run_both() -> tuple[
+        tuple[list[Story], ConversationState], tuple[list[Story], ConversationState]
+    ]:
+        # Enough threads for both runs' questions, as the server provides
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(16))
+        return await asyncio.gather(run_one(), run_one())
+
+    config = FakeOpenAIConfig(story_count=2, latency=0.1, ask_latency=0.1)
+    ask_github = FakeAskGithub(config)
+    workflow_input = WorkflowInput(
+        prd_content="PRD", tech_spec_content="Spec", repo_url="r"
+    )
+    with FakeOpenAIServer(config) as server, fake_environment(server, ask_github):
+        (first, first_state), (second, second_state) = asyncio.run(run_both())
+
+    assert [s.title for s in first] == [s.title for s in second]
+    assert ask_github.calls["ask"] == 5
+    # As many model requests as a single run makes
+    assert server.stats.calls["/v1/responses"] == 1 + 2 * 5
+    assert first_state.shared_calls + second_state.shared_calls == 1 + 2 * 5
+    assert first_state.id != second_state.id
@@ -0,0 +1,82 @@
+"""Cold-start regression tests for the CLI.
+
+StoryMachine is scripted in pipelines and invoked many times, so `--help` and
+argument errors must not pay for the OpenAI SDK, pydantic or structlog, and
+must not create the log file. Each check runs in a fresh interpreter.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+HEAVY_MODULES = ["openai", "pydantic", "pydantic_settings", "structlog", "asyncio"]
+
+# Generous budget for `import storymachine.cli`; a regression that pulls in the
+# SDK costs several hundred milliseconds on its own
+IMPORT_BUDGET_MS = 150
+
+PROBE = """
+import json, sys
+sys.argv = ["storymachine", *sys.argv[1:]]
+from storymachine.cli import main
+code = None
+try:
+    main()
+except SystemExit as e:
+    code = e.code
+print(json.dumps({"code": code, "modules": sorted(m for m in %r if m in sys.modules)}))
+""" % (HEAVY_MODULES,)
+
+
+def run_cli(cwd: Path, *args: str) -> dict:
+    """Run the CLI in a fresh interpreter and report exit code and heavy imports."""
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, *args],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "OPENAI_API_KEY": "test-key"},
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["--help"],
+        [],
+        ["--prd", "missing.md", "--tech-spec", "spec.md", "--repo", "r"],
+    ],
+    ids=["help", "missing-args", "missing-file"],
+)
+def test_cli_exits_without_heavy_imports(tmp_path: Path, args: list[str]) -> None:
+    """Test that help and validation errors load no heavy modules or log file."""
+    report = run_cli(tmp_path, *args)
+
+    assert report["code"] is not None
+    assert report["modules"] == []
+    assert not (tmp_path / "storymachine.log").exists()
+
+
+def test_cli_import_time_within_budget(tmp_path: Path) -> None:
+    """Test that importing the CLI module stays within the cold-start budget."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import storymachine.cli"],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Lines look like: "import time:   self |  cumulative | module"
+    cumulative_us = next(
+        int(line.split("|")[1])
+        for line in result.stderr.splitlines()
+        if line.rstrip().endswith(" storymachine.cli")
+    )
+
+    assert cumulative_us / 1000 < IMPORT_BUDGET_MS
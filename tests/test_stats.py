@@ -0,0 +1,182 @@
+"""Tests for stats module."""
+
+import csv
+import io
+import json
+import sys
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from storymachine.cli import main
+from storymachine.stats import (
+    build_report,
+    collect_runs,
+    estimate_model_costs,
+    filter_runs,
+    iter_events,
+    percentile,
+    write_csv,
+)
+
+
+def log_lines(run_id: str, day: str, model: str = "gpt-5") -> list[str]:
+    """Log lines for one run with two breakdowns and one story."""
+    events = [
+        {
+            "event": "workflow_started",
+            "model": model,
+            "repo_url": f"https://github.com/o/{run_id}",
+            "timestamp": f"{day}T10:00:00Z",
+        },
+        {"event": "openai_response", "input_tokens": 1000, "output_tokens": 100},
+        {"event": "openai_api_duration", "duration_seconds": 2.0, "stage": "pbd"},
+        {"event": "stage_completed", "duration_seconds": 2.5, "stage": "pbd"},
+        {"event": "stories_rejected", "comment": "split"},
+        {"event": "openai_response", "input_tokens": 1000, "output_tokens": 100},
+        {"event": "openai_api_duration", "duration_seconds": 4.0, "stage": "pbd"},
+        {"event": "stage_completed", "duration_seconds": 4.5, "stage": "pbd"},
+        {"event": "workflow_completed", "story_count": 1, "duration_seconds": 9.0},
+    ]
+    return [json.dumps({**event, "run_id": run_id}) + "\n" for event in events]
+
+
+@pytest.fixture
+def lines() -> list[str]:
+    """A log with two runs on different days plus unrelated noise."""
+    return [
+        *log_lines("run-a", "2026-01-01"),
+        json.dumps({"event": "stories_parsed", "count": 3}) + "\n",
+        "not json\n",
+        *log_lines("run-b", "2026-01-02", model="gpt-5-mini"),
+    ]
+
+
+def test_collect_runs_groups_events_by_run(lines: list[str]) -> None:
+    """Test that events aggregate per run_id."""
+    runs = collect_runs(iter_events(lines))
+
+    run = runs["run-a"]
+    assert set(runs) == {"run-a", "run-b"}
+    assert run.completed and run.story_count == 1
+    assert run.api_calls == 2 and run.calls_per_story == 2
+    assert run.breakdown_revisions == 1
+    assert (run.input_tokens, run.output_tokens) == (2000, 200)
+    assert run.stage_seconds == {"pbd": [2.5, 4.5]}
+    assert run.cost_usd == pytest.approx((2000 * 1.25 + 200 * 10) / 1e6)
+
+
+def test_filter_runs_by_date_model_and_repo(lines: list[str]) -> None:
+    """Test that date, model and repo filters select runs."""
+    runs = list(collect_runs(iter_events(lines)).values())
+
+    def ids(selected):
+        return [run.run_id for run in selected]
+
+    assert ids(filter_runs(runs, since=date(2026, 1, 2))) == ["run-b"]
+    assert ids(filter_runs(runs, until=date(2026, 1, 1))) == ["run-a"]
+    assert ids(filter_runs(runs, model="gpt-5-mini")) == ["run-b"]
+    assert ids(filter_runs(runs, repo="o/run-a")) == ["run-a"]
+
+
+def test_report_percentiles_and_csv(lines: list[str]) -> None:
+    """Test stage percentiles across runs and the per-run CSV export."""
+    runs = list(collect_runs(iter_events(lines)).values())
+    report = build_report(runs)
+    out = io.StringIO()
+    write_csv(runs, out)
+
+    assert report["api_seconds"]["pbd"]["count"] == 4
+    assert report["api_seconds"]["pbd"]["p50"] == 3.0
+    assert report["mean_breakdown_revisions"] == 1
+    assert [day["runs"] for day in report["daily"]] == [1, 1]
+    rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert [row["run_id"] for row in rows] == ["run-a", "run-b"]
+
+
+def test_percentile_interpolates() -> None:
+    """Test linear interpolation between ranks."""
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+    assert percentile([5.0], 99) == 5.0
+
+
+def test_stats_subcommand_exports_json(
+    lines: list[str],
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test that `storymachine stats` reads a log and prints a JSON report."""
+    log_file = tmp_path / "storymachine.log"
+    log_file.write_text("".join(lines))
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "storymachine",
+            "stats",
+            "--log",
+            str(log_file),
+            "--model",
+            "gpt-5",
+            "--format",
+            "json",
+        ],
+    )
+
+    main()
+
+    report = json.loads(capsys.readouterr().out)
+    assert report["runs"] == 1
+    assert report["run_details"][0]["run_id"] == "run-a"
+
+
+def test_cost_uses_the_model_each_response_was_routed_to() -> None:
+    """Test that tokens are priced per responding model, not the run's model."""
+    events = [
+        {"event": "workflow_started", "model": "gpt-5"},
+        {
+            "event": "openai_response",
+            "model": "gpt-5-mini",
+            "input_tokens": 1_000_000,
+            "output_tokens": 0,
+        },
+        {
+            "event": "openai_response",
+            "model": "gpt-5",
+            "input_tokens": 1_000_000,
+            "output_tokens": 0,
+        },
+    ]
+    lines = [json.dumps({**event, "run_id": "run"}) + "\n" for event in events]
+
+    run = collect_runs(iter_events(lines))["run"]
+
+    assert run.cost_usd == pytest.approx(0.25 + 1.25)
+
+
+def test_estimate_model_costs_skips_unpriced_models() -> None:
+    """Test that per-model costs are summed over the models with known prices."""
+    tokens = {"gpt-5-mini": [1_000_000, 0], "local-model": [1_000_000, 0]}
+
+    assert estimate_model_costs(tokens) == pytest.approx(0.25)
+    assert estimate_model_costs({"local-model": [10, 10]}) is None
+
+
+def test_cached_and_shared_calls_are_counted_apart_from_tokens() -> None:
+    """Test that cache hits and shared calls add no tokens and are reported."""
+    response = {"event": "openai_response", "input_tokens": 1000, "output_tokens": 10}
+    events = [
+        response,
+        {**response, "cached": True},
+        {**response, "shared": True},
+    ]
+    lines = [json.dumps({**event, "run_id": "run"}) + "\n" for event in events]
+
+    run = collect_runs(iter_events(lines))["run"]
+    report = build_report([run])
+
+    assert (run.cached_calls, run.shared_calls) == (1, 1)
+    assert (run.input_tokens, run.output_tokens) == (1000, 10)
+    assert (report["cached_calls"], report["shared_calls"]) == (1, 1)
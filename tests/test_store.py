@@ -0,0 +1,119 @@
+"""Tests for the Parquet eval store in evals/store.py."""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("polars")
+pytest.importorskip("marimo")
+pytest.importorskip("fasthtml")
+pytest.importorskip("markdown")
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "evals"))
+
+from eval import (  # noqa: E402  # pyright: ignore[reportMissingImports]
+    PRD,
+    Story,
+    StoryCardEvalItem,
+    StorySetEvalItem,
+    TechSpec,
+)
+from store import EvalStore  # noqa: E402  # pyright: ignore[reportMissingImports]
+
+
+def project_items(project_id: str) -> list:
+    """One story set and its two story cards for a project."""
+    prd = PRD(project_id=project_id, content=f"PRD {project_id}")
+    tech_spec = TechSpec(project_id=project_id, content=f"Spec {project_id}")
+    stories = [
+        Story(project_id=project_id, title=f"Story {n}", acceptance_criteria=["a"])
+        for n in (1, 2)
+    ]
+    cards = [
+        StoryCardEvalItem(
+            project_id=project_id,
+            prd=prd,
+            tech_spec=tech_spec,
+            story=story,
+            eval_criteria="Is this a good User Story?",
+        )
+        for story in stories
+    ]
+    story_set = StorySetEvalItem(
+        project_id=project_id, prd=prd, tech_spec=tech_spec, story_set=stories
+    )
+    return [story_set, *cards]
+
+
+def test_items_round_trip_with_shared_documents(tmp_path: Path) -> None:
+    """Test that appended items load back equal, storing each document once."""
+    store = EvalStore(tmp_path)
+    items = project_items("p1")
+
+    ids = store.append_items(items, model="gpt-5", project_name="Alpha")
+    loaded = store.load(store.items().collect())
+
+    assert len(ids) == len(set(ids)) == 3
+    assert store.scan("documents").collect().height == 2
+    assert sorted(type(item).__name__ for item in loaded) == [
+        "StoryCardEvalItem",
+        "StoryCardEvalItem",
+        "StorySetEvalItem",
+    ]
+    cards = [item for item in loaded if isinstance(item, StoryCardEvalItem)]
+    assert {card.story.title for card in cards} == {"Story 1", "Story 2"}
+    assert cards[0].prd == items[0].prd
+    # Items of one project share their document objects
+    assert cards[0].prd is cards[1].prd
+
+
+def test_filters_and_latest_annotation(tmp_path: Path) -> None:
+    """Test kind, project and model filters, and that the last label wins."""
+    store = EvalStore(tmp_path)
+    first_ids = store.append_items(project_items("p1"), model="gpt-5")
+    store.append_items(project_items("p2"), model="gpt-5-mini")
+
+    store.annotate([{"item_id": first_ids[1], "label": False}])
+    store.annotate([{"item_id": first_ids[1], "label": True, "notes": "fine"}])
+
+    cards = store.items(kind="story_card", project_id="p1").collect()
+    assert cards.height == 2
+    assert store.items(model="gpt-5-mini").collect().height == 3
+    labeled = cards.filter(cards["item_id"] == first_ids[1]).row(0, named=True)
+    assert (labeled["label"], labeled["notes"]) == (True, "fine")
+    unlabeled = store.items(kind="story_card", unlabeled_only=True).collect()
+    assert first_ids[1] not in unlabeled["item_id"].to_list()
+    assert unlabeled.height == 3
+
+
+def test_import_runner_output(tmp_path: Path) -> None:
+    """Test that runner JSON lines files are imported as eval items."""
+    story_set, *cards = project_items("p1")
+    out_dir = tmp_path / "eval-set"
+    out_dir.mkdir()
+    (out_dir / "story_sets.jsonl").write_text(json.dumps(story_set.to_dict()) + "\n")
+    (out_dir / "story_cards.jsonl").write_text(
+        "".join(json.dumps(card.to_dict()) + "\n" for card in cards)
+    )
+    store = EvalStore(tmp_path / "store")
+
+    assert store.import_runner_output(out_dir, model="gpt-5") == 3
+    rows = store.items(kind="story_set").collect()
+    assert rows.height == 1
+    assert rows["model"].to_list() == ["gpt-5"]
+
+
+def test_append_items_with_ids_skips_items_already_stored(tmp_path: Path) -> None:
+    """Test that appending the same keyed items again adds nothing."""
+    store = EvalStore(tmp_path)
+    items = project_items("p1")
+    keys = ["csv-a", "csv-b", "csv-c"]
+
+    first = store.append_items(items, item_ids=keys)
+    second = store.append_items(items, item_ids=keys)
+
+    assert first == second == keys
+    assert store.items().collect().height == 3
+    assert store.scan("items").collect().height == 3
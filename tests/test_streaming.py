@@ -0,0 +1,73 @@
+"""Tests for streaming module."""
+
+import json
+from unittest.mock import MagicMock
+
+from storymachine.activities import parse_stories_from_response
+from storymachine.streaming import StoryStreamParser, recover_stories
+
+ARGUMENTS = json.dumps(
+    {
+        "stories": [
+            {
+                "title": 'Story with "quotes" and {braces}',
+                "acceptance_criteria": ["Given [a], when {b}, then c\\"],
+                "enriched_context": "ctx",
+            },
+            {
+                "title": "Second story",
+                "acceptance_criteria": [],
+                "enriched_context": "",
+            },
+        ]
+    }
+)
+
+
+class TestStoryStreamParser:
+    """Tests for StoryStreamParser."""
+
+    def test_yields_each_story_as_soon_as_it_completes(self) -> None:
+        """Test that stories are emitted mid-stream, not at the end."""
+        parser = StoryStreamParser()
+        split = ARGUMENTS.index("Second story")
+
+        first = parser.feed(ARGUMENTS[:split])
+        second = parser.feed(ARGUMENTS[split:])
+
+        assert [s.title for s in first] == ['Story with "quotes" and {braces}']
+        assert first[0].acceptance_criteria == ("Given [a], when {b}, then c\\",)
+        assert [s.title for s in second] == ["Second story"]
+        assert len(parser.items) == 2
+
+    def test_character_by_character_deltas(self) -> None:
+        """Test that arbitrarily small deltas parse the same as one chunk."""
+        parser = StoryStreamParser()
+
+        stories = list(parser.feed_all(iter(ARGUMENTS)))
+
+        assert [s.title for s in stories] == [
+            'Story with "quotes" and {braces}',
+            "Second story",
+        ]
+
+    def test_recovers_complete_stories_from_truncated_output(self) -> None:
+        """Test that a truncated argument string keeps the finished stories."""
+        truncated = ARGUMENTS[: ARGUMENTS.index("Second story")]
+
+        stories = recover_stories(truncated)
+
+        assert [s.title for s in stories] == ['Story with "quotes" and {braces}']
+
+
+def test_parse_stories_from_response_tolerates_truncation() -> None:
+    """Test that parse_stories_from_response falls back to recovery."""
+    tool_call = MagicMock()
+    tool_call.type = "function_call"
+    tool_call.arguments = ARGUMENTS[:-10]
+    response = MagicMock()
+    response.output = [tool_call]
+
+    stories = parse_stories_from_response(response)
+
+    assert [s.title for s in stories] == ['Story with "quotes" and {braces}']
@@ -0,0 +1,68 @@
+"""Tests for tracing module."""
+
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from storymachine.tracing import Tracer, span, use_tracer
+
+
+def test_spans_nest_and_export_as_chrome_trace(tmp_path: Path) -> None:
+    """Test that nested spans record parents and export as complete events."""
+    path = tmp_path / "trace.json"
+    with use_tracer(Tracer()) as tracer:
+        with span("workflow", repo_url="r"):
+            with span("codebase_context") as stage:
+                stage.set(items=3)
+    tracer.export_chrome_trace(path)
+
+    events = json.loads(path.read_text())["traceEvents"]
+    complete = {e["name"]: e for e in events if e["ph"] == "X"}
+    workflow, context = complete["workflow"], complete["codebase_context"]
+    assert context["args"]["parent_id"] == workflow["args"]["span_id"]
+    assert context["args"]["items"] == 3
+    assert workflow["args"]["repo_url"] == "r"
+    assert workflow["ts"] <= context["ts"]
+    assert context["ts"] + context["dur"] <= workflow["ts"] + workflow["dur"]
+    assert context["tid"] == workflow["tid"]
+
+
+def test_overlapping_siblings_get_separate_lanes() -> None:
+    """Test that concurrent spans under one parent are placed on distinct lanes."""
+
+    async def stage(name: str) -> None:
+        with span(name):
+            await asyncio.sleep(0.01)
+
+    async def run() -> None:
+        with span("workflow"):
+            await asyncio.gather(stage("a"), stage("b"))
+
+    with use_tracer(Tracer()) as tracer:
+        asyncio.run(run())
+
+    events = tracer.to_chrome_trace()["traceEvents"]
+    lanes = {e["name"]: e["tid"] for e in events if e["ph"] == "X"}
+    parents = {s.name: s.parent_id for s in tracer.spans}
+    assert parents["a"] == parents["b"] is not None
+    assert lanes["a"] != lanes["b"]
+
+
+def test_failed_span_is_recorded_with_error() -> None:
+    """Test that a span ended by an exception is kept and marked."""
+    with use_tracer(Tracer()) as tracer:
+        with pytest.raises(ValueError):
+            with span("enrich_context"):
+                raise ValueError("boom")
+
+    (failed,) = tracer.spans
+    assert failed.attributes["error"] == "ValueError"
+    assert failed.end is not None
+
+
+def test_span_without_tracer_records_nothing() -> None:
+    """Test that spans are no-ops when tracing is off."""
+    with span("workflow") as current:
+        current.set(ignored=True)
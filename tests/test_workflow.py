@@ -0,0 +1,269 @@
+"""End-to-end tests for the workflow against the local fake OpenAI server."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+import structlog
+
+from benchmarks.bench_e2e import fake_environment, run_once
+from benchmarks.fake_openai import FakeAskGithub, FakeOpenAIConfig, FakeOpenAIServer
+from storymachine.ai import new_conversation
+from storymachine.config import Settings
+from storymachine.types import FeedbackResponse, FeedbackStatus, WorkflowInput
+from storymachine.workflow import w1
+
+
+@pytest.fixture(autouse=True)
+def isolated_cwd(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Run in a temp directory so no project .env or log file is used."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
+
+
+def test_w1_runs_end_to_end_with_revision() -> None:
+    """Test that a rejected breakdown is revised and every story is detailed."""
+    result = run_once(1, FakeOpenAIConfig(story_count=3), ["n:Split story 1"])
+
+    assert result["stories"] == 3
+    assert result["stages"]["problem_break_down"]["calls"] == 2
+    assert result["stages"]["define_acceptance_criteria"]["calls"] == 3
+    assert result["stages"]["enrich_context"]["calls"] == 3
+    assert result["ask_github_calls"] == {"list_tree": 1, "ask": 5}
+    # One question call, then 2 breakdowns + 6 detailing calls that each
+    # need a follow-up request for their tool call
+    assert result["api_calls"]["/v1/responses"] == 1 + 2 * 8
+    # Two breakdown reviews, then one per story
+    assert result["reviews"] == 2 + 3
+
+
+def test_w1_details_stories_while_the_breakdown_streams(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that detailing starts before the breakdown finishes, once per story."""
+    import storymachine.workflow as workflow
+
+    monkeypatch.setenv("EARLY_DETAILING", "true")
+
+    times: dict[str, list[float]] = {"criteria_started": [], "breakdown_done": []}
+    break_down = workflow.problem_break_down
+    define_criteria = workflow.define_acceptance_criteria
+
+    def timed_break_down(*args, **kwargs):
+        stories = break_down(*args, **kwargs)
+        times["breakdown_done"].append(time.perf_counter())
+        return stories
+
+    def timed_define_criteria(*args, **kwargs):
+        times["criteria_started"].append(time.perf_counter())
+        return define_criteria(*args, **kwargs)
+
+    monkeypatch.setattr(workflow, "problem_break_down", timed_break_down)
+    monkeypatch.setattr(workflow, "define_acceptance_criteria", timed_define_criteria)
+    # Stories arrive over about a second, a little at a time
+    config = FakeOpenAIConfig(
+        story_count=3, stream_chunk_chars=40, stream_chunk_delay=0.05
+    )
+    workflow_input = WorkflowInput(
+        prd_content="PRD", tech_spec_content="Spec", repo_url="r"
+    )
+    with (
+        FakeOpenAIServer(config) as server,
+        fake_environment(server, FakeAskGithub(config)),
+    ):
+        new_conversation()
+        stories = asyncio.run(w1(workflow_input, review=approve))
+
+    assert len(stories) == 3
+    assert all(story.enriched_context for story in stories)
+    assert len(times["criteria_started"]) == 3
+    assert min(times["criteria_started"]) < times["breakdown_done"][0]
+
+
+def test_w1_fused_detailing_halves_detailing_calls(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that FUSED_DETAILING uses one detailing call per story."""
+    monkeypatch.setenv("FUSED_DETAILING", "true")
+
+    result = run_once(1, FakeOpenAIConfig(story_count=3))
+
+    assert result["stages"]["detail_story"]["calls"] == 3
+    assert "enrich_context" not in result["stages"]
+    assert result["api_calls"]["/v1/responses"] == 1 + 2 * 4
+
+
+def test_w1_survives_injected_server_errors() -> None:
+    """Test that SDK retries absorb injected 500s."""
+    result = run_once(1, FakeOpenAIConfig(story_count=2, failure_rate=0.2, seed=3))
+
+    assert result["failures_injected"] > 0
+    assert result["stories"] == 2
+
+
+def test_w1_counts_tokens_per_routed_model() -> None:
+    """Test that the conversation keeps tokens apart for each model that answered."""
+    config = FakeOpenAIConfig(story_count=2)
+    workflow_input = WorkflowInput(
+        prd_content="PRD", tech_spec_content="Spec", repo_url="r"
+    )
+    with (
+        FakeOpenAIServer(config) as server,
+        fake_environment(server, FakeAskGithub(config)),
+    ):
+        state = new_conversation()
+        asyncio.run(w1(workflow_input, review=approve, console=False))
+
+    # Questions and enrichment go to gpt-5-mini, the rest to MODEL
+    assert set(state.model_tokens) == {"gpt-5-mini", Settings().model}
+    assert sum(tokens[0] for tokens in state.model_tokens.values()) == (
+        state.input_tokens
+    )
+    assert sum(tokens[1] for tokens in state.model_tokens.values()) == (
+        state.output_tokens
+    )
+
+
+def test_concurrent_runs_use_separate_conversations() -> None:
+    """Test that concurrent unattended runs each get their own conversation."""
+    states = []
+
+    async def run_one(workflow_input: WorkflowInput) -> list:
+        states.append(new_conversation())
+        return await w1(workflow_input, review=approve)
+
+    async def run_all() -> list:
+        inputs = [
+            WorkflowInput(
+                prd_content=f"PRD {i}", tech_spec_content="Spec", repo_url="r"
+            )
+            for i in range(3)
+        ]
+        return await asyncio.gather(*(run_one(i) for i in inputs))
+
+    config = FakeOpenAIConfig(story_count=2)
+    with (
+        FakeOpenAIServer(config) as server,
+        fake_environment(server, FakeAskGithub(config)),
+    ):
+        results = asyncio.run(run_all())
+
+    assert [len(stories) for stories in results] == [2, 2, 2]
+    assert len({state.id for state in states}) == 3
+    # One questions call, then a breakdown and 2 x 2 detailing calls with follow-ups
+    assert [state.calls for state in states] == [1 + 2 * 5] * 3
+    assert server.stats.calls["/v1/conversations"] == 3
+
+
+def approve() -> FeedbackResponse:
+    """Approve every review."""
+    return FeedbackResponse(status=FeedbackStatus.ACCEPTED)
+
+
+def test_w1_streams_events_and_awaits_async_reviews() -> None:
+    """Test that on_event sees each review point and async reviews are awaited."""
+    events = []
+    answers = [
+        FeedbackResponse(status=FeedbackStatus.REJECTED, comment="Split story 1"),
+    ]
+
+    async def review() -> FeedbackResponse:
+        await asyncio.sleep(0)
+        if answers:
+            return answers.pop(0)
+        return FeedbackResponse(status=FeedbackStatus.ACCEPTED)
+
+    config = FakeOpenAIConfig(story_count=2)
+    workflow_input = WorkflowInput(
+        prd_content="PRD", tech_spec_content="Spec", repo_url="r"
+    )
+    with (
+        FakeOpenAIServer(config) as server,
+        fake_environment(server, FakeAskGithub(config)),
+    ):
+        new_conversation()
+        stories = asyncio.run(w1(workflow_input, review=review, on_event=events.append))
+
+    assert [(e["type"], e.get("revision")) for e in events] == [
+        ("stories", 0),
+        ("stories", 1),
+        ("story", 0),
+        ("story", 0),
+        ("completed", None),
+    ]
+    assert len(events[1]["stories"]) == 2
+    assert [e["index"] for e in events if e["type"] == "story"] == [0, 1]
+    assert len(events[-1]["stories"]) == len(stories) == 2
+
+
+def test_w1_runs_blocking_reviews_off_the_event_loop() -> None:
+    """Test that a synchronous review runs in a worker thread."""
+    threads = []
+
+    def review() -> FeedbackResponse:
+        threads.append(threading.current_thread())
+        return FeedbackResponse(status=FeedbackStatus.ACCEPTED)
+
+    config = FakeOpenAIConfig(story_count=2)
+    workflow_input = WorkflowInput(
+        prd_content="PRD", tech_spec_content="Spec", repo_url="r"
+    )
+    with (
+        FakeOpenAIServer(config) as server,
+        fake_environment(server, FakeAskGithub(config)),
+    ):
+        new_conversation()
+        stories = asyncio.run(w1(workflow_input, review=review))
+
+    assert len(stories) == 2
+    assert len(threads) == 1 + 2
+    assert threading.main_thread() not in threads
+
+
+def test_w1_unbinds_its_log_context_when_a_review_fails() -> None:
+    """Test that run_id and story_index are unbound even if the run raises."""
+    reviews = []
+
+    def review() -> FeedbackResponse:
+        reviews.append(1)
+        if len(reviews) > 1:
+            raise RuntimeError("reviewer went away")
+        return FeedbackResponse(status=FeedbackStatus.ACCEPTED)
+
+    async def run() -> dict:
+        with pytest.raises(RuntimeError):
+            await w1(workflow_input, review=review)
+        return structlog.contextvars.get_contextvars()
+
+    config = FakeOpenAIConfig(story_count=2)
+    workflow_input = WorkflowInput(
+        prd_content="PRD", tech_spec_content="Spec", repo_url="r"
+    )
+    with (
+        FakeOpenAIServer(config) as server,
+        fake_environment(server, FakeAskGithub(config)),
+    ):
+        new_conversation()
+        context = asyncio.run(run())
+
+    assert "run_id" not in context
+    assert "story_index" not in context
+
+
+def test_w1_without_console_prints_nothing(capsys: pytest.CaptureFixture[str]) -> None:
+    """Test that a run with console output off, as in the server, is silent."""
+    config = FakeOpenAIConfig(story_count=2)
+    workflow_input = WorkflowInput(
+        prd_content="PRD", tech_spec_content="Spec", repo_url="r"
+    )
+    with (
+        FakeOpenAIServer(config) as server,
+        fake_environment(server, FakeAskGithub(config)),
+    ):
+        new_conversation()
+        stories = asyncio.run(w1(workflow_input, review=approve, console=False))
+
+    assert len(stories) == 2
+    captured = capsys.readouterr()
+    assert captured.out == "" and captured.err == ""